@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of the per message encode/decode cost on the UE5 websocket path, comparing the
+dataclasses_json reflection path with the compiled codec.
+
+Run from the Bot directory:
+    python -m benchmarks.codec_benchmark
+"""
+import json
+import timeit
+
+from dataclasses_json.api import DataClassJsonMixin
+
+from outbreak import codec, models
+
+PRESET_MESSAGE = {
+    "Type": "PresetEntitiesModified",
+    "PresetName": "SurvivalManagerPreset",
+    "PresetId": "13DC973046AF516A3FE19D8EF0EDFFFB",
+    "ModifiedEntities": {
+        "ModifiedRCProperties": [
+            {
+                "DisplayName": f"Angry Bear Enemy Location {index}",
+                "ID": "24CD500A47334C0BF79CE7B882137FAE",
+                "UnderlyingProperty": {
+                    "Name": "RelativeLocation",
+                    "DisplayName": "Relative Location",
+                    "Description": "Location of the component relative to its parent",
+                    "Type": "FVector",
+                    "TypePath": "None",
+                    "ContainerType": "",
+                    "KeyType": "",
+                    "Metadata": {"ToolTip": "Location of the component relative to its parent"}
+                },
+                "Metadata": {"Min": "", "Max": ""},
+                "OwnerObjects": [
+                    {
+                        "Name": "CollisionCylinder",
+                        "Class": "CapsuleComponent",
+                        "Path": f"/Game/LBG/Maps/L_LBG_Medow.L_LBG_Medow:PersistentLevel.Bear_C_{index}.CollisionCylinder"
+                    }
+                ]
+            }
+            for index in range(10)
+        ],
+        "ModifiedRCFunctions": [],
+        "ModifiedRCActors": []
+    }
+}
+
+RESPONSE_MESSAGE = json.dumps({"RequestId": 1234, "ResponseCode": 200, "ResponseBody": {"ReturnValue": True}})
+
+
+def make_request() -> models.WebsocketHttpRequest:
+    return models.WebsocketHttpRequest(
+        MessageName="http",
+        Parameters=models.Parameters(
+            RequestId=1234,
+            Url="/remote/object/call",
+            Verb="PUT",
+            Body=models.FunctionHttpRequest(
+                objectPath="/Game/LBG/Maps/UEDPIE_0_L_LBG_Medow.L_LBG_Medow:PersistentLevel.B_RemoteCaller_C_1",
+                functionName="Spawn",
+                parameters={"Arg1": "Bear", "Arg2": "Pond"},
+                generateTransaction=False
+            ).to_dict()
+        )
+    )
+
+
+CASES = {
+    "encode WebsocketHttpRequest": (
+        lambda: DataClassJsonMixin.to_json(make_request()),
+        lambda: make_request().to_json(),
+    ),
+    "decode WebsocketResponse": (
+        lambda: DataClassJsonMixin.from_dict.__func__(models.WebsocketResponse, json.loads(RESPONSE_MESSAGE)),
+        lambda: models.WebsocketResponse.from_dict(codec.loads(RESPONSE_MESSAGE)),
+    ),
+    "decode RootObject (10 properties)": (
+        lambda: DataClassJsonMixin.from_dict.__func__(models.RootObject, PRESET_MESSAGE),
+        lambda: models.RootObject.from_dict(PRESET_MESSAGE),
+    ),
+}
+
+
+def main(number: int = 2000):
+    print(f"codec backend: {codec.BACKEND}")
+    for name, (before, after) in CASES.items():
+        before_cost = min(timeit.repeat(before, number=number, repeat=3)) / number * 1e6
+        after_cost = min(timeit.repeat(after, number=number, repeat=3)) / number * 1e6
+        print(f"{name:36} dataclasses_json {before_cost:8.2f}us  codec {after_cost:8.2f}us  x{before_cost / after_cost:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,24 @@
 """
 Initial prototype for playing the game with audio feedback. Not actively used in the hackathon project.
+
+Given a game server, spoken commands are sent to the game like chat messages, see outbreak.voice_commands.
 """
 import boto3
 import discord
 import argparse
 import asyncio
-import wave
-import os
 import time
+import uuid
 import logging
 import requests
-from io import BytesIO
 from discord.ext import commands
+from typing import Awaitable, Callable, Dict, Optional
+from outbreak.audio import encode_wav
+from outbreak.transcription import AmazonTranscribeStreamer, StreamingTranscriber, StubTranscriber, Transcript, TranscriptionPool
+from outbreak.rag import BedrockRAGClient
+from outbreak.sessions import SessionConfig, SessionRegistry
+from outbreak.voice import VoiceSession, VoiceSessions, artifact_name
+from outbreak.voice_commands import VoiceCommandRouter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -84,7 +91,8 @@ def check_or_create_vocabulary(transcribe_client: boto3.client, vocabulary_name:
     if not check_vocabulary(transcribe_client, vocabulary_name):
         create_vocabulary(transcribe_client, vocabulary_name)
 
-def transcribe_audio(s3_client: boto3.client, transcribe_client: boto3.client, bucket_name: str, vocabulary_name: str, file_name: str, timeout: int = 300) -> str:
+def transcribe_audio(s3_client: boto3.client, transcribe_client: boto3.client, bucket_name: str, vocabulary_name: str, file_name: str, timeout: int = 300,
+                     job_name: Optional[str] = None) -> str:
     """
     Transcribe an audio file using Amazon Transcribe.
 
@@ -95,11 +103,12 @@ def transcribe_audio(s3_client: boto3.client, transcribe_client: boto3.client, b
         vocabulary_name: Name of the vocabulary to use.
         file_name: Name of the file to transcribe.
         timeout: Timeout in seconds to wait for the transcription job to complete.
+        job_name: Unique name of the transcription job, generated when not given.
 
     Returns:
         str: Transcription text.
     """
-    job_name = f"transcription-{int(time.time())}"
+    job_name = job_name or f"transcription-{uuid.uuid4().hex}"
     file_uri = f"s3://{bucket_name}/{file_name}"
 
     logger.info(f"Starting transcription job {job_name} for file {file_name}...")
@@ -127,7 +136,9 @@ def transcribe_audio(s3_client: boto3.client, transcribe_client: boto3.client, b
         time.sleep(5)
 
 class TranscribeCog(commands.Cog):
-    def __init__(self, bot: commands.Bot, s3_client: boto3.client, transcribe_client: boto3.client, bucket_name: str, vocabulary_name: str):
+    def __init__(self, bot: commands.Bot, s3_client: Optional[boto3.client], transcribe_client: Optional[boto3.client], bucket_name: Optional[str], vocabulary_name: str,
+                 transcriber: Optional[StreamingTranscriber] = None, max_workers: int = 4, max_speakers: int = 8,
+                 router: Optional[VoiceCommandRouter] = None, **detector_options):
         """
         Initialize the bot with required clients and configurations.
 
@@ -138,10 +149,22 @@ class TranscribeCog(commands.Cog):
             transcribe_client: Boto3 Transcribe client.
             bucket_name: Name of the S3 bucket.
             vocabulary_name: Name of the vocabulary to use.
+            transcriber: Streams the audio for transcription instead of batch jobs on S3 uploads.
+            max_workers: Transcriptions and encodings running at once, shared by every guild and speaker.
+            max_speakers: Speakers recorded at once in a guild.
+            router: Sends the transcripts to the game session of the guild as voice commands.
+            **detector_options: Options of the voice activity detector, see outbreak.audio.VoiceActivityDetector.
         """
         self.bot = bot
-        self.audio_buffer = BytesIO()
-        self.recording = False
+        self.pool = TranscriptionPool(max_workers=max_workers)
+        self.voice_sessions = VoiceSessions(
+            self.pool,
+            transcriber=transcriber,
+            max_speakers=max_speakers,
+            **detector_options)
+        self.transcriber = transcriber
+        self.router = router
+        self.last_transcripts: Dict[int, str] = dict()
         self.s3_client = s3_client
         self.transcribe_client = transcribe_client
         self.bucket_name = bucket_name
@@ -153,39 +176,66 @@ class TranscribeCog(commands.Cog):
             self.transcribe_client,
             self.vocabulary_name)
 
-    async def record_audio(self, voice_client: discord.VoiceClient) -> None:
+    async def record_audio(self, voice_client: discord.VoiceClient, session: VoiceSession, speaker: int) -> None:
         """
         Record audio from a voice client (NOT the voice but the media playing).
 
         Args:
             voice_client: Discord voice client.
+            session: The voice session of the guild.
+            speaker: ID of the member speaking, when the audio received isn't labelled with its speaker.
         """
-        while self.recording:
-            pcm_audio = await voice_client.source()  # Receive PCM audio
-            self.audio_buffer.write(pcm_audio)  # Append audio to buffer
+        while session.recording:
+            packet = await voice_client.source()  # Receive PCM audio, with its speaker when the source knows it
+            if isinstance(packet, tuple):
+                session.feed(*packet)
+            else:
+                session.feed(speaker, packet)
             await asyncio.sleep(0.1)
 
-    async def save_and_transcribe(self) -> str:
+    def transcript_handler(self, guild_id: int, channel: discord.TextChannel) -> Callable[[Transcript], Awaitable[None]]:
+        """
+        Build the callback handling the transcripts of a guild as they arrive.
+
+        With a router the transcripts are voice commands for the game session bound to the channel,
+        otherwise the final transcripts are posted to the channel.
+
+        Args:
+            guild_id: The guild recorded.
+            channel: The text channel the recording was started from.
+        """
+        async def handle_transcript(transcript: Transcript) -> None:
+            if self.router is not None:
+                self.router.handle(guild_id, channel, transcript)
+            if not transcript.final or not transcript.text:
+                return
+            self.last_transcripts[transcript.speaker] = transcript.text
+            logger.info(f"Transcript of {transcript.speaker}: {transcript.text}")
+            if self.router is None:
+                await channel.send(f"Transcription: {transcript.text}")
+        return handle_transcript
+
+    async def save_and_transcribe(self, session: VoiceSession, speaker: int) -> str:
         """
-        Save audio to a file and transcribe it.
+        Upload the last utterance of a speaker and transcribe it.
+
+        Args:
+            session: The voice session of the guild.
+            speaker: ID of the member speaking.
 
         Returns:
             str: Transcription text.
         """
-        self.audio_buffer.seek(0, os.SEEK_END)
-        buffer_size = self.audio_buffer.tell()
-        self.audio_buffer.seek(max(0, buffer_size - (6 * 16000 * 2)))  # 6 seconds * 16kHz * 2 bytes/sample
-
-        with wave.open("temp.wav", "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(16000)
-            wf.writeframes(self.audio_buffer.read())
+        wav = await self.pool.run(encode_wav, session.latest_audio(speaker))
+        file_name = artifact_name(session.guild_id, speaker, suffix=".wav")
 
-        self.s3_client.upload_file("temp.wav", self.bucket_name, "temp.wav")
-        transcription = transcribe_audio(self.s3_client, self.transcribe_client, self.bucket_name, self.vocabulary_name, "temp.wav")
-        os.remove("temp.wav")
-        return transcription
+        await self.pool.run(self.s3_client.put_object, Bucket=self.bucket_name, Key=file_name, Body=wav)
+        try:
+            return await self.pool.run(
+                transcribe_audio, self.s3_client, self.transcribe_client, self.bucket_name, self.vocabulary_name, file_name,
+                job_name=artifact_name(session.guild_id, speaker, prefix="transcription"))
+        finally:
+            await self.pool.run(self.s3_client.delete_object, Bucket=self.bucket_name, Key=file_name)
 
     @commands.command()
     async def join(self, ctx: commands.Context) -> None:
@@ -198,8 +248,8 @@ class TranscribeCog(commands.Cog):
         if ctx.author.voice:
             channel = ctx.author.voice.channel
             voice_client = await channel.connect()
-            self.recording = True
-            asyncio.create_task(self.record_audio(voice_client))
+            session = self.voice_sessions.start(ctx.guild.id, on_transcript=self.transcript_handler(ctx.guild.id, ctx.channel))
+            asyncio.create_task(self.record_audio(voice_client, session, ctx.author.id))
 
     @commands.command()
     async def leave(self, ctx: commands.Context) -> None:
@@ -209,7 +259,7 @@ class TranscribeCog(commands.Cog):
         Args:
             ctx: The command context.
         """
-        self.recording = False
+        await self.voice_sessions.stop(ctx.guild.id)
         if ctx.voice_client:
             await ctx.voice_client.disconnect()
 
@@ -221,7 +271,17 @@ class TranscribeCog(commands.Cog):
         Args:
             ctx: The command context.
         """
-        transcription = await self.save_and_transcribe()
+        if self.transcriber is not None:
+            await ctx.send(f"Transcription: {self.last_transcripts.get(ctx.author.id) or 'nothing heard yet'}")
+            return
+        session = self.voice_sessions.get(ctx.guild.id)
+        if session is None:
+            await ctx.send("Not recording in this server, use join first.")
+            return
+        transcription = await self.save_and_transcribe(session, ctx.author.id)
+        if self.router is not None:
+            self.router.handle(ctx.guild.id, ctx.channel, Transcript(
+                speaker=ctx.author.id, text=transcription, final=True, received_at=time.monotonic()))
         await ctx.send(f"Transcription: {transcription}")
 
     @transcribe.before_invoke
@@ -236,14 +296,20 @@ class TranscribeCog(commands.Cog):
             ctx.voice_client.stop()
 
 
-def run(discord_token: str, s3_bucket_name: str, vocabulary_name: str) -> None:
+def run(discord_token: str, s3_bucket_name: Optional[str], vocabulary_name: str, streaming: bool = False, stub: bool = False,
+        game_host: Optional[str] = None, game_port: int = 30020, channel_name: Optional[str] = None) -> None:
     """
     Run the bot with the provided configurations.
 
     Args:
         discord_token: Discord bot token.
-        s3_bucket_name: S3 bucket name for storing audio files.
+        s3_bucket_name: S3 bucket name for storing audio files, only used by batch transcription.
         vocabulary_name: Amazon Transcribe vocabulary name.
+        streaming: Stream the audio to Amazon Transcribe instead of batch jobs on S3 uploads.
+        stub: Stream the audio to the offline stub transcriber, without any AWS call.
+        game_host: Host of the game server voice commands are sent to, transcripts are only posted without it.
+        game_port: Port of that game server.
+        channel_name: Channel bound to that game server, voice is recorded from !join in this channel.
     """
     intents = discord.Intents.default()
     intents.guilds = True
@@ -255,18 +321,43 @@ def run(discord_token: str, s3_bucket_name: str, vocabulary_name: str) -> None:
         intents=intents
     )
 
-    transcribe_cog = TranscribeCog(
-        bot,
-        s3_client=boto3.client("s3", region_name="eu-west-3"),
-        transcribe_client=boto3.client("transcribe", region_name="eu-west-3"),
-        bucket_name=s3_bucket_name,
-        vocabulary_name=vocabulary_name)
-    transcribe_cog.create_vocabulary()
+    sessions = None
+    router = None
+    if game_host and channel_name:
+        sessions = SessionRegistry(BedrockRAGClient(region_name="us-east-1"))
+        sessions.add(SessionConfig(
+            session_id=f"{game_host}:{game_port}",
+            channel_name=channel_name,
+            game_host=game_host,
+            game_port=game_port))
+        router = VoiceCommandRouter(sessions.find)
+
+    if stub:
+        transcribe_cog = TranscribeCog(
+            bot,
+            s3_client=None,
+            transcribe_client=None,
+            bucket_name=None,
+            vocabulary_name=vocabulary_name,
+            transcriber=StubTranscriber(),
+            router=router)
+    else:
+        transcribe_cog = TranscribeCog(
+            bot,
+            s3_client=None if streaming else boto3.client("s3", region_name="eu-west-3"),
+            transcribe_client=boto3.client("transcribe", region_name="eu-west-3"),
+            bucket_name=s3_bucket_name,
+            vocabulary_name=vocabulary_name,
+            transcriber=AmazonTranscribeStreamer("eu-west-3", vocabulary_name) if streaming else None,
+            router=router)
+        transcribe_cog.create_vocabulary()
 
     @bot.event
     async def on_ready() -> None:
         """Log when the bot is ready."""
         logger.info(f"Logged in as {bot.user}")
+        if sessions is not None:
+            await asyncio.gather(*[session.connect() for session in sessions])
 
     async def main():
         async with bot:
@@ -278,8 +369,16 @@ def run(discord_token: str, s3_bucket_name: str, vocabulary_name: str) -> None:
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Run the TranscribeBot")
     parser.add_argument("--discord-token", required=True, help="The Discord bot token")
-    parser.add_argument("--s3-bucket-name", required=True, help="The S3 bucket name")
+    parser.add_argument("--s3-bucket-name", required=False, help="The S3 bucket name, required without streaming")
     parser.add_argument("--vocabulary-name", required=True, help="The Amazon Transcribe vocabulary name")
+    parser.add_argument("--streaming", action="store_true", help="Stream the audio to Amazon Transcribe")
+    parser.add_argument("--stub-transcriber", action="store_true", help="Stream the audio to an offline stub transcriber")
+    parser.add_argument("--game-host", required=False, help="Host of the game server to send voice commands to")
+    parser.add_argument("--game-port", required=False, type=int, default=30020, help="Port of the game server")
+    parser.add_argument("--channel-name", required=False, help="Name of the channel bound to the game server")
     args = parser.parse_args()
+    if not (args.streaming or args.stub_transcriber or args.s3_bucket_name):
+        parser.error("--s3-bucket-name is required without --streaming or --stub-transcriber")
 
-    run(args.discord_token, args.s3_bucket_name, args.vocabulary_name)
+    run(args.discord_token, args.s3_bucket_name, args.vocabulary_name, args.streaming, args.stub_transcriber,
+        args.game_host, args.game_port, args.channel_name)
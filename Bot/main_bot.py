@@ -2,7 +2,10 @@
 Test script to launch a single bot to my private server.
 '''
 import argparse
+import os
 from outbreak import bot
+from outbreak.sessions import load_session_configs
+from outbreak.sharding import FileCoordinator
 
 
 if __name__ == '__main__':
@@ -30,14 +33,58 @@ if __name__ == '__main__':
         help='Port of the game server')
     parser.add_argument(
         '--channel-name',
-        required=True,
+        required=False,
         type=str,
         help='Name of the channel to post to')
+    parser.add_argument(
+        '--sessions-file',
+        required=False,
+        type=str,
+        help='JSON file listing the game sessions and the channels driving them')
+    parser.add_argument(
+        '--replica-id',
+        required=False,
+        type=str,
+        default=os.getenv('REPLICA_ID'),
+        help='Unique id of this replica, shards the sessions across replicas when set with --coordinator-dir, '
+             'defaults to the REPLICA_ID environment variable')
+    parser.add_argument(
+        '--coordinator-dir',
+        required=False,
+        type=str,
+        default=os.getenv('COORDINATOR_DIR'),
+        help='Directory shared by every replica used to track the live replicas, '
+             'defaults to the COORDINATOR_DIR environment variable')
+    parser.add_argument(
+        '--shard-id',
+        required=False,
+        type=int,
+        help='Discord shard handled by this replica')
+    parser.add_argument(
+        '--shard-count',
+        required=False,
+        type=int,
+        help='Total number of Discord shards')
+    parser.add_argument(
+        '--pool-size',
+        required=False,
+        type=int,
+        default=1,
+        help='Websocket connections per game server used for requests')
     args = parser.parse_args()
 
+    if not args.channel_name and not args.sessions_file:
+        parser.error('Either --channel-name or --sessions-file is required')
+
     discord_bot = bot.Bot(
-        game_host=args.game_host,
+        game_host=args.game_host if args.channel_name else None,
         game_port=args.game_port,
-        channel_name=args.channel_name
+        channel_name=args.channel_name,
+        sessions=load_session_configs(args.sessions_file) if args.sessions_file else None,
+        replica_id=args.replica_id,
+        coordinator=FileCoordinator(args.coordinator_dir) if args.coordinator_dir else None,
+        shard_id=args.shard_id,
+        shard_count=args.shard_count,
+        pool_size=args.pool_size
     )
     discord_bot.run(token=args.discord_token)
\ No newline at end of file
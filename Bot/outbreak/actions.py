@@ -0,0 +1,261 @@
+"""
+Executes the action plans returned by the LLM against the UE5 Remote Control API.
+
+A plan is split into segments at Wait barriers, every action inside a segment is dispatched at
+once, either as concurrent in-flight calls over the multiplexed websocket or as a single
+/remote/batch request. The order between segments is kept, the order within one is not.
+
+Actions are looked up in the action registry, which gives the UE function to call, validates the
+arguments and tells which actions are heavy for the game, those are limited in how many run at once.
+Functions registered from a Remote Control preset are called through that preset.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Dict, List, Optional
+
+from outbreak import models
+from outbreak.client import UE5RemoteControlClient
+from outbreak.registry import COST_HEAVY, DEFAULT_REGISTRY, ActionRegistry, ActionSpec
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WAIT_ACTION = "Wait"
+
+
+@dataclass
+class ActionResult:
+    """
+    The outcome of a single action in a plan.
+    """
+    action: Dict[str, Any]
+    response: Optional[models.WebsocketResponse] = None
+    latency: float = 0.0
+    # Why the call got no response, the other actions of the plan still run
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.response is not None and self.response.ResponseCode == 200
+
+
+def split_segments(actions: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Split a plan into segments which can run concurrently, a Wait action is a segment of its own.
+
+    Args:
+        actions (list): The actions from the LLM response.
+
+    Returns:
+        list: The segments in the order they have to run.
+    """
+    segments = list()
+    current = list()
+    for action in actions:
+        if action.get("Name") == WAIT_ACTION:
+            if current:
+                segments.append(current)
+                current = list()
+            segments.append([action])
+        else:
+            current.append(action)
+
+    if current:
+        segments.append(current)
+
+    return segments
+
+
+class ActionExecutor:
+    """
+    Dispatches action plans to a remote caller object in the level.
+    """
+
+    def __init__(self, backend: UE5RemoteControlClient, remote_object_path: str, use_batch: bool = False,
+                 timeout: float = 5.0, registry: Optional[ActionRegistry] = None, max_heavy_in_flight: int = 4):
+        """
+        Args:
+            backend (UE5RemoteControlClient): The connected remote control client.
+            remote_object_path (str): The object exposing the action functions.
+            use_batch (bool): Send each segment as one /remote/batch request instead of concurrent calls.
+            timeout (float): Timeout for each UE request in seconds.
+            registry (ActionRegistry): The available actions, the built-in ones by default.
+            max_heavy_in_flight (int): Heavy actions, spawning or moving actors, dispatched at once.
+        """
+        self.backend = backend
+        self.remote_object_path = remote_object_path
+        self.use_batch = use_batch
+        self.timeout = timeout
+        self.registry = registry or DEFAULT_REGISTRY
+        self._heavy = asyncio.Semaphore(max_heavy_in_flight)
+
+    def build_parameters(self, action: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Build the UE function parameters for an action.
+
+        Returns:
+            dict: The parameters, or None when the action isn't known, is invalid or doesn't call UE.
+        """
+        spec = self.registry.get(action.get("Name"))
+        if spec is None or spec.function is None:
+            return None
+        error = self.registry.validate(action)
+        if error:
+            logger.warning(error)
+            return None
+        return spec.parameters(action)
+
+    async def execute(self, actions: List[Dict[str, Any]]) -> List[ActionResult]:
+        """
+        Execute a plan, segment by segment.
+
+        Args:
+            actions (list): The actions from the LLM response.
+
+        Returns:
+            list: One result per action, in the order of the plan.
+        """
+        results = list()
+        for segment in split_segments(actions):
+            if segment[0].get("Name") == WAIT_ACTION:
+                results.append(await self.wait(segment[0]))
+            elif self.use_batch:
+                results.extend(await self.execute_batch(segment))
+            else:
+                results.extend(await asyncio.gather(*[self.execute_action(action) for action in segment]))
+
+        return results
+
+    async def execute_stream(self, actions: AsyncIterable[Dict[str, Any]]) -> List[ActionResult]:
+        """
+        Execute a plan while it is still being generated.
+
+        Every action is dispatched as soon as it arrives, a Wait first lets the actions before it
+        finish. Streamed actions are always sent as individual calls, never batched.
+
+        Args:
+            actions (AsyncIterable): The actions, in plan order, as they are parsed from the stream.
+
+        Returns:
+            list: One result per action, in the order of the plan.
+        """
+        results = list()
+        in_flight = list()
+        async for action in actions:
+            if action.get("Name") == WAIT_ACTION:
+                results.extend(await asyncio.gather(*in_flight))
+                in_flight = list()
+                results.append(await self.wait(action))
+            else:
+                in_flight.append(asyncio.create_task(self.execute_action(action)))
+
+        results.extend(await asyncio.gather(*in_flight))
+        return results
+
+    async def wait(self, action: Dict[str, Any]) -> ActionResult:
+        start = time.perf_counter()
+        wait_time = action.get("Arg1", 0)
+        if type(wait_time) is str:
+            wait_time = float(wait_time)
+
+        await asyncio.sleep(wait_time)
+        return ActionResult(action=action, latency=time.perf_counter() - start)
+
+    async def execute_action(self, action: Dict[str, Any]) -> ActionResult:
+        """
+        Call the UE function for a single action.
+        """
+        logger.info(action)
+        parameters = self.build_parameters(action)
+        if parameters is None:
+            logger.warning(f"Skipping unknown action: {action}")
+            return ActionResult(action=action)
+
+        spec = self.registry.get(action["Name"])
+        start = time.perf_counter()
+        try:
+            if spec.cost == COST_HEAVY:
+                async with self._heavy:
+                    response = await self.call_function(spec, parameters)
+            else:
+                response = await self.call_function(spec, parameters)
+        except Exception as e:
+            logger.error(f"Failed to call {spec.function} in UE: {e}")
+            return ActionResult(action=action, latency=time.perf_counter() - start,
+                                error=f"{action['Name']} failed: {e}")
+
+        result = ActionResult(action=action, response=response, latency=time.perf_counter() - start)
+        if response is None:
+            result.error = f"{action['Name']} got no response from the game."
+        return result
+
+    async def call_function(self, spec: ActionSpec, parameters: Dict[str, Any]) -> Optional[models.WebsocketResponse]:
+        if spec.preset is not None:
+            return await self.backend.call_preset_function(spec.preset, spec.function, parameters, timeout=self.timeout)
+        return await self.backend.call_object_function(
+            self.remote_object_path, spec.function, parameters, timeout=self.timeout)
+
+    def batch_call(self, spec: ActionSpec, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The URL and body of a function call inside a /remote/batch request.
+        """
+        if spec.preset is not None:
+            return {
+                "URL": f"/remote/preset/{spec.preset}/function/{spec.function}",
+                "Body": {"Parameters": parameters, "GenerateTransaction": False}
+            }
+        return {
+            "URL": "/remote/object/call",
+            "Body": models.FunctionHttpRequest(
+                objectPath=self.remote_object_path,
+                functionName=spec.function,
+                parameters=parameters,
+                generateTransaction=False
+            ).to_dict()
+        }
+
+    async def execute_batch(self, segment: List[Dict[str, Any]]) -> List[ActionResult]:
+        """
+        Send every action in a segment as a single /remote/batch request.
+        """
+        results = [ActionResult(action=action) for action in segment]
+        requests = list()
+        for index, action in enumerate(segment):
+            logger.info(action)
+            parameters = self.build_parameters(action)
+            if parameters is None:
+                logger.warning(f"Skipping unknown action: {action}")
+                continue
+
+            call = self.batch_call(self.registry.get(action["Name"]), parameters)
+            requests.append({
+                "RequestId": index,
+                "URL": call["URL"],
+                "Verb": "PUT",
+                "Body": call["Body"]
+            })
+
+        if not requests:
+            return results
+
+        start = time.perf_counter()
+        response = await self.backend.batch_request(requests, timeout=self.timeout)
+        latency = time.perf_counter() - start
+        if not response or response.get("ResponseCode") != 200:
+            logger.error(f"Failed batch request to UE: {response}")
+            for request in requests:
+                results[request["RequestId"]].error = f"{segment[request['RequestId']]['Name']} failed in a batch request."
+            return results
+
+        for batch_response in (response.get("ResponseBody") or dict()).get("Responses", list()):
+            index = batch_response.get("RequestId")
+            if isinstance(index, int) and 0 <= index < len(results):
+                results[index].response = models.WebsocketResponse(
+                    RequestId=index,
+                    ResponseCode=batch_response.get("ResponseCode"),
+                    ResponseBody=batch_response.get("ResponseBody"))
+                results[index].latency = latency
+
+        return results
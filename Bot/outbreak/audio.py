@@ -0,0 +1,316 @@
+"""
+Bounded recording of voice audio, cut into utterances at silence.
+
+Every speaker gets a ring buffer preallocated for the longest utterance kept, so recording for
+hours uses the same memory as recording for seconds. An energy based voice activity detector
+looks at the audio frame by frame, an utterance starts when a frame is louder than the threshold
+and ends after enough quiet frames. Only complete utterances are handed on, the audio in between
+is overwritten.
+"""
+import io
+import logging
+import math
+import time
+import wave
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 16 kHz mono 16 bit PCM, the format sent to Amazon Transcribe
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH * CHANNELS
+
+
+def duration_to_bytes(seconds: float) -> int:
+    """
+    The size of an amount of audio, rounded down to whole samples.
+    """
+    return int(seconds * SAMPLE_RATE) * SAMPLE_WIDTH * CHANNELS
+
+
+def frame_energy(frame: bytes) -> float:
+    """
+    Root mean square of a frame of 16 bit PCM samples.
+    """
+    samples = array("h")
+    samples.frombytes(frame[:len(frame) - len(frame) % SAMPLE_WIDTH])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+def encode_wav(pcm: bytes) -> bytes:
+    """
+    Wrap PCM audio in an in-memory WAV file.
+    """
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return output.getvalue()
+
+
+class PCMRingBuffer:
+    """
+    Fixed size buffer keeping the most recent audio.
+
+    Positions count every byte ever written, the audio between two positions can be read back
+    as long as it hasn't been overwritten yet.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity (int): Size of the buffer in bytes.
+        """
+        self.capacity = capacity
+        self.position = 0
+        self._buffer = bytearray(capacity)
+
+    def __len__(self) -> int:
+        return min(self.position, self.capacity)
+
+    @property
+    def oldest(self) -> int:
+        """
+        Position of the oldest byte still in the buffer.
+        """
+        return self.position - len(self)
+
+    def write(self, data: bytes):
+        # Only the end of a write larger than the buffer would be kept anyway
+        skipped = max(0, len(data) - self.capacity)
+        self.position += skipped
+        data = memoryview(data)[skipped:]
+
+        start = self.position % self.capacity
+        end = start + len(data)
+        if end <= self.capacity:
+            self._buffer[start:end] = data
+        else:
+            split = self.capacity - start
+            self._buffer[start:] = data[:split]
+            self._buffer[:end - self.capacity] = data[split:]
+        self.position += len(data)
+
+    def read(self, start: int, end: Optional[int] = None) -> bytes:
+        """
+        The audio between two positions, clipped to what is still in the buffer.
+
+        Args:
+            start (int): Position of the first byte.
+            end (int): Position after the last byte, the current position by default.
+
+        Returns:
+            bytes: A copy of the audio.
+        """
+        end = self.position if end is None else min(end, self.position)
+        start = max(start, self.oldest)
+        if start >= end:
+            return b""
+
+        first = start % self.capacity
+        last = first + end - start
+        if last <= self.capacity:
+            return bytes(self._buffer[first:last])
+        return bytes(self._buffer[first:]) + bytes(self._buffer[:last - self.capacity])
+
+    def read_last(self, size: int) -> bytes:
+        return self.read(self.position - size)
+
+    def clear(self):
+        self.position = 0
+
+
+@dataclass(frozen=True, slots=True)
+class Utterance:
+    """
+    Audio of a speaker between two silences.
+    """
+    speaker: Any
+    audio: bytes
+    started_at: float
+    ended_at: float
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / BYTES_PER_SECOND
+
+
+class VoiceActivityDetector:
+    """
+    Splits a speaker's audio into utterances on the energy of fixed size frames.
+    """
+
+    def __init__(self, speaker: Any = None, threshold: float = 500.0, frame_duration: float = 0.02,
+                 min_silence: float = 0.5, min_speech: float = 0.2, pre_roll: float = 0.2,
+                 max_utterance: float = 15.0):
+        """
+        Args:
+            speaker: Who is speaking, copied to the utterances.
+            threshold (float): RMS energy above which a frame is speech.
+            frame_duration (float): Seconds of audio looked at at once.
+            min_silence (float): Seconds of quiet frames which end an utterance.
+            min_speech (float): Utterances with less speech than this are dropped as noise.
+            pre_roll (float): Seconds of audio kept before the first loud frame, not to cut the first syllable.
+            max_utterance (float): Utterances are cut at this length, it also sizes the ring buffer.
+        """
+        self.speaker = speaker
+        self.threshold = threshold
+        self.frame_size = duration_to_bytes(frame_duration)
+        self.min_silence_frames = max(1, round(min_silence / frame_duration))
+        self.min_speech_frames = max(1, round(min_speech / frame_duration))
+        self.pre_roll = duration_to_bytes(pre_roll)
+        self.max_utterance = duration_to_bytes(max_utterance)
+
+        self.buffer = PCMRingBuffer(self.max_utterance + self.pre_roll)
+        self._pending = bytearray()
+        self._start: Optional[int] = None
+        self._started_at = 0.0
+        # Time the last loud frame was received, the end of speech once the utterance is over
+        self.last_voice_at: Optional[float] = None
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    @property
+    def speaking(self) -> bool:
+        return self._start is not None
+
+    def feed(self, pcm: bytes, now: Optional[float] = None) -> List[Utterance]:
+        """
+        Add audio and return the utterances it completes.
+
+        Args:
+            pcm (bytes): 16 kHz mono 16 bit PCM, of any length.
+            now (float): Time the audio was received, time.monotonic() by default.
+
+        Returns:
+            list: The completed utterances, often none.
+        """
+        now = time.monotonic() if now is None else now
+        self._pending += pcm
+        utterances = list()
+        while len(self._pending) >= self.frame_size:
+            frame = bytes(self._pending[:self.frame_size])
+            del self._pending[:self.frame_size]
+            utterance = self._feed_frame(frame, now)
+            if utterance is not None:
+                utterances.append(utterance)
+        return utterances
+
+    def _feed_frame(self, frame: bytes, now: float) -> Optional[Utterance]:
+        loud = frame_energy(frame) >= self.threshold
+        self.buffer.write(frame)
+        if loud:
+            self.last_voice_at = now
+
+        if self._start is None:
+            if loud:
+                self._start = max(self.buffer.oldest, self.buffer.position - len(frame) - self.pre_roll)
+                self._started_at = now
+                self._speech_frames = 1
+                self._silent_frames = 0
+            return None
+
+        if loud:
+            self._speech_frames += 1
+            self._silent_frames = 0
+        else:
+            self._silent_frames += 1
+
+        if self._silent_frames >= self.min_silence_frames:
+            return self._cut(now)
+        if self.buffer.position - self._start >= self.max_utterance:
+            logger.info(f"Utterance of {self.speaker} reached {self.max_utterance / BYTES_PER_SECOND:.0f}s, cutting it.")
+            return self._cut(now)
+        return None
+
+    def _cut(self, now: float) -> Optional[Utterance]:
+        start, speech_frames = self._start, self._speech_frames
+        self._start = None
+        self._speech_frames = 0
+        self._silent_frames = 0
+        if speech_frames < self.min_speech_frames:
+            return None
+        return Utterance(
+            speaker=self.speaker,
+            audio=self.buffer.read(start),
+            started_at=self._started_at,
+            ended_at=now)
+
+    def flush(self, now: Optional[float] = None) -> Optional[Utterance]:
+        """
+        End the current utterance, when the speaker leaves.
+        """
+        if self._start is None:
+            return None
+        return self._cut(time.monotonic() if now is None else now)
+
+    def last(self, seconds: float) -> bytes:
+        """
+        The most recent audio of the speaker, whether it's speech or not.
+        """
+        return self.buffer.read_last(duration_to_bytes(seconds))
+
+
+class AudioRecorder:
+    """
+    The voice activity detectors of the speakers of a voice channel.
+
+    The number of speakers is bounded, the one heard least recently is dropped for a new one, so
+    the memory of a channel stays constant. The utterance the dropped speaker was in the middle of
+    is ended and returned with the next ones.
+    """
+
+    def __init__(self, max_speakers: int = 8, **detector_options):
+        """
+        Args:
+            max_speakers (int): Speakers recorded at once.
+            **detector_options: Options of the VoiceActivityDetector of each speaker.
+        """
+        self.max_speakers = max_speakers
+        self.detector_options = detector_options
+        self.detectors: OrderedDict[Hashable, VoiceActivityDetector] = OrderedDict()
+        # Utterances ended by dropping their speaker, not returned yet
+        self._dropped: List[Utterance] = list()
+
+    def detector(self, speaker: Hashable) -> VoiceActivityDetector:
+        detector = self.detectors.get(speaker)
+        if detector is None:
+            if len(self.detectors) >= self.max_speakers:
+                dropped, oldest = self.detectors.popitem(last=False)
+                logger.info(f"Too many speakers, no longer recording {dropped}.")
+                utterance = oldest.flush()
+                if utterance is not None:
+                    self._dropped.append(utterance)
+            detector = VoiceActivityDetector(speaker=speaker, **self.detector_options)
+            self.detectors[speaker] = detector
+        self.detectors.move_to_end(speaker)
+        return detector
+
+    def _take_dropped(self) -> List[Utterance]:
+        dropped, self._dropped = self._dropped, list()
+        return dropped
+
+    def feed(self, speaker: Hashable, pcm: bytes, now: Optional[float] = None) -> List[Utterance]:
+        utterances = self.detector(speaker).feed(pcm, now)
+        return self._take_dropped() + utterances
+
+    def flush(self, now: Optional[float] = None) -> List[Utterance]:
+        """
+        End the utterances in progress of every speaker.
+        """
+        utterances = [detector.flush(now) for detector in self.detectors.values()]
+        return self._take_dropped() + [utterance for utterance in utterances if utterance is not None]
+
+    def clear(self):
+        self.detectors.clear()
+        self._dropped.clear()
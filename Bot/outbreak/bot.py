@@ -2,18 +2,15 @@
 Entrypoint for connecting to discord and managing the communication back and forth.
 """
 import asyncio
-import base64
-import datetime
 import discord
-import json
 import logging
+from typing import List, Optional
 
 from discord.ext import tasks
 
-from outbreak.client import UE5RemoteControlClient, add_uepie_prefix
-from outbreak.prompts import RAGPromptGenerator
 from outbreak.rag import BedrockRAGClient
-from outbreak.models import RAGRequestPayload, Message, MessageContent, GameState, GameContext
+from outbreak.sessions import SessionConfig, SessionRegistry
+from outbreak.sharding import ShardManager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,39 +23,97 @@ class Bot(discord.Client):
     TODO: make a cog for UE5 remote and RAG requests
     """
 
-    def __init__(self, game_host: str, game_port: int, channel_name: str) -> None:
+    def __init__(self, game_host: Optional[str] = None, game_port: Optional[int] = None,
+                 channel_name: Optional[str] = None, sessions: Optional[List[SessionConfig]] = None,
+                 stream_responses: bool = True, debounce: float = 0.5, max_latency: float = 3.0,
+                 replica_id: Optional[str] = None, coordinator=None, shard_id: Optional[int] = None,
+                 shard_count: Optional[int] = None, pool_size: int = 1,
+                 response_cache_ttl: float = 120.0) -> None:
+        """
+        Args:
+            game_host (str): Host of a single game server, kept for running one session.
+            game_port (int): Port of that game server.
+            channel_name (str): Channel that talks to that game server.
+            sessions (list): Game sessions to drive, each bound to its own channel.
+            stream_responses (bool): Execute actions while the model response is streamed.
+            debounce (float): Seconds without new chat before a generation starts.
+            max_latency (float): Maximum seconds chat waits for its generation to start.
+            replica_id (str): Id of this replica, enables sharding the sessions together with a coordinator.
+            coordinator: Tracks the live replicas, see outbreak.sharding.
+            shard_id (int): Discord shard handled by this replica.
+            shard_count (int): Total number of Discord shards.
+            pool_size (int): Websocket connections per game server used for requests.
+            response_cache_ttl (float): Seconds a generated plan is replayed for the same request, 0 disables it.
+        """
         intents = discord.Intents.default()
         intents.guilds = True
         intents.messages = True
         intents.message_content = True
-        self.request_running = False
-
-        super().__init__(intents=intents)
 
-        self.channel_name = channel_name
-
-        self.backend = UE5RemoteControlClient(
-            hostname=game_host,
-            port=game_port
-        )
-
-        self.prompt_generator = RAGPromptGenerator()
+        super().__init__(intents=intents, shard_id=shard_id, shard_count=shard_count)
 
         self.rag = BedrockRAGClient(region_name="us-east-1")
 
+        self.sessions = SessionRegistry(
+            self.rag,
+            stream_responses=stream_responses,
+            debounce=debounce,
+            max_latency=max_latency,
+            pool_size=pool_size,
+            response_cache_ttl=response_cache_ttl)
+
+        session_configs = list(sessions or list())
+        if game_host and channel_name:
+            session_configs.insert(0, SessionConfig(
+                session_id=f"{game_host}:{game_port}",
+                channel_name=channel_name,
+                game_host=game_host,
+                game_port=game_port))
+
+        # With sharding the sessions are claimed by the replicas, otherwise this process drives all of them
+        self.shard_manager = None
+        if replica_id and coordinator:
+            self.shard_manager = ShardManager(
+                replica_id,
+                coordinator,
+                self.sessions,
+                session_configs,
+                shard_id=shard_id,
+                shard_count=shard_count)
+        else:
+            for session in session_configs:
+                self.sessions.add(session)
+
     @tasks.loop(seconds=30)
     async def periodic_task(self):
-        if not self.request_running:
-            self.prompt_generator.clear_chat_messages()
-
-            await self.do_some_stuff()
-
+        ticks = [(session, session.tick()) for session in self.sessions]
+        ticks = [(session, request) for session, request in ticks if request]
+        # A session stopped or failing meanwhile must not end the loop of every other session
+        results = await asyncio.gather(*[request for _, request in ticks], return_exceptions=True)
+        for (session, _), result in zip(ticks, results):
+            if isinstance(result, asyncio.CancelledError):
+                logger.info(f"Tick of session {session.session_id} was cancelled.")
+            elif isinstance(result, BaseException):
+                logger.error(f"Tick of session {session.session_id} failed: {result}")
 
     @periodic_task.before_loop
     async def before_periodic_task(self):
         logger.info("Waiting for the bot to get ready...")
         await self.wait_until_ready()  # Ensures the bot is ready before starting the task
 
+    @tasks.loop(seconds=10)
+    async def rebalance_task(self):
+        await self.shard_manager.rebalance()
+
+    async def close(self) -> None:
+        """
+        Hand over the sessions of this replica before shutting down.
+        """
+        if self.shard_manager:
+            self.rebalance_task.cancel()
+            await self.shard_manager.leave()
+        await super().close()
+
     async def on_ready(self) -> None:
         """
         Callback to do initial setup and gather information on the server connected to.
@@ -67,119 +122,17 @@ class Bot(discord.Client):
         for guild in self.guilds:
             for channel in guild.channels:
                 print(f"Guild: {guild} Channel: {channel}")
-        await self.backend.connect()
-        await self.periodic_task.start()
-
-    async def find_available_actions(self):
-        # NOTE: disabling due to description not loading well for all the function names
-        available_actions = await self.backend.get_remote_preset("SurvivalManagerPreset")
-
-    async def update_latest_game_state(self):
-        remote_object_path = add_uepie_prefix("/Game/LBG/Maps/L_LBG_Medow.L_LBG_Medow:PersistentLevel.B_RemoteCaller_C_1")
-        ue_response = await self.backend.call_object_function(remote_object_path, "GameState", {})
-
-        if ue_response.ResponseCode == 200:
-            self.prompt_generator.clear_contexts()
-            game_state = GameState.from_dict(ue_response.ResponseBody)
-            for bear_name, location in game_state.BearLocations.items():
-                self.prompt_generator.add_context(GameContext(context={"Bear": {"NameOrPath": bear_name, "Location": location}}))
-
-            for location_name in game_state.LocationNames:
-                self.prompt_generator.add_context(GameContext(context={"Location": location_name}))
-
-            self.prompt_generator.add_context(GameContext(context={"PlayerLocation": game_state.PlayerLocation}))
-            self.prompt_generator.add_context(GameContext(context={"PlayerAmmo": game_state.PlayerAmmo}))
-            self.prompt_generator.add_context(GameContext(context={"PlayerGrenades": game_state.PlayerGrenades}))
-            self.prompt_generator.add_context(GameContext(context={"PlayerHealth": game_state.PlayerHealth}))
+        if self.shard_manager:
+            await self.shard_manager.rebalance()
+            self.rebalance_task.start()
         else:
-            logger.error(f"Unable to load game state! {ue_response}")
-
-    async def generate_content_with_thumbnail(self, object_path: str, title: str, image_alt: str):
-        timeout = 5.0
-        response = await self.backend.get_object_thumbnail(object_path=object_path, timeout=timeout)
-        with open("thumbnail.png", "wb") as f:
-            f.write(base64.b64decode(response["ResponseBody"]))
-
-        embed = discord.Embed(title=title, description=image_alt, color=discord.Color.blue())
-        file = discord.File("./thumbnail.png", filename="image.png")
-        embed.set_image(url="attachment://image.png")
-
-        return (file, embed)
-
-    async def do_some_stuff(self):
-        self.request_running = True
-
-        await self.find_available_actions()
-        await self.update_latest_game_state()
-
-        prompt = self.prompt_generator.generate_prompt()
-
-        model_id = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
-        rag_request_payload = RAGRequestPayload(
-            anthropic_version="bedrock-2023-05-31",
-            max_tokens=2048,
-            top_k=250,
-            temperature=0.5,
-            top_p=0.7,
-            messages=[
-                Message(
-                    role="user",
-                    content=[
-                        MessageContent(
-                            type="text",
-                            text=prompt
-                        )
-                    ]
-                )
-            ]
-        )
-
-        response = self.rag.make_rag_request(model_id=model_id, rag_request_payload=rag_request_payload)
-        notes = list()
-        for content in response.content:
-            if content.type == "text":
-                parsed = json.loads(content.text)
-                if parsed["Header"]["Notes"]:
-                    notes.append(parsed["Header"]["Notes"])
-
-                remote_object_path = add_uepie_prefix("/Game/LBG/Maps/L_LBG_Medow.L_LBG_Medow:PersistentLevel.B_RemoteCaller_C_1")
-
-                for action in parsed["Actions"]:
-                    logger.info(action)
-                    ue_response = None
-                    if action["Name"] == "Chat":
-                        self.prompt_generator.add_previous_message(action["Arg1"])
-                        ue_response = await self.backend.call_object_function(remote_object_path, "Chat", {"Arg1": action["Arg1"]})
-                    elif action["Name"] == "Spawn":
-                        ue_response = await self.backend.call_object_function(
-                            remote_object_path,
-                            "Spawn",
-                            {"Arg1": action["Arg1"], "Arg2": action["Arg2"]})
-                    elif action["Name"] == "TeleportPlayer":
-                        ue_response = await self.backend.call_object_function(
-                            remote_object_path,
-                            "TeleportPlayer",
-                            {"Arg1": action["Arg1"], "Arg2": action["Arg2"]})
-                    elif action["Name"] == "MoveTo":
-                        ue_response = await self.backend.call_object_function(
-                            remote_object_path,
-                            "MoveTo",
-                            {"Arg1": action["Arg1"], "Arg2": action["Arg2"]})
-                    elif action["Name"] == "Wait":
-                        wait_time = action["Arg1"]
-                        if type(wait_time) is str:
-                            wait_time = float(wait_time)
-
-                        await asyncio.sleep(wait_time)
-                    
-                    if ue_response and not ue_response.ResponseCode == 200:
-                        logger.error(f"Failed to call function in UE: {ue_response}")
-                        notes.append(ue_response)
-
-
-
-        self.request_running = False
-        return notes
+            sessions = list(self.sessions)
+            connections = await asyncio.gather(*[session.connect() for session in sessions], return_exceptions=True)
+            for session, connection in zip(sessions, connections):
+                if isinstance(connection, Exception):
+                    logger.error(f"Unable to connect session {session.session_id}: {connection}")
+
+        await self.periodic_task.start()
 
     async def on_message(self, message: discord.Message) -> None:
         """
@@ -187,11 +140,9 @@ class Bot(discord.Client):
         """
         if not message.author == self.user \
                 and not message.author.bot \
-                and message.channel.type == discord.ChannelType.text \
-                and message.channel.name == "bottest":
-
-            self.prompt_generator.add_chat_message(message.clean_content, message.created_at)
-            notes = await self.do_some_stuff()
+                and message.channel.type == discord.ChannelType.text:
 
-            if notes:
-                await message.channel.send(" ".join(notes))
+            guild_id = message.guild.id if message.guild else None
+            session = self.sessions.find(guild_id, message.channel.name)
+            if session:
+                session.add_chat_message(message)
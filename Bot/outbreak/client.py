@@ -5,127 +5,352 @@ This module provides a WebSocket client implementation for interacting with the
 Remote Control API. The client enables connecting to a WebSocket server, registering and unregistering
 for Remote Control presets, writing AI stimuli, and listening for updates related to presets.
 
+Responses are correlated to their requests by RequestId, which allows many requests to be in
+flight on a single connection. A single background reader task owns the socket, resolving
+pending requests and forwarding preset push events to subscribers.
+
+The connection is supervised: when the socket drops, requests in flight fail right away since the
+server won't answer them on a new socket, and the client reconnects with jittered exponential
+backoff and registers its presets again. Requests sent while reconnecting wait for the connection
+within their own timeout.
+
 Classes:
     UE5RemoteControlClient: A class for managing WebSocket connections and interacting with
                             the Unreal Engine 5 Remote Control API.
 """
 import asyncio
-import json
 import logging
+import random
 import re
+import time
 import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
 import websockets
 from websockets.exceptions import ConnectionClosedError, InvalidURI, InvalidHandshake
 
-from outbreak import models
+from outbreak import codec, models, schemas
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# UE5 stores the RequestId of a websocket http message as an int32, ids outside this range are
+# not echoed back intact and can't be used to correlate responses.
+MAX_REQUEST_ID = 0x7FFFFFFF
+
+PresetCallback = Callable[[Union[models.RootObject, models.PresetFieldsChanged]], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class ConnectionHealth:
+    """
+    Snapshot of the state of a supervised connection.
+    """
+    connected: bool
+    reconnecting: bool
+    reconnects: int
+    failed_attempts: int
+    connected_since: Optional[float] = None
+    last_error: Optional[str] = None
+
 
 class UE5RemoteControlClient:
     """
     A class to handle asynchronous WebSocket connections to the Unreal Engine 5 Remote Control server.
     """
 
-    def __init__(self, hostname: str, port: int):
+    def __init__(self, hostname: str, port: int, reconnect: bool = True, min_backoff: float = 0.5,
+                 max_backoff: float = 30.0, queue_while_reconnecting: bool = True):
         """
         Initialize the WebSocket client with the given hostname and port.
 
         Args:
             hostname (str): The hostname of the WebSocket server.
             port (int): The port of the WebSocket server.
+            reconnect (bool): Reconnect automatically when the connection drops or can't be opened.
+            min_backoff (float): Upper bound in seconds of the delay before the first reconnect attempt.
+            max_backoff (float): Upper bound in seconds of the delay between reconnect attempts.
+            queue_while_reconnecting (bool): Hold requests until reconnected instead of failing them at once.
         """
         self.hostname = hostname
         self.port = port
         self.uri = f"ws://{hostname}:{port}"
         self.websocket = None
 
+        self.reconnect = reconnect
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.queue_while_reconnecting = queue_while_reconnecting
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self.connected_since: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._connected = asyncio.Event()
+        self._closing = False
+        self._supervisor_task: Optional[asyncio.Task] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = dict()
+        self._preset_subscribers: Dict[str, List[PresetCallback]] = dict()
+        self._listeners: Set[asyncio.Queue] = set()
+        self._callback_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    @property
+    def reconnecting(self) -> bool:
+        return self._supervisor_task is not None and not self._supervisor_task.done()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Requests sent and still waiting for their response.
+        """
+        return len(self._pending)
+
+    @property
+    def health(self) -> ConnectionHealth:
+        return ConnectionHealth(
+            connected=self.connected,
+            reconnecting=self.reconnecting,
+            reconnects=self.reconnects,
+            failed_attempts=self.failed_attempts,
+            connected_since=self.connected_since,
+            last_error=self.last_error)
+
     async def connect(self):
         """
         Connect to the WebSocket server.
+
+        When reconnecting is enabled a failed attempt keeps retrying in the background, the error
+        is still raised to the caller.
         """
+        self._closing = False
         try:
-            self.websocket = await websockets.connect(self.uri)
-            logger.info(f"Connected to WebSocket server at {self.uri}")
+            await self._open()
         except InvalidURI:
             logger.error(f"Invalid WebSocket URI: {self.uri}")
             raise
-        except InvalidHandshake:
+        except InvalidHandshake as e:
             logger.error(f"Handshake failed while connecting to {self.uri}")
+            self._connection_failed(e)
             raise
-        except ConnectionRefusedError:
+        except ConnectionRefusedError as e:
             logger.error(f"Connection refused by the server at {self.uri}")
+            self._connection_failed(e)
             raise
         except Exception as e:
             logger.error(f"An unexpected error occurred while connecting: {e}")
+            self._connection_failed(e)
             raise
 
+    async def _open(self):
+        """
+        Open the socket, start the reader and register every subscribed preset.
+        """
+        self.websocket = await websockets.connect(self.uri)
+        logger.info(f"Connected to WebSocket server at {self.uri}")
+        self._reader_task = asyncio.create_task(self._read_messages())
+        self.connected_since = time.time()
+        self._connected.set()
+
+        for preset_name in list(self._preset_subscribers):
+            await self._send_registration(preset_name)
+
+    def _connection_failed(self, error: Exception):
+        self.failed_attempts += 1
+        self.last_error = str(error)
+        self._supervise()
+
+    def _supervise(self):
+        """
+        Start reconnecting in the background unless disabled, closing or already reconnecting.
+        """
+        if not self.reconnect or self._closing or self.reconnecting:
+            return
+        self._supervisor_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        attempt = 0
+        while not self._closing and not self.connected:
+            # Full jitter, so sessions dropped by the same server recycle don't reconnect in lockstep
+            delay = random.uniform(0, min(self.max_backoff, self.min_backoff * 2 ** attempt))
+            attempt += 1
+            logger.info(f"Reconnecting to {self.uri} in {delay:.1f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+            if self._closing:
+                return
+
+            try:
+                await self._open()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_attempts += 1
+                self.last_error = str(e)
+                logger.warning(f"Reconnect attempt {attempt} to {self.uri} failed: {e}")
+                continue
+
+            self.reconnects += 1
+            self.failed_attempts = 0
+            logger.info(f"Reconnected to {self.uri} after {attempt} attempts")
+
     def generate_request_id(self) -> int:
         """
-        Generate a unique UUID and return it as an integer.
+        Generate a unique UUID and return it as an integer that fits in UE5's int32 RequestId.
 
         Returns:
-            int: A unique request ID based on a UUID.
+            int: A unique request ID based on a UUID which isn't currently in flight.
         """
-        unique_id = uuid.uuid4()  # Generate a unique UUID
-        request_id = unique_id.int  # Convert the UUID to an integer
-        return request_id
+        while True:
+            unique_id = uuid.uuid4()  # Generate a unique UUID
+            request_id = unique_id.int & MAX_REQUEST_ID  # Truncate the UUID to a positive int32
+            if request_id not in self._pending:
+                return request_id
 
-    async def register_preset(self, preset_name: str, message_callback):
+    async def register_preset(self, preset_name: str, message_callback: PresetCallback):
         """
-        Register to a Remote Control Preset on the server and start listening for messages.
+        Register to a Remote Control Preset on the server and subscribe to its updates.
+
+        The callback is invoked by the background reader for every PresetEntitiesModified and
+        PresetFieldsChanged message of the preset, this call returns once the registration has been sent.
+        Subscribed presets are registered again every time the client (re)connects.
 
         Args:
             preset_name (str): The name of the preset to register.
-            message_callback (function): A callback function to execute for each message.
+            message_callback (function): A coroutine function to execute for each message.
         """
-        if not self.websocket:
-            logger.error("WebSocket is not connected. Please connect first.")
+        self._preset_subscribers.setdefault(preset_name, list()).append(message_callback)
+        if not self.connected:
+            logger.info(f"WebSocket is not connected, {preset_name} will be registered once connected.")
             return
+
+        try:
+            await self._send_registration(preset_name)
+        except ConnectionClosedError as e:
+            logger.error(f"Connection closed unexpectedly: {e}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred: {e}")
+
+    async def _send_registration(self, preset_name: str):
         message = models.WebsocketRequest(
             MessageName="preset.register",
             Parameters={
                 "PresetName": preset_name
             }
         )
+        await self.websocket.send(message.to_json())
+        logger.info(f"Sent registration message: {message}")
+        logger.info(f"Listening for updates to preset: {preset_name}")
 
-        try:
-            await self.websocket.send(message.to_json())
-            logger.info(f"Sent registration message: {message}")
+    async def on_message(self, max_queued: int = 256):
+        """
+        Listen for unsolicited messages on the WebSocket and yield them to the caller.
 
-            # Start listening for messages about the preset
-            logger.info(f"Listening for updates to preset: {preset_name}")
-            async for preset_message in self.on_message():
-                await message_callback(preset_message)
+        Responses to requests are delivered to their callers and are not yielded here.
 
-        except ConnectionClosedError as e:
-            logger.error(f"Connection closed unexpectedly: {e}")
-        except Exception as e:
-            logger.error(f"An unexpected error occurred: {e}")
-
-    async def on_message(self):
-        """
-        Listen for new messages on the WebSocket and yield them to the caller.
+        Args:
+            max_queued (int): Messages buffered for a slow listener before new ones are dropped.
 
         Yields:
-            dict: The parsed JSON message received from the WebSocket.
+            models.RootObject | models.PresetFieldsChanged | dict: Preset push events or other parsed JSON messages.
+        """
+        queue = asyncio.Queue(maxsize=max_queued)
+        self._listeners.add(queue)
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                yield message
+        finally:
+            self._listeners.discard(queue)
+
+    async def _read_messages(self):
+        """
+        Background task which owns the socket's receive side and routes every message.
         """
         try:
             async for message in self.websocket:
                 try:
-                    parsed_message = json.loads(message)
-                    if parsed_message.get("Type") == "PresetEntitiesModified":
-                        yield models.RootObject.from_dict(parsed_message)
-                    else:
-                        yield parsed_message
-
-                except json.JSONDecodeError:
+                    parsed_message = codec.loads(message)
+                except ValueError:
                     logger.warning(f"Failed to decode message: {message}")
+                    continue
+
+                try:
+                    self._route_message(parsed_message)
+                except Exception as e:
+                    logger.error(f"Failed to route message {parsed_message}: {e}")
         except ConnectionClosedError as e:
             logger.error(f"Connection closed unexpectedly while listening for messages: {e}")
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"An unexpected error occurred while listening for messages: {e}")
+        finally:
+            self._connected.clear()
+            if self.reconnect and not self._closing:
+                self._fail_pending()
+                self.last_error = f"Connection to {self.uri} was lost."
+                self._supervise()
+            else:
+                self._close_pending()
+
+    def _route_message(self, parsed_message: Dict[str, Any]):
+        """
+        Resolve the pending request a message answers or publish it to the subscribers.
+
+        Args:
+            parsed_message (dict): The decoded JSON message.
+        """
+        schema = schemas.PRESET_SCHEMAS.schema_for(parsed_message)
+        if schema is not None:
+            preset_message = schema.decode(parsed_message)
+            for callback in self._preset_subscribers.get(preset_message.PresetName, list()):
+                task = asyncio.create_task(callback(preset_message))
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_tasks.discard)
+            self._publish(preset_message)
+            return
+
+        future = self._pending.get(parsed_message.get("RequestId"))
+        if future is not None:
+            if not future.done():
+                future.set_result(parsed_message)
+            return
+
+        logger.debug(f"Received unsolicited message: {parsed_message}")
+        self._publish(parsed_message)
+
+    def _publish(self, message):
+        for queue in self._listeners:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("Listener queue is full, dropping message.")
+
+    def _fail_pending(self):
+        """
+        Fail every in-flight request, their responses can't arrive on another socket.
+        """
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"Connection to {self.uri} was closed."))
+        self._pending.clear()
+
+    def _close_pending(self):
+        """
+        Fail every in-flight request and stop the listeners once the client is closed for good.
+        """
+        self._fail_pending()
+
+        for queue in self._listeners:
+            while queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
 
     async def unregister_preset(self, preset_name: str):
         """
@@ -134,6 +359,7 @@ class UE5RemoteControlClient:
         Args:
             preset_name (str): The name of the preset to unregister.
         """
+        self._preset_subscribers.pop(preset_name, None)
         message = models.WebsocketRequest(
             MessageName="preset.unregister",
             Parameters={
@@ -165,7 +391,7 @@ class UE5RemoteControlClient:
             )
         )
 
-        return await self.make_request(message.to_json(), timeout=timeout)
+        return await self.make_request(message.to_json(), timeout=timeout, request_id=request_id)
 
     async def write_object_property(self, object_path: str, property_name: str, value: float):
         """
@@ -191,7 +417,7 @@ class UE5RemoteControlClient:
                 }
             )
         )
-        return await self.make_request(message.to_json())
+        return await self.make_request(message.to_json(), request_id=request_id)
 
     async def get_object_thumbnail(self, object_path: str, timeout: float = 5.0):
         """
@@ -220,7 +446,7 @@ class UE5RemoteControlClient:
             )
         )
 
-        return await self.make_request(message.to_json(), timeout=timeout)
+        return await self.make_request(message.to_json(), timeout=timeout, request_id=request_id)
 
     async def call_object_function(self, object_path: str, function_name: str, parameters: dict, timeout: float = 5.0):
         """
@@ -230,6 +456,9 @@ class UE5RemoteControlClient:
             object_path (str): The path of the object to query.
             function_name (str): The name of the function to call.
             parameters (dict): The parameters to pass to the function.
+
+        Returns:
+            models.WebsocketResponse: The response, None when it timed out or the connection was lost.
         """
         request_id = self.generate_request_id()
         message = models.WebsocketHttpRequest(
@@ -247,15 +476,50 @@ class UE5RemoteControlClient:
             )
         )
 
-        response = await self.make_request(message.to_json(), timeout=timeout)
+        response = await self.make_request(message.to_json(), timeout=timeout, request_id=request_id)
+        if response is None:
+            return None
         return models.WebsocketResponse.from_dict(response)
 
-    async def batch_request(self, requests):
+    async def call_preset_function(self, preset_name: str, function_label: str, parameters: dict,
+                                   timeout: float = 5.0):
+        """
+        Send a request to call a function exposed on a Remote Control Preset.
+
+        Args:
+            preset_name (str): The name of the preset exposing the function.
+            function_label (str): The display name of the function in the preset.
+            parameters (dict): The parameters to pass to the function.
+
+        Returns:
+            models.WebsocketResponse: The response, None when it timed out or the connection was lost.
+        """
+        request_id = self.generate_request_id()
+        message = models.WebsocketHttpRequest(
+            MessageName="http",
+            Parameters=models.Parameters(
+                RequestId=request_id,
+                Url=f"/remote/preset/{preset_name}/function/{function_label}",
+                Verb="PUT",
+                Body={
+                    "Parameters": parameters,
+                    "GenerateTransaction": False
+                }
+            )
+        )
+
+        response = await self.make_request(message.to_json(), timeout=timeout, request_id=request_id)
+        if response is None:
+            return None
+        return models.WebsocketResponse.from_dict(response)
+
+    async def batch_request(self, requests, timeout: float = 5.0):
         """
         Send a batch of requests to the WebSocket server.
 
         Args:
             requests (list): A list of dictionaries representing the requests to send.
+            timeout (float): The maximum time to wait for the batch response, in seconds.
         """
         request_id = self.generate_request_id()
         message = models.WebsocketHttpRequest(
@@ -270,7 +534,7 @@ class UE5RemoteControlClient:
             )
         )
 
-        return await self.make_request(message.to_json())
+        return await self.make_request(message.to_json(), timeout=timeout, request_id=request_id)
 
     async def get_remote_preset(self, preset_name: str):
         """
@@ -278,6 +542,9 @@ class UE5RemoteControlClient:
 
         Args:
             preset_name (str): The name of the preset to retrieve.
+
+        Returns:
+            models.PresetResponseBody: The preset, None when it timed out or the connection was lost.
         """
         request_id = self.generate_request_id()
         message = models.WebsocketHttpRequest(
@@ -291,49 +558,94 @@ class UE5RemoteControlClient:
             )
         )
 
-        raw_response = models.WebsocketResponse.from_dict(await self.make_request(message.to_json()))
+        response = await self.make_request(message.to_json(), request_id=request_id)
+        if response is None:
+            return None
+        raw_response = models.WebsocketResponse.from_dict(response)
         preset = models.PresetResponseBody.from_dict(raw_response.ResponseBody)
 
         return preset
 
-    async def make_request(self, request: str, timeout: float = 5.0) -> str:
+    async def make_request(self, request: str, timeout: float = 5.0, request_id: Optional[int] = None) -> dict:
         """
         Send a request to the WebSocket server and return the response.
 
+        Requests are correlated by id, so any number of them can be awaited concurrently.
+        Messages without a request id (preset.register, preset.unregister) get no response.
+
         Args:
             request (str): The request to send.
             timeout (float): Amount of time to wait before cancelling.
+            request_id (int): The RequestId embedded in the request, used to match the response.
 
         Returns:
-            str: The response from the WebSocket server.
+            dict: The parsed response from the WebSocket server.
         """
-        if not self.websocket:
-            logger.error("WebSocket is not connected. Please connect first.")
-            raise Exception("WebSocket is not connected. Please connect first.")
+        if not self.connected:
+            if not self.reconnecting:
+                logger.error("WebSocket is not connected. Please connect first.")
+                raise Exception("WebSocket is not connected. Please connect first.")
+            if not self.queue_while_reconnecting:
+                logger.error(f"Reconnecting to {self.uri}, failing request.")
+                return None
+
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Not reconnected to {self.uri} within {timeout}s, failing request.")
+                return None
+            timeout = max(timeout - (time.monotonic() - start), 0)
+
+        future = None
+        if request_id is not None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
 
         try:
             await self.websocket.send(request)
             logger.debug(f"Sent request: {request}")
-            response = await asyncio.wait_for(self.websocket.recv(), timeout=timeout)
+            if future is None:
+                return None
+
+            response = await asyncio.wait_for(future, timeout=timeout)
             logger.debug(f"Received response: {response}")
-            return json.loads(response)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse response as JSON: {e}")
+            return response
         except asyncio.TimeoutError:
             logger.error(f"Timeout occurred while waiting for response (timeout={timeout}s).")
         except ConnectionClosedError as e:
             logger.error(f"Connection closed unexpectedly: {e}")
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
+        finally:
+            if request_id is not None:
+                self._pending.pop(request_id, None)
 
         return None
 
     async def disconnect(self):
         """
-        Disconnect from the WebSocket server.
+        Disconnect from the WebSocket server and stop reconnecting.
         """
+        self._closing = True
+        if self._supervisor_task:
+            self._supervisor_task.cancel()
+            try:
+                await self._supervisor_task
+            except asyncio.CancelledError:
+                pass
+            self._supervisor_task = None
+
         if self.websocket:
             await self.websocket.close()
+            if self._reader_task:
+                self._reader_task.cancel()
+                try:
+                    await self._reader_task
+                except asyncio.CancelledError:
+                    pass
+                self._reader_task = None
+            self._close_pending()
             logger.info("Disconnected from WebSocket server.")
         else:
             logger.warning("WebSocket was not connected.")
@@ -0,0 +1,242 @@
+"""
+Fast path serialization for the dataclass models.
+
+dataclasses_json inspects the fields and type hints of a model on every call to_json/from_dict. The
+codec compiles an encoder and a decoder per class once, from the same type hints, and uses orjson
+when it's installed with the standard json module as the fallback.
+
+Compiled models keep the dataclasses_json API, install() only swaps the implementation of to_dict,
+to_json, from_dict and from_json. Calls using extra keyword arguments (indent, infer_missing, ...)
+still go through dataclasses_json.
+"""
+import dataclasses
+import datetime
+import json
+import typing
+from typing import Any, Callable, Dict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+Encoder = Callable[[Any], Any]
+Decoder = Callable[[Any], Any]
+
+_encoders: Dict[type, Encoder] = dict()
+_decoders: Dict[type, Decoder] = dict()
+
+
+def dumps(value: Any) -> str:
+    """
+    Serialize JSON compatible values to a JSON string.
+    """
+    if orjson:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value)
+
+
+def loads(text) -> Any:
+    """
+    Parse a JSON string or bytes.
+    """
+    if orjson:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _identity(value):
+    return value
+
+
+def _optional(inner: Callable) -> Callable:
+    def convert(value):
+        return None if value is None else inner(value)
+    return convert
+
+
+def _scalar_decoder(kind: type) -> Decoder:
+    # Same coercion as dataclasses_json for values sent with the wrong JSON type ("3" for an int)
+    def decode(value):
+        return value if type(value) is kind or value is None else kind(value)
+    return decode
+
+
+def _unwrap_optional(hint):
+    if typing.get_origin(hint) is typing.Union:
+        arguments = [argument for argument in typing.get_args(hint) if argument is not type(None)]
+        if len(arguments) == 1:
+            return arguments[0], True
+    return hint, False
+
+
+def _type_encoder(hint) -> Encoder:
+    hint, optional = _unwrap_optional(hint)
+    origin = typing.get_origin(hint)
+    arguments = typing.get_args(hint)
+
+    if dataclasses.is_dataclass(hint):
+        encoder = lambda value: encoder_for(hint)(value)
+    elif origin in (list, typing.List) and arguments:
+        item = _type_encoder(arguments[0])
+        if item is _identity:
+            return _identity
+        encoder = lambda value: [item(element) for element in value]
+    elif origin in (dict, typing.Dict) and len(arguments) == 2:
+        item = _type_encoder(arguments[1])
+        if item is _identity:
+            return _identity
+        encoder = lambda value: {key: item(element) for key, element in value.items()}
+    elif hint is datetime.datetime:
+        encoder = lambda value: value.timestamp()
+    else:
+        return _identity
+
+    return _optional(encoder) if optional else encoder
+
+
+def _type_decoder(hint) -> Decoder:
+    hint, optional = _unwrap_optional(hint)
+    origin = typing.get_origin(hint)
+    arguments = typing.get_args(hint)
+
+    if dataclasses.is_dataclass(hint):
+        decoder = lambda value: decoder_for(hint)(value)
+    elif origin in (list, typing.List) and arguments:
+        item = _type_decoder(arguments[0])
+        if item is _identity:
+            return _identity
+        decoder = lambda value: [item(element) for element in value]
+    elif origin in (dict, typing.Dict) and len(arguments) == 2:
+        item = _type_decoder(arguments[1])
+        if item is _identity:
+            return _identity
+        decoder = lambda value: {key: item(element) for key, element in value.items()}
+    elif hint is datetime.datetime:
+        decoder = lambda value: value if isinstance(value, datetime.datetime) else datetime.datetime.fromtimestamp(
+            value, tz=datetime.datetime.now(datetime.timezone.utc).astimezone().tzinfo)
+    elif hint in (int, float, str, bool):
+        return _scalar_decoder(hint)
+    else:
+        return _identity
+
+    return _optional(decoder) if optional else decoder
+
+
+def _excluded(field: dataclasses.Field) -> Callable:
+    return field.metadata.get("dataclasses_json", dict()).get("exclude")
+
+
+def encoder_for(cls: type) -> Encoder:
+    """
+    The compiled encoder of a dataclass, turning an instance into JSON compatible values.
+    """
+    encoder = _encoders.get(cls)
+    if encoder is not None:
+        return encoder
+
+    hints = typing.get_type_hints(cls)
+    fields = [(field.name, _type_encoder(hints[field.name]), _excluded(field)) for field in dataclasses.fields(cls)]
+    plain = all(field_encoder is _identity and exclude is None for _, field_encoder, exclude in fields)
+
+    if plain:
+        names = [name for name, _, _ in fields]
+
+        def encode(instance):
+            return {name: getattr(instance, name) for name in names}
+    else:
+        def encode(instance):
+            encoded = dict()
+            for name, field_encoder, exclude in fields:
+                value = getattr(instance, name)
+                if exclude is not None and exclude(value):
+                    continue
+                encoded[name] = field_encoder(value)
+            return encoded
+
+    _encoders[cls] = encode
+    return encode
+
+
+def decoder_for(cls: type) -> Decoder:
+    """
+    The compiled decoder of a dataclass, building an instance from parsed JSON.
+    """
+    decoder = _decoders.get(cls)
+    if decoder is not None:
+        return decoder
+
+    hints = typing.get_type_hints(cls)
+    required = list()
+    optional = list()
+    for field in dataclasses.fields(cls):
+        if not field.init:
+            continue
+        field_decoder = _type_decoder(hints[field.name])
+        if field.default is not dataclasses.MISSING or field.default_factory is not dataclasses.MISSING:
+            optional.append((field.name, field_decoder))
+        else:
+            required.append((field.name, field_decoder))
+
+    def decode(data):
+        arguments = {name: field_decoder(data[name]) for name, field_decoder in required}
+        for name, field_decoder in optional:
+            if name in data:
+                arguments[name] = field_decoder(data[name])
+        return cls(**arguments)
+
+    _decoders[cls] = decode
+    return decode
+
+
+def encode(instance) -> str:
+    """
+    Serialize a dataclass instance to a JSON string.
+    """
+    return dumps(encoder_for(type(instance))(instance))
+
+
+def decode(cls: type, text):
+    """
+    Build a dataclass instance from a JSON string or bytes.
+    """
+    return decoder_for(cls)(loads(text))
+
+
+def install(*classes: type):
+    """
+    Swap the dataclasses_json methods of the classes for the compiled codec.
+
+    Args:
+        classes: dataclass_json models.
+    """
+    for cls in classes:
+        encoder = encoder_for(cls)
+        decoder = decoder_for(cls)
+        original_to_dict = cls.to_dict
+        original_to_json = cls.to_json
+        original_from_dict = cls.from_dict.__func__
+        original_from_json = cls.from_json.__func__
+
+        def to_dict(self, encode_json=False, _encoder=encoder, _original=original_to_dict):
+            return _encoder(self) if not encode_json else _original(self, encode_json=encode_json)
+
+        def to_json(self, *args, _encoder=encoder, _original=original_to_json, **kwargs):
+            return dumps(_encoder(self)) if not args and not kwargs else _original(self, *args, **kwargs)
+
+        def from_dict(cls, kvs, *, infer_missing=False, _decoder=decoder, _original=original_from_dict):
+            return _decoder(kvs) if not infer_missing else _original(cls, kvs, infer_missing=infer_missing)
+
+        def from_json(cls, s, *, parse_float=None, parse_int=None, parse_constant=None, infer_missing=False,
+                      _decoder=decoder, _original=original_from_json, **kw):
+            if parse_float or parse_int or parse_constant or infer_missing or kw:
+                return _original(cls, s, parse_float=parse_float, parse_int=parse_int,
+                                 parse_constant=parse_constant, infer_missing=infer_missing, **kw)
+            return _decoder(loads(s))
+
+        cls.to_dict = to_dict
+        cls.to_json = to_json
+        cls.from_dict = classmethod(from_dict)
+        cls.from_json = classmethod(from_json)
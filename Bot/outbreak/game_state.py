@@ -0,0 +1,169 @@
+"""
+Cached game state kept up to date by preset push events.
+
+Instead of asking the game for its whole state before every generation, the cache keeps the last
+GameState and applies the values pushed in PresetFieldsChanged messages. Fields exposed on the preset
+with the same label as a GameState field (PlayerHealth, PlayerAmmo, ...) are updated in place, bear
+locations are keyed by the object path of the pushed field and other labels are ignored.
+
+PresetEntitiesModified messages carry which exposed entities changed but no values. Entities bound to
+a GameState field the cache can't update from the push, a scalar or a bear it doesn't know yet, mark it
+stale and start a refresh in the background, at most one per refresh interval however many pushes come
+in. The last state is served meanwhile, a full GameState call is only awaited by a generation on a
+cache miss or once the cached state is older than the max age and no refresh is running.
+"""
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Union
+
+from outbreak import models
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Scalar GameState fields which can be overwritten by a pushed value, with their type.
+SCALAR_FIELDS = {
+    "PlayerLocation": str,
+    "PlayerAmmo": int,
+    "PlayerGrenades": int,
+    "PlayerHealth": float,
+}
+
+BEAR_LOCATIONS_FIELD = "BearLocations"
+
+
+class GameStateCache:
+    """
+    Last known game state of a session, refreshed from pushes and fetched when stale.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[Optional[models.GameState]]], max_age: float = 15.0,
+                 refresh_interval: float = 5.0):
+        """
+        Args:
+            fetch (function): Coroutine function loading the full state from the game, None on failure.
+            max_age (float): Seconds after the last full fetch before the state is fetched again.
+            refresh_interval (float): Minimum seconds between two background refreshes started by pushes.
+        """
+        self.fetch = fetch
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+
+        self.state: Optional[models.GameState] = None
+        self.stale = False
+        self.fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.applied_deltas = 0
+
+        self._fetching: Optional[asyncio.Task] = None
+        self._scheduled: Optional[asyncio.TimerHandle] = None
+        self._refresh_started_at = float("-inf")
+
+    @property
+    def fresh(self) -> bool:
+        return self.state is not None and not self.stale and time.monotonic() - self.fetched_at < self.max_age
+
+    @property
+    def refreshing(self) -> bool:
+        return self._fetching is not None and not self._fetching.done()
+
+    def invalidate(self):
+        """
+        Mark the state stale and refresh it in the background, at most once per refresh interval.
+        """
+        self.stale = True
+        if not self.refreshing:
+            self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._scheduled is not None:
+            return
+        delay = max(0.0, self._refresh_started_at + self.refresh_interval - time.monotonic())
+        self._scheduled = asyncio.get_running_loop().call_later(delay, self._scheduled_refresh)
+
+    def _scheduled_refresh(self):
+        self._scheduled = None
+        if self.stale and not self.refreshing:
+            self._start_refresh()
+
+    def _start_refresh(self) -> asyncio.Task:
+        self._refresh_started_at = time.monotonic()
+        self._fetching = asyncio.create_task(self._refresh())
+        return self._fetching
+
+    async def get(self) -> Optional[models.GameState]:
+        """
+        The current game state, fetched only when the cached one is missing or too old.
+
+        The last state is returned while a refresh is running, concurrent misses share a single fetch.
+        """
+        if self.state is not None and (self.refreshing or time.monotonic() - self.fetched_at < self.max_age):
+            self.hits += 1
+            return self.state
+
+        self.misses += 1
+        fetching = self._fetching if self.refreshing else self._start_refresh()
+        return await asyncio.shield(fetching)
+
+    async def _refresh(self) -> Optional[models.GameState]:
+        # Pushes arriving while the fetch is in flight mark the state stale again
+        self.stale = False
+        state = await self.fetch()
+        if state is not None:
+            self.state = state
+            self.fetched_at = time.monotonic()
+        if self.stale:
+            self._schedule_refresh()
+        return state
+
+    async def on_preset_message(self, message: Union[models.RootObject, models.PresetFieldsChanged]):
+        """
+        Preset subscription callback applying pushed changes to the cached state.
+        """
+        if isinstance(message, models.PresetFieldsChanged):
+            for changed_field in message.ChangedFields:
+                self.apply(changed_field)
+        elif any(self.needs_refresh(entity) for entity in message.ModifiedEntities.ModifiedRCProperties):
+            logger.debug(f"Preset {message.PresetName} entities of the game state changed, refreshing it.")
+            self.invalidate()
+
+    def needs_refresh(self, entity: models.ModifiedRCProperty) -> bool:
+        """
+        Whether a modified entity changes the cached state in a way only a fetch can tell.
+        """
+        label = entity.DisplayName
+        if label in SCALAR_FIELDS:
+            return True
+        if label == BEAR_LOCATIONS_FIELD and self.state is not None:
+            return any(owner.Path not in self.state.BearLocations for owner in entity.OwnerObjects)
+        return False
+
+    def apply(self, changed_field: models.ChangedField):
+        """
+        Apply a single pushed value, invalidating the cache when a known field can't be applied.
+        """
+        if self.state is None or self.stale:
+            return
+
+        label = changed_field.PropertyLabel
+        value = changed_field.PropertyValue
+        try:
+            if label in SCALAR_FIELDS:
+                self.state = dataclasses.replace(self.state, **{label: SCALAR_FIELDS[label](value)})
+            elif label == BEAR_LOCATIONS_FIELD:
+                if not changed_field.ObjectPath or not isinstance(value, str):
+                    raise ValueError("Bear locations need an object path and a location name")
+                bear_locations = dict(self.state.BearLocations)
+                bear_locations[changed_field.ObjectPath] = value
+                self.state = dataclasses.replace(self.state, BearLocations=bear_locations)
+            else:
+                return
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid value for {label}: {value}")
+            self.invalidate()
+            return
+
+        self.applied_deltas += 1
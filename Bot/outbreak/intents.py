@@ -0,0 +1,157 @@
+"""
+Rule based fast path for chat commands which map to a single built-in action.
+
+"spawn a bear at the pond" or "teleport me to the van" don't need the model, the intent matcher
+recognizes them from a keyword index over the action verbs, the objects and the locations built
+once up front, and the session dispatches the actions right away. Only commands are matched, the
+message has to start with the verb and can't be a question. Anything the matcher isn't sure about
+(no location, two objects, a negation, a delay, ...) is left to the LLM.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+from outbreak.registry import LOCATIONS, SPAWNABLE_OBJECTS
+
+SPAWN_VERBS = frozenset({"spawn", "summon", "drop", "add", "release", "more", "unleash"})
+TELEPORT_VERBS = frozenset({"teleport", "tp", "warp", "beam"})
+# Verbs which mean a teleport when the player is the one being moved, "send me to the van"
+MOVE_VERBS = frozenset({"send", "take", "move", "put", "bring"})
+PLAYER_WORDS = frozenset({"me", "us", "player"})
+NEGATIONS = frozenset({"no", "not", "dont", "don't", "stop", "never", "without", "less", "fewer"})
+# Words which order or delay actions, "wait 5 then spawn a bear", only the model can plan those
+SEQUENCE_WORDS = frozenset({
+    "then", "after", "afterwards", "before", "later", "wait", "until", "once",
+    "sec", "secs", "second", "seconds", "min", "mins", "minute", "minutes",
+})
+QUESTION_WORDS = frozenset({
+    "why", "what", "did", "can", "could", "would", "should", "will", "how", "when", "where", "who",
+    "do", "does", "is", "are",
+})
+# Words which may come before the verb of a command, "pls spawn a bear at the pond"
+LEADING_WORDS = frozenset({"pls", "plz", "please", "hey", "yo", "ok", "okay", "bot", "now", "just", "quick"})
+
+NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "couple": 2, "few": 3}
+
+WORD = re.compile(r"[a-z0-9']+")
+# Typographic apostrophes, Discord clients type don’t
+APOSTROPHES = str.maketrans({"\u2018": "'", "\u2019": "'"})
+CAMEL_CASE = re.compile(r"(?<!^)(?=[A-Z])")
+
+FAST_PATH_REASON = "Direct chat command"
+
+
+def _aliases(name: str) -> List[str]:
+    """
+    The lower case spellings of a name, GasCan is also gas can, gascans and gas cans.
+    """
+    words = CAMEL_CASE.sub(" ", name).lower().split()
+    spellings = {" ".join(words), "".join(words)}
+    return sorted(spellings | {spelling + "s" for spelling in spellings})
+
+
+class IntentMatcher:
+    """
+    Matches chat messages to Spawn and TeleportPlayer actions.
+    """
+
+    def __init__(self, objects: Iterable[str] = SPAWNABLE_OBJECTS, locations: Iterable[str] = LOCATIONS,
+                 max_count: int = 5):
+        """
+        Args:
+            objects (list): Friendly names of the objects which can be spawned.
+            locations (list): Friendly names of the locations.
+            max_count (int): Most objects spawned by one message, "spawn 50 bears" spawns this many.
+        """
+        self.max_count = max_count
+        self.objects: Dict[str, str] = dict()
+        self.locations: Dict[str, str] = dict()
+        self.add_objects(objects)
+        self.add_locations(locations)
+
+    def add_objects(self, names: Iterable[str]):
+        for name in names:
+            for alias in _aliases(name):
+                self.objects[alias] = name
+
+    def add_locations(self, names: Iterable[str]):
+        for name in names:
+            for alias in _aliases(name):
+                self.locations[alias] = name
+
+    @staticmethod
+    def _find(index: Dict[str, str], words: List[str]) -> Dict[str, int]:
+        """
+        The names found in the words, with the position of their first word.
+        """
+        found = dict()
+        for position, word in enumerate(words):
+            if word in index:
+                found.setdefault(index[word], position)
+            if position + 1 < len(words):
+                pair = f"{word} {words[position + 1]}"
+                if pair in index:
+                    found.setdefault(index[pair], position)
+        return found
+
+    def _count(self, words: List[str], position: int) -> Optional[int]:
+        """
+        How many objects to spawn, from a number right before the object noun, "3 bears" or "two of the bears".
+
+        Returns:
+            int: The count, None when the message has numbers elsewhere and needs the model.
+        """
+        before = position - 1
+        while before >= 0 and words[before] in ("of", "the"):
+            before -= 1
+
+        count = 1
+        for index, word in enumerate(words):
+            if not word.isdigit() and word not in NUMBERS:
+                continue
+            if index != before:
+                return None
+            count = int(word) if word.isdigit() else NUMBERS[word]
+        return min(count, self.max_count) if count > 0 else None
+
+    def match(self, message: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Find the actions asked for by a chat message.
+
+        Returns:
+            list: The actions to dispatch, None when the message should go to the LLM.
+        """
+        if "?" in message:
+            return None
+        words = WORD.findall(message.lower().translate(APOSTROPHES))
+        if not words or NEGATIONS.intersection(words) or SEQUENCE_WORDS.intersection(words):
+            return None
+
+        # Commands start with their verb, "I hate bears, send them to the river" is not one
+        verb = next((word for word in words if word not in LEADING_WORDS), None)
+        if verb in QUESTION_WORDS or verb not in SPAWN_VERBS | TELEPORT_VERBS | MOVE_VERBS:
+            return None
+
+        objects = self._find(self.objects, words)
+        locations = self._find(self.locations, words)
+        if len(locations) != 1:
+            return None
+        location = next(iter(locations))
+
+        moves_player = PLAYER_WORDS.intersection(words) and (
+            TELEPORT_VERBS.intersection(words) or MOVE_VERBS.intersection(words))
+        if moves_player or TELEPORT_VERBS.intersection(words):
+            if objects:
+                return None
+            return [{"Name": "TeleportPlayer", "Arg1": "Player", "Arg2": location, "Reason": FAST_PATH_REASON}]
+
+        # "send the bears to the river" moves the bears there, not new ones
+        if verb in SPAWN_VERBS and len(objects) == 1 and not MOVE_VERBS.intersection(words):
+            spawned, position = next(iter(objects.items()))
+            count = self._count(words, position)
+            if count is None:
+                return None
+            return [
+                {"Name": "Spawn", "Arg1": spawned, "Arg2": location, "Reason": FAST_PATH_REASON}
+                for _ in range(count)]
+
+        return None
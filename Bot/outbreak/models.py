@@ -1,11 +1,13 @@
 import datetime
 from dataclasses import dataclass, field
 from typing import List, Optional, Any, Dict
-from dataclasses_json import dataclass_json
+from dataclasses_json import config, dataclass_json
+
+from outbreak import codec
 
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Metadata:
     ToolTip: Optional[str] = None
     Min: Optional[str] = None
@@ -13,20 +15,24 @@ class Metadata:
 
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UnderlyingProperty:
+    """
+    A property as described in preset pushes and in preset descriptions, the latter omit the display name
+    and type path.
+    """
     Name: str
-    DisplayName: str
     Description: str
     Type: str
-    TypePath: str
     ContainerType: str
     KeyType: str
     Metadata: Metadata
+    DisplayName: Optional[str] = None
+    TypePath: Optional[str] = None
 
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OwnerObject:
     Name: str
     Class: str
@@ -34,7 +40,7 @@ class OwnerObject:
 
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ModifiedRCProperty:
     DisplayName: str
     ID: str
@@ -44,7 +50,7 @@ class ModifiedRCProperty:
 
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ModifiedEntities:
     ModifiedRCProperties: List[ModifiedRCProperty] = field(default_factory=list)
     ModifiedRCFunctions: List = field(default_factory=list)
@@ -52,7 +58,7 @@ class ModifiedEntities:
 
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RootObject:
     Type: str
     PresetName: str
@@ -60,33 +66,49 @@ class RootObject:
     ModifiedEntities: ModifiedEntities
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class ChangedField:
+    PropertyLabel: str
+    ObjectPath: Optional[str] = None
+    Id: Optional[str] = None
+    PropertyValue: Optional[Any] = None
+
+@dataclass_json
+@dataclass(frozen=True, slots=True)
+class PresetFieldsChanged:
+    Type: str
+    PresetName: str
+    PresetId: str
+    ChangedFields: List[ChangedField] = field(default_factory=list)
+
+@dataclass_json
+@dataclass(frozen=True, slots=True)
 class RelativeLocation:
     X: float
     Y: float
     Z: float
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ResponseBody:
     RelativeLocation: RelativeLocation
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Response:
     RequestId: int
     ResponseCode: int
     ResponseBody: ResponseBody
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WebsocketResponse:
     RequestId: int
     ResponseCode: int
     ResponseBody: Optional[Dict[str, Any]] = None
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Parameters:
     RequestId: int
     Url: str
@@ -94,19 +116,19 @@ class Parameters:
     Body: Optional[Dict[str, Any]] = None
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WebsocketHttpRequest:
     MessageName: str
     Parameters: Parameters
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WebsocketRequest:
     MessageName: str
     Parameters: Dict[str, Any]
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FunctionHttpRequest:
     objectPath: str
     functionName: str
@@ -114,7 +136,7 @@ class FunctionHttpRequest:
     generateTransaction: Optional[bool] = False
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GameContext:
     """
     Represents the general information about a prop in the level.
@@ -122,7 +144,7 @@ class GameContext:
     context: Dict[str, Any]
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GameAction:
     """
     Represents a possible action available to execute in the game.
@@ -130,7 +152,7 @@ class GameAction:
     action: Dict[str, Any]
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ChatMessage:
     """
     A Chat message to add to the prompt
@@ -143,6 +165,7 @@ class ChatMessage:
 class MessageContent:
     type: str
     text: str
+    cache_control: Optional[Dict[str, str]] = field(default=None, metadata=config(exclude=lambda value: value is None))
 
 @dataclass_json
 @dataclass
@@ -150,6 +173,16 @@ class Message:
     role: str
     content: List[MessageContent]
 
+@dataclass_json
+@dataclass
+class Tool:
+    """
+    A tool the model can call, described by the JSON schema of its input.
+    """
+    name: str
+    description: str
+    input_schema: Dict[str, Any]
+
 @dataclass_json
 @dataclass
 class RAGRequestPayload:
@@ -159,18 +192,28 @@ class RAGRequestPayload:
     temperature: float
     top_p: float
     messages: List[Message]
+    tools: Optional[List[Tool]] = field(default=None, metadata=config(exclude=lambda value: value is None))
+    tool_choice: Optional[Dict[str, str]] = field(default=None, metadata=config(exclude=lambda value: value is None))
 
 @dataclass_json
 @dataclass
 class RAGResponseContent:
+    """
+    A text or tool_use block of a response.
+    """
     type: str
-    text: str
+    text: Optional[str] = None
+    id: Optional[str] = None
+    name: Optional[str] = None
+    input: Optional[Dict[str, Any]] = None
 
 @dataclass_json
 @dataclass
 class Usage:
     input_tokens: int
     output_tokens: int
+    cache_creation_input_tokens: Optional[int] = 0
+    cache_read_input_tokens: Optional[int] = 0
 
 @dataclass_json
 @dataclass
@@ -184,21 +227,6 @@ class RAGResponse:
     stop_sequence: Optional[str]
     usage: Usage
 
-@dataclass_json
-@dataclass
-class Metadata:
-    ToolTip: Optional[str] = None
-
-@dataclass_json
-@dataclass
-class UnderlyingProperty:
-    Name: str
-    Description: str
-    Type: str
-    ContainerType: str
-    KeyType: str
-    Metadata: Metadata
-
 @dataclass_json
 @dataclass
 class ExposedProperty:
@@ -235,6 +263,26 @@ class Group:
     ExposedProperties: List[ExposedProperty] = field(default_factory=list)
     ExposedFunctions: List[ExposedFunction] = field(default_factory=list)
 
+@dataclass_json
+@dataclass(frozen=True, slots=True)
+class PlannedAction:
+    """
+    An action of a plan, decoded from a validated tool call.
+    """
+    Name: str
+    Arguments: Dict[str, Any] = field(default_factory=dict)
+    Reason: Optional[str] = None
+
+    def to_action(self) -> Dict[str, Any]:
+        """
+        The action in the format of the JSON plans, its arguments next to its name.
+        """
+        action = {"Name": self.Name}
+        action.update(self.Arguments)
+        if self.Reason is not None:
+            action["Reason"] = self.Reason
+        return action
+
 @dataclass_json
 @dataclass
 class Preset:
@@ -248,11 +296,29 @@ class PresetResponseBody:
     Preset: Preset
 
 @dataclass_json
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GameState:
     PlayerLocation: str
     PlayerAmmo: int
     PlayerGrenades: int
     PlayerHealth: float
     BearLocations: Dict[str, str] = field(default_factory=dict)  # Mapping object paths to locations
-    LocationNames: List[str] = field(default_factory=list)
\ No newline at end of file
+    LocationNames: List[str] = field(default_factory=list)
+
+# Messages on the UE5 websocket hot path and the per bear / per message prompt entries use the
+# compiled codec instead of dataclasses_json reflection
+codec.install(
+    GameContext,
+    GameAction,
+    ChatMessage,
+    PlannedAction,
+    WebsocketHttpRequest,
+    WebsocketRequest,
+    Parameters,
+    FunctionHttpRequest,
+    WebsocketResponse,
+    RootObject,
+    PresetFieldsChanged,
+    GameState,
+    PresetResponseBody,
+)
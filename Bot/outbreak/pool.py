@@ -0,0 +1,135 @@
+"""
+Pool of UE5 Remote Control sockets to a single game server.
+
+A single socket delivers its messages in order, so a large thumbnail or a slow function call delays
+every response queued behind it. The pool opens several supervised UE5RemoteControlClient sockets to
+the same server and sends each request on the connected socket with the fewest requests in flight.
+Preset registrations and their push events get a socket of their own so they never wait behind
+requests.
+
+The pool has the same API as UE5RemoteControlClient and can be used in its place.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from outbreak import models
+from outbreak.client import ConnectionHealth, PresetCallback, UE5RemoteControlClient
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class UE5RemoteControlPool:
+    """
+    Spreads requests to one game server over several websocket connections.
+    """
+
+    def __init__(self, hostname: str, port: int, size: int = 4, **client_options):
+        """
+        Args:
+            hostname (str): The hostname of the WebSocket server.
+            port (int): The port of the WebSocket server.
+            size (int): Number of sockets used for requests, the preset socket comes on top.
+            client_options: Options passed to each UE5RemoteControlClient.
+        """
+        if size < 1:
+            raise ValueError("A connection pool needs at least one socket")
+
+        self.hostname = hostname
+        self.port = port
+        self.uri = f"ws://{hostname}:{port}"
+        self.preset_client = UE5RemoteControlClient(hostname, port, **client_options)
+        self.clients: List[UE5RemoteControlClient] = [
+            UE5RemoteControlClient(hostname, port, **client_options) for _ in range(size)]
+
+    @property
+    def size(self) -> int:
+        return len(self.clients)
+
+    @property
+    def connected(self) -> bool:
+        return self.preset_client.connected and any(client.connected for client in self.clients)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(client.in_flight for client in self.clients)
+
+    @property
+    def health(self) -> ConnectionHealth:
+        """
+        Health of the pool, connected while the preset socket and at least one request socket are.
+        """
+        clients = [self.preset_client] + self.clients
+        errors = [client.last_error for client in clients if client.last_error]
+        connected_since = [client.connected_since for client in clients if client.connected_since]
+        return ConnectionHealth(
+            connected=self.connected,
+            reconnecting=any(client.reconnecting for client in clients),
+            reconnects=sum(client.reconnects for client in clients),
+            failed_attempts=sum(client.failed_attempts for client in clients),
+            connected_since=min(connected_since) if connected_since else None,
+            last_error=errors[-1] if errors else None)
+
+    def least_loaded(self) -> UE5RemoteControlClient:
+        """
+        The connected request socket with the fewest requests in flight, any socket when none is connected.
+        """
+        candidates = [client for client in self.clients if client.connected] or self.clients
+        return min(candidates, key=lambda client: client.in_flight)
+
+    async def connect(self):
+        """
+        Open every socket of the pool.
+
+        Raises the first connection error, the failed sockets keep reconnecting in the background
+        when their clients reconnect.
+        """
+        clients = [self.preset_client] + self.clients
+        results = await asyncio.gather(*[client.connect() for client in clients], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.error(f"{len(errors)} of {len(clients)} sockets to {self.uri} failed to connect")
+            raise errors[0]
+        logger.info(f"Connected a pool of {len(clients)} sockets to {self.uri}")
+
+    async def disconnect(self):
+        await asyncio.gather(*[client.disconnect() for client in [self.preset_client] + self.clients])
+
+    def generate_request_id(self) -> int:
+        return self.least_loaded().generate_request_id()
+
+    async def register_preset(self, preset_name: str, message_callback: PresetCallback):
+        await self.preset_client.register_preset(preset_name, message_callback)
+
+    async def unregister_preset(self, preset_name: str):
+        return await self.preset_client.unregister_preset(preset_name)
+
+    def on_message(self, max_queued: int = 256):
+        return self.preset_client.on_message(max_queued=max_queued)
+
+    async def read_object_property(self, object_path: str, property_name: str, timeout: float = 5.0):
+        return await self.least_loaded().read_object_property(object_path, property_name, timeout=timeout)
+
+    async def write_object_property(self, object_path: str, property_name: str, value: float):
+        return await self.least_loaded().write_object_property(object_path, property_name, value)
+
+    async def get_object_thumbnail(self, object_path: str, timeout: float = 5.0):
+        return await self.least_loaded().get_object_thumbnail(object_path, timeout=timeout)
+
+    async def call_object_function(self, object_path: str, function_name: str, parameters: dict,
+                                   timeout: float = 5.0) -> Optional[models.WebsocketResponse]:
+        return await self.least_loaded().call_object_function(object_path, function_name, parameters, timeout=timeout)
+
+    async def call_preset_function(self, preset_name: str, function_label: str, parameters: dict,
+                                   timeout: float = 5.0) -> Optional[models.WebsocketResponse]:
+        return await self.least_loaded().call_preset_function(preset_name, function_label, parameters, timeout=timeout)
+
+    async def batch_request(self, requests, timeout: float = 5.0):
+        return await self.least_loaded().batch_request(requests, timeout=timeout)
+
+    async def get_remote_preset(self, preset_name: str):
+        return await self.least_loaded().get_remote_preset(preset_name)
+
+    async def make_request(self, request: str, timeout: float = 5.0, request_id: Optional[int] = None) -> dict:
+        return await self.least_loaded().make_request(request, timeout=timeout, request_id=request_id)
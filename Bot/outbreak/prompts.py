@@ -1,5 +1,111 @@
 import datetime
-from outbreak.models import GameContext, GameAction, ChatMessage
+import json
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from outbreak.models import GameContext, GameAction, ChatMessage, MessageContent
+from outbreak.registry import DEFAULT_REGISTRY
+
+# Token budget of each dynamic section, entries over budget are summarised instead of sent.
+DEFAULT_SECTION_BUDGETS = {
+    "context": 800,
+    "actions": 400,
+    "chat_messages": 300,
+    "previous_messages": 300,
+}
+
+# Marks the end of the prompt prefix cached by Bedrock.
+CACHE_CHECKPOINT = {"type": "ephemeral"}
+
+INSTRUCTIONS = """
+You are responsible for making a player have fun in a Zombie FPS with Bears.
+The game consists of surviving in a dangerous meadow where you will spawn chaotic challenges.
+Only use the available actions.
+Based on the provided context, available actions, and recent chat messages, manage the fun in the game.
+""".strip()
+
+JSON_RESPONSE_FORMAT = """
+Respond in JSON format, suggest actions to create a fun experience.
+
+If you have notes or improvements to the list of available actions, place these details in the Notes section of the header.
+
+Example response schema:
+{
+    "Header": {
+        "DescriptionOfWhatToDo": "Summarize actions that will take place.",
+        "Notes": "Any additional notes or feedback you have."
+    },
+    "Actions": [
+    ]
+}
+
+The available actions in JSONl format surrounded by xml markers <actions></actions>
+<actions>
+""".strip() + "\n" + DEFAULT_REGISTRY.prompt_section() + "\n</actions>"
+
+TOOL_RESPONSE_FORMAT = """
+Call the tools of the available actions to create a fun experience, in the order they should happen.
+A Wait call pauses before the calls after it.
+
+If you have notes or improvements to the list of available actions, call the Notes tool.
+""".strip()
+
+RULES = """
+Rules
+- Only respond to game queries.
+- Never claim to search online, access external data, or use tools besides the game.
+- Only the game connection for data. Never guess or make up information.
+- Only use the available actions with the provided contexts to make requests.
+- If the action doesn't exist in the list of <actions>, do not attempt to take it.
+""".strip()
+
+# Instructions, built-in actions and rules, identical for every call so they are built once and
+# placed first to be reused by Bedrock prompt caching.
+STATIC_PROMPT = "\n\n".join((INSTRUCTIONS, JSON_RESPONSE_FORMAT, RULES))
+
+# The same prefix when the actions are given to the model as tools.
+STATIC_TOOL_PROMPT = "\n\n".join((INSTRUCTIONS, TOOL_RESPONSE_FORMAT, RULES))
+
+# The per call part of the prompt, filled in with str.format.
+DYNAMIC_PROMPT_TEMPLATE = """
+The current game state in JSONl format surrounded by xml markers <context></context>:
+<context>
+{context_jsonl}
+</context>
+
+More available actions in JSONl format surrounded by xml markers <actions></actions>
+<actions>
+{actions_jsonl}
+</actions>
+
+The chat messages in JSONl format surrounded by xml markers <chat_messages></chat_messages>
+<chat_messages>
+{chat_messages_jsonl}
+</chat_messages>
+
+Your previous messages to players, do not repeat in JSONl format surrounded by xml markers <previous_messages></previous_messages>
+<previous_messages>
+{previous_messages_jsonl}
+</previous_messages>
+""".strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count of a text, about 4 characters per token for English and JSON.
+    """
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class SectionUsage:
+    """
+    How much of its budget a prompt section used.
+    """
+    tokens: int
+    budget: Optional[int]
+    kept: int
+    dropped: int
 
 
 class RAGPromptGenerator:
@@ -7,11 +113,23 @@ class RAGPromptGenerator:
     A class to generate prompts for a RAG system, incorporating game context,
     available actions, and recent chat messages.
     """
-    def __init__(self):
+    def __init__(self, max_chat_messages: int = 10, max_previous_messages: int = 20,
+                 section_budgets: Optional[Dict[str, int]] = None, use_tools: bool = False):
+        """
+        Args:
+            max_chat_messages: Chat messages kept, the oldest are evicted first.
+            max_previous_messages: Messages sent to players kept, the oldest are evicted first.
+            section_budgets: Token budget per dynamic section, see DEFAULT_SECTION_BUDGETS.
+            use_tools: Ask for tool calls instead of a JSON document, see outbreak.tools.
+        """
+        self.use_tools = use_tools
         self.contexts = list()
         self.actions = list()
-        self.chat_messages = list()
-        self.previous_messages = list()
+        self.chat_messages = deque(maxlen=max_chat_messages)
+        self.previous_messages = deque(maxlen=max_previous_messages)
+        self.section_budgets = dict(DEFAULT_SECTION_BUDGETS)
+        self.section_budgets.update(section_budgets or dict())
+        self.budget_report: Dict[str, SectionUsage] = dict()
 
     def clear_contexts(self):
         self.contexts.clear()
@@ -29,80 +147,104 @@ class RAGPromptGenerator:
         self.actions.append(action)
 
     def add_chat_message(self, message: str, timestamp: datetime.datetime):
-        """Adds a new chat message, maintaining a maximum of 10 messages."""
-        if len(self.chat_messages) >= 2:
-            # Removes a random message, not necessarily the oldest
-            self.chat_messages.pop()
-
+        """Adds a new chat message, evicting the oldest once max_chat_messages is reached."""
         self.chat_messages.append(ChatMessage(message=message, timestamp=timestamp))
 
     def add_previous_message(self, message: str):
         self.previous_messages.append(ChatMessage(message=message, timestamp=datetime.datetime.now()))
 
-    def generate_prompt(self) -> str:
+    def generate_prompt_sections(self) -> Tuple[str, str]:
         """
-        Generates a string combining the context, actions,
-        and recent chat messages for use in a RAG system.
+        Generates the prompt as its static prefix, shared by every call and session, and the
+        dynamic suffix holding the context, extra actions and chat messages.
 
         Returns:
-            A string ready for LLM input.
+            A tuple of the static prefix and the dynamic suffix.
         """
-        context_jsonl = "\n".join([context.to_json() for context in self.contexts])
-        actions_jsonl = "\n".join([action.to_json() for action in self.actions])
-        chat_messages_jsonl = "\n".join([chat_message.to_json() for chat_message in self.chat_messages])
-        previous_messages_jsonl = "\n".join([previous_message.to_json() for previous_message in self.previous_messages])
-
-        prompt_template = f"""
-You are responsible for making a player have fun in a Zombie FPS with Bears.
-The game consists of surviving in a dangerous meadow where you will spawn chaotic challenges.
-Only use the available actions.
-Based on the provided context, available actions, and recent chat messages, manage the fun in the game.
-
-Respond in JSON format, suggest actions to create a fun experience.
-
-If you have notes or improvements to the list of available actions, place these details in the Notes section of the header.
-
-Example response schema:
-{{
-    "Header": {{
-        "DescriptionOfWhatToDo": "Summarize actions that will take place.",
-        "Notes": "Any additional notes or feedback you have."
-    }},
-    "Actions": [
-    ]
-}}
+        static_prompt = STATIC_TOOL_PROMPT if self.use_tools else STATIC_PROMPT
+        self.budget_report = {"static": SectionUsage(estimate_tokens(static_prompt), None, 1, 0)}
+
+        # Game state and actions keep their first entries, chat keeps the most recent ones
+        context_jsonl = self._fit_section("context", [context.to_json() for context in self.contexts])
+        actions_jsonl = self._fit_section("actions", [action.to_json() for action in self.actions])
+        chat_messages_jsonl = self._fit_section(
+            "chat_messages",
+            [chat_message.to_json() for chat_message in self.chat_messages],
+            keep_newest=True)
+        previous_messages_jsonl = self._fit_section(
+            "previous_messages",
+            [previous_message.to_json() for previous_message in self.previous_messages],
+            keep_newest=True)
+
+        dynamic_prompt = DYNAMIC_PROMPT_TEMPLATE.format(
+            context_jsonl=context_jsonl,
+            actions_jsonl=actions_jsonl,
+            chat_messages_jsonl=chat_messages_jsonl,
+            previous_messages_jsonl=previous_messages_jsonl
+        )
+
+        self.budget_report["dynamic"] = SectionUsage(estimate_tokens(dynamic_prompt), None, 1, 0)
+
+        return static_prompt, dynamic_prompt
+
+    def _fit_section(self, name: str, lines: List[str], keep_newest: bool = False) -> str:
+        """
+        Keep as many lines as fit in the section's budget, the rest is summarised in one line.
 
-The current game state in JSONl format surrounded by xml markers <context></context>:
-<context>
-{context_jsonl}
-</context>
+        Args:
+            name: The section, a key of the section budgets.
+            lines: The JSONl lines of the section.
+            keep_newest: Keep the last lines instead of the first ones.
 
-The available actions in JSONl format surrounded by xml markers <actions></actions>
-<actions>
-{{"Name": "Wait", "Arg1": "Amount of time to wait in seconds", "Reason": "Reason why to do this action."}}
-{{"Name": "Chat", "Arg1": "Very short (under 30 character), sarcastic message to send to the player, can rarely include emojis but keep trying different emojis", "Reason": "Reason why to do this action."}}
-{{"Name": "Spawn", "Arg1": "Object friendly name (Bear, GasCan, Ammo, Grenade, Toilet)", "Arg2": "Location friendly name (Pond, Van, Meadow, Hill, River)", "Reason": "Reason why to do this action."}}
-{{"Name": "MoveTo", "Arg1": "Object ID", "Arg2": "Location friendly name (Pond, Van, Meadow, Hill, River)", "Reason": "Reason why to do this."}}
-{{"Name": "TeleportPlayer", "Arg1": "Player", "Arg2": "Location friendly name (Pond, Van, Meadow, Hill, River), do not use too often.", "Reason": "Reason why to do this."}}
-{actions_jsonl}
-</actions>
+        Returns:
+            The JSONl text of the section.
+        """
+        budget = self.section_budgets.get(name)
+        ordered = reversed(lines) if keep_newest else lines
+
+        kept = list()
+        tokens = 0
+        for line in ordered:
+            line_tokens = estimate_tokens(line) + 1
+            if budget is not None and tokens + line_tokens > budget:
+                break
+            kept.append(line)
+            tokens += line_tokens
+
+        dropped = len(lines) - len(kept)
+        if keep_newest:
+            kept.reverse()
+        if dropped:
+            summary = json.dumps({"Omitted": f"{dropped} {'older' if keep_newest else 'more'} entries"})
+            if keep_newest:
+                kept.insert(0, summary)
+            else:
+                kept.append(summary)
+            tokens += estimate_tokens(summary) + 1
+
+        self.budget_report[name] = SectionUsage(tokens, budget, len(lines) - dropped, dropped)
+        return "\n".join(kept)
 
-The chat messages in JSONl format surrounded by xml markers <chat_messages></chat_messages>
-<chat_messages>
-{chat_messages_jsonl}
-</chat_messages>
+    def generate_prompt(self) -> str:
+        """
+        Generates a string combining the context, actions,
+        and recent chat messages for use in a RAG system.
 
-Your previous messages to players, do not repeat in JSONl format surrounded by xml markers <previous_messages></previous_messages>
-<previous_messages>
-{previous_messages_jsonl}
-</previous_messages>
+        Returns:
+            A string ready for LLM input.
+        """
+        return "\n\n".join(self.generate_prompt_sections())
 
-Rules
-- Only respond to game queries.
-- Never claim to search online, access external data, or use tools besides the game.
-- Only the game connection for data. Never guess or make up information.
-- Only use the available actions with the provided contexts to make requests.
-- If the action doesn't exist in the list of <actions>, do not attempt to take it.
-""".strip()
+    def generate_message_content(self) -> List[MessageContent]:
+        """
+        Generates the prompt as message content blocks, the static prefix is marked as a
+        Bedrock prompt caching checkpoint so it's only processed once across calls.
 
-        return prompt_template
+        Returns:
+            The content blocks for the user message.
+        """
+        static_prompt, dynamic_prompt = self.generate_prompt_sections()
+        return [
+            MessageContent(type="text", text=static_prompt, cache_control=CACHE_CHECKPOINT),
+            MessageContent(type="text", text=dynamic_prompt)
+        ]
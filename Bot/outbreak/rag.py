@@ -1,27 +1,41 @@
+import asyncio
 import boto3
+import functools
 import json
 import logging
-from typing import Dict, Any
+import threading
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, Optional
 
 from outbreak.models import RAGRequestPayload, RAGResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_END_OF_STREAM = object()
+
 
 class BedrockRAGClient:
     """
     A client to interact with Amazon Bedrock for making Retrieval-Augmented Generation (RAG) requests.
     """
 
-    def __init__(self, region_name: str):
+    def __init__(self, region_name: str, max_concurrency: int = 8, timeout: float = 30.0):
         """
         Initialize the BedrockRAGClient.
 
         Args:
             region_name (str): AWS region where the Bedrock service is hosted.
+            max_concurrency (int): Requests allowed in flight at once, also the size of the connection pool.
+            timeout (float): Default time in seconds to wait for a response.
         """
-        self.client = boto3.client('bedrock-runtime', region_name=region_name)
+        self.timeout = timeout
+        self.client = boto3.client(
+            'bedrock-runtime',
+            region_name=region_name,
+            config=Config(max_pool_connections=max_concurrency, read_timeout=timeout))
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="bedrock")
 
     def make_rag_request(self, model_id: str, rag_request_payload: RAGRequestPayload) -> Dict[str, Any]:
         """
@@ -47,8 +61,149 @@ class BedrockRAGClient:
             # Parse and return the response
             response_payload = RAGResponse.from_json(response['body'].read())
             for chat_response in response_payload.content:
-                logger.debug(json.loads(chat_response.text))
+                logger.debug(chat_response)
             return response_payload
 
         except Exception as e:
-            raise Exception(f"An error occurred during the RAG request: {e}")
\ No newline at end of file
+            raise Exception(f"An error occurred during the RAG request: {e}")
+
+    async def make_rag_request_async(self, model_id: str, rag_request_payload: RAGRequestPayload,
+                                     timeout: Optional[float] = None) -> RAGResponse:
+        """
+        Make a RAG request without blocking the event loop.
+
+        The blocking boto3 call runs on a bounded executor which shares the client's connection pool.
+        Cancelling the returned coroutine, or timing out, releases the caller immediately while the
+        worker finishes reading the response in the background.
+
+        Args:
+            model_id (str): Identifier of the model to use for the RAG request.
+            rag_request_payload (RAGRequestPayload): Payload containing the RAG request input and parameters.
+            timeout (float): Time in seconds to wait for the response, defaults to the client's timeout.
+
+        Returns:
+            RAGResponse: The response from the Bedrock model.
+
+        Raises:
+            asyncio.TimeoutError: If no response was received within the timeout.
+            Exception: If an error occurs during the request.
+        """
+        loop = asyncio.get_running_loop()
+        request = loop.run_in_executor(
+            self.executor,
+            functools.partial(self.make_rag_request, model_id=model_id, rag_request_payload=rag_request_payload))
+
+        return await asyncio.wait_for(request, timeout=timeout or self.timeout)
+
+    def stream_rag_events(self, model_id: str, rag_request_payload: RAGRequestPayload) -> Iterator[Dict[str, Any]]:
+        """
+        Make a RAG request with a streamed response and yield every event of the stream.
+
+        Args:
+            model_id (str): Identifier of the model to use for the RAG request.
+            rag_request_payload (RAGRequestPayload): Payload containing the RAG request input and parameters.
+
+        Yields:
+            dict: The parsed stream events (message_start, content_block_start, content_block_delta, ...).
+        """
+        response = self.client.invoke_model_with_response_stream(
+            modelId=model_id,
+            body=rag_request_payload.to_json()
+        )
+
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+
+            message = json.loads(chunk['bytes'])
+            if message.get('type') == 'message_delta':
+                logger.debug(f"Stream finished: {message}")
+            yield message
+
+    def stream_rag_request(self, model_id: str, rag_request_payload: RAGRequestPayload) -> Iterator[str]:
+        """
+        Make a RAG request with a streamed response.
+
+        Args:
+            model_id (str): Identifier of the model to use for the RAG request.
+            rag_request_payload (RAGRequestPayload): Payload containing the RAG request input and parameters.
+
+        Yields:
+            str: The text deltas in the order they are generated.
+        """
+        for message in self.stream_rag_events(model_id=model_id, rag_request_payload=rag_request_payload):
+            if message.get('type') == 'content_block_delta' and message['delta'].get('type') == 'text_delta':
+                yield message['delta']['text']
+
+    async def stream_rag_request_async(self, model_id: str, rag_request_payload: RAGRequestPayload,
+                                       timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Make a RAG request with a streamed response without blocking the event loop.
+
+        The stream is read on the bounded executor and handed over to the loop chunk by chunk.
+        Leaving the iteration early stops reading the stream.
+
+        Args:
+            model_id (str): Identifier of the model to use for the RAG request.
+            rag_request_payload (RAGRequestPayload): Payload containing the RAG request input and parameters.
+            timeout (float): Time in seconds to wait for the next chunk, defaults to the client's timeout.
+
+        Yields:
+            str: The text deltas in the order they are generated.
+
+        Raises:
+            asyncio.TimeoutError: If no chunk was received within the timeout.
+        """
+        stream = functools.partial(self.stream_rag_request, model_id=model_id, rag_request_payload=rag_request_payload)
+        async for text in self._iterate_async(stream, timeout):
+            yield text
+
+    async def stream_rag_events_async(self, model_id: str, rag_request_payload: RAGRequestPayload,
+                                      timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream every event of a RAG request without blocking the event loop, see stream_rag_request_async.
+
+        Yields:
+            dict: The parsed stream events.
+        """
+        stream = functools.partial(self.stream_rag_events, model_id=model_id, rag_request_payload=rag_request_payload)
+        async for event in self._iterate_async(stream, timeout):
+            yield event
+
+    async def _iterate_async(self, stream: Callable[[], Iterator[Any]], timeout: Optional[float]) -> AsyncIterator[Any]:
+        """
+        Read a blocking stream on the executor and hand its items over to the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def read_stream():
+            try:
+                for item in stream():
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _END_OF_STREAM)
+
+        loop.run_in_executor(self.executor, read_stream)
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout=timeout or self.timeout)
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    raise Exception(f"An error occurred during the streamed RAG request: {item}")
+                yield item
+        finally:
+            stopped.set()
+
+    def close(self):
+        """
+        Stop the executor used by the async requests.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
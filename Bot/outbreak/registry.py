@@ -0,0 +1,287 @@
+"""
+Registry of the actions the model can take in the game.
+
+Every action is declared once with its arguments, the UE function it calls on the remote caller
+object and its cost class. The prompt section, the tool definitions, the argument validation and
+the dispatch to UE are all generated from these declarations. Validators are compiled when an
+action is registered and looked up by name, so actions registered at runtime from the preset add
+no work to the dispatch of the others.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from outbreak import models
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cost classes
+COST_LOCAL = "local"  # Handled by the bot, no UE call
+COST_CALL = "call"  # A cheap UE call
+COST_HEAVY = "heavy"  # Spawns or moves actors, concurrent ones are limited by the executor
+
+DEFAULT_REASON = "Reason why to do this action."
+
+# Vocabulary of the built-in actions, also used to match chat commands
+SPAWNABLE_OBJECTS = ("Bear", "GasCan", "Ammo", "Grenade", "Toilet")
+LOCATIONS = ("Pond", "Van", "Meadow", "Hill", "River")
+
+JSON_TYPES = {str: "string", int: "number", float: "number"}
+
+Validator = Callable[[Mapping[str, Any]], Optional[str]]
+
+
+@dataclass(frozen=True)
+class ActionArgument:
+    """
+    An argument of an action.
+    """
+    name: str
+    description: str
+    types: Tuple[type, ...] = (str,)
+    required: bool = True
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    """
+    The declaration of an action.
+    """
+    name: str
+    arguments: Tuple[ActionArgument, ...] = field(default_factory=tuple)
+    function: Optional[str] = None
+    cost: str = COST_CALL
+    reason: str = DEFAULT_REASON
+    # Whether a cached plan may run the action again, not for actions on specific objects or verbatim chat
+    replayable: bool = True
+    # Remote Control preset exposing the function, it is then called through the preset by its label
+    # rather than on the remote caller object
+    preset: Optional[str] = None
+
+    def describe(self) -> Dict[str, str]:
+        """
+        The description of the action in the JSONl format of the prompt.
+        """
+        description = {"Name": self.name}
+        for argument in self.arguments:
+            description[argument.name] = argument.description
+        description["Reason"] = self.reason
+        return description
+
+    def input_schema(self) -> Dict[str, Any]:
+        """
+        The JSON schema of the action's input, used for its tool definition.
+        """
+        properties = dict()
+        for argument in self.arguments:
+            json_types = sorted({JSON_TYPES.get(kind, "string") for kind in argument.types})
+            properties[argument.name] = {
+                "type": json_types[0] if len(json_types) == 1 else json_types,
+                "description": argument.description
+            }
+        properties["Reason"] = {"type": "string", "description": self.reason}
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": [argument.name for argument in self.arguments if argument.required]
+        }
+
+    def parameters(self, action: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        The parameters of the UE function call for an action.
+        """
+        return {argument.name: action[argument.name] for argument in self.arguments if argument.name in action}
+
+    @classmethod
+    def from_description(cls, description: Mapping[str, Any], function: Optional[str] = None,
+                         cost: str = COST_CALL) -> "ActionSpec":
+        """
+        Declare an action from its prompt description, every key but Name and Reason is a string argument.
+        """
+        return cls(
+            name=description["Name"],
+            arguments=tuple(
+                ActionArgument(name=name, description=str(value))
+                for name, value in description.items() if name not in ("Name", "Reason")),
+            function=function if function is not None else description["Name"],
+            cost=cost,
+            reason=str(description.get("Reason", DEFAULT_REASON)))
+
+
+def compile_validator(spec: ActionSpec) -> Validator:
+    """
+    Build the argument check of an action once, when it's registered.
+
+    Returns:
+        function: Returns the reason an action is invalid, None when it's valid.
+    """
+    required = frozenset(argument.name for argument in spec.arguments if argument.required)
+    types = {argument.name: argument.types for argument in spec.arguments}
+    types["Reason"] = (str,)
+    allowed = frozenset(types) | {"Name"}
+
+    def validate(action: Mapping[str, Any]) -> Optional[str]:
+        missing = required.difference(action)
+        if missing:
+            return f"{spec.name} is missing {', '.join(sorted(missing))}."
+        for name, value in action.items():
+            if name not in allowed:
+                return f"{spec.name} has no argument {name}."
+            if name != "Name" and (isinstance(value, bool) or not isinstance(value, types[name])):
+                kinds = sorted({JSON_TYPES.get(kind, kind.__name__) for kind in types[name]})
+                return f"{spec.name} {name} must be a {' or '.join(kinds)}."
+        return None
+
+    return validate
+
+
+class ActionRegistry:
+    """
+    The declared actions with their compiled validators, by name.
+    """
+
+    def __init__(self, specs: Iterable[ActionSpec] = ()):
+        self._specs: Dict[str, ActionSpec] = dict()
+        self._validators: Dict[str, Validator] = dict()
+        for spec in specs:
+            self.register(spec)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __iter__(self) -> Iterator[ActionSpec]:
+        return iter(list(self._specs.values()))
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def copy(self) -> "ActionRegistry":
+        registry = ActionRegistry()
+        registry._specs = dict(self._specs)
+        registry._validators = dict(self._validators)
+        return registry
+
+    def register(self, spec: ActionSpec, replace: bool = False) -> ActionSpec:
+        """
+        Add an action, compiling its validator.
+
+        Args:
+            spec (ActionSpec): The declaration of the action.
+            replace (bool): Replace an action with the same name instead of raising.
+
+        Returns:
+            ActionSpec: The registered action.
+        """
+        if spec.name in self._specs and not replace:
+            raise ValueError(f"Action {spec.name} is already registered")
+        self._validators[spec.name] = compile_validator(spec)
+        self._specs[spec.name] = spec
+        return spec
+
+    def register_preset(self, preset: models.PresetResponseBody) -> List[ActionSpec]:
+        """
+        Register the functions exposed on a Remote Control preset which aren't known yet.
+
+        Returns:
+            list: The newly registered actions.
+        """
+        registered = list()
+        for group in preset.Preset.Groups:
+            for exposed_function in group.ExposedFunctions:
+                name = exposed_function.DisplayName
+                if name in self._specs:
+                    continue
+                function = exposed_function.UnderlyingFunction
+                registered.append(self.register(ActionSpec(
+                    name=name,
+                    arguments=tuple(
+                        ActionArgument(name=argument.Name, description=argument.Description or argument.Type)
+                        for argument in function.Arguments),
+                    function=name,
+                    reason=function.Description or DEFAULT_REASON,
+                    replayable=False,
+                    preset=preset.Preset.Name)))
+
+        if registered:
+            logger.info(f"Registered actions from {preset.Preset.Name}: {[spec.name for spec in registered]}")
+        return registered
+
+    def get(self, name: Optional[str]) -> Optional[ActionSpec]:
+        return self._specs.get(name)
+
+    def validate(self, action: Mapping[str, Any]) -> Optional[str]:
+        """
+        Check an action against its declaration.
+
+        Returns:
+            str: Why the action is invalid, None when it can be dispatched.
+        """
+        validator = self._validators.get(action.get("Name"))
+        if validator is None:
+            return f"{action.get('Name')} is not an available action."
+        return validator(action)
+
+    def replayable(self, actions: Iterable[Mapping[str, Any]]) -> bool:
+        """
+        Whether a plan can be replayed from the response cache, every action has to be known and replayable.
+        """
+        for action in actions:
+            spec = self._specs.get(action.get("Name"))
+            if spec is None or not spec.replayable:
+                return False
+        return True
+
+    def describe(self) -> List[Dict[str, str]]:
+        return [spec.describe() for spec in self._specs.values()]
+
+    def prompt_section(self) -> str:
+        """
+        The actions in the JSONl format of the prompt.
+        """
+        return "\n".join(json.dumps(description) for description in self.describe())
+
+
+WAIT = ActionSpec(
+    name="Wait",
+    arguments=(ActionArgument("Arg1", "Amount of time to wait in seconds", types=(int, float, str)),),
+    cost=COST_LOCAL)
+
+CHAT = ActionSpec(
+    name="Chat",
+    arguments=(ActionArgument("Arg1", "Very short (under 30 character), sarcastic message to send to the player, can rarely include emojis but keep trying different emojis"),),
+    function="Chat",
+    replayable=False)
+
+SPAWN = ActionSpec(
+    name="Spawn",
+    arguments=(
+        ActionArgument("Arg1", f"Object friendly name ({', '.join(SPAWNABLE_OBJECTS)})"),
+        ActionArgument("Arg2", f"Location friendly name ({', '.join(LOCATIONS)})")),
+    function="Spawn",
+    cost=COST_HEAVY)
+
+MOVE_TO = ActionSpec(
+    name="MoveTo",
+    arguments=(
+        ActionArgument("Arg1", "Object ID"),
+        ActionArgument("Arg2", f"Location friendly name ({', '.join(LOCATIONS)})")),
+    function="MoveTo",
+    cost=COST_HEAVY,
+    reason="Reason why to do this.",
+    replayable=False)
+
+TELEPORT_PLAYER = ActionSpec(
+    name="TeleportPlayer",
+    arguments=(
+        ActionArgument("Arg1", "Player"),
+        ActionArgument("Arg2", f"Location friendly name ({', '.join(LOCATIONS)}), do not use too often.")),
+    function="TeleportPlayer",
+    cost=COST_HEAVY,
+    reason="Reason why to do this.")
+
+BUILT_IN_ACTIONS = (WAIT, CHAT, SPAWN, MOVE_TO, TELEPORT_PLAYER)
+
+# The built-in actions, sessions work on their own copy to register the actions of their preset
+DEFAULT_REGISTRY = ActionRegistry(BUILT_IN_ACTIONS)
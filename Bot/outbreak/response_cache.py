@@ -0,0 +1,154 @@
+"""
+Cache of the action plans generated for near identical requests.
+
+Players repeat themselves ("more bears", "MORE BEARS pls") and the game keeps coming back to the
+same situations, so the plan generated for a request is reused when the same intent arrives in a
+similar game state. The key is a fingerprint of the normalized chat intent and of the game state
+quantized into coarse buckets: the player location, a health band and a capped bear count.
+
+Coarser buckets and a longer TTL raise the hit rate, finer ones keep plans closer to the current
+state of the game. The key doesn't cover which bears exist or what was said, so plans moving a
+specific object or chatting are not cached: the object may be gone and the chat would be repeated.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from outbreak.models import GameState
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"[a-z0-9]+")
+
+# Politeness and filler words which don't change what is asked for
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "some", "pls", "plz", "please", "can", "could", "you", "u", "we", "i", "me", "us",
+    "just", "now", "lol", "ok", "okay", "yo", "hey", "bot", "give",
+})
+
+
+def normalize_intent(messages: Iterable[str]) -> str:
+    """
+    Reduce chat messages to a canonical bag of words.
+
+    Case, punctuation, filler words, plurals and word order are ignored.
+
+    Args:
+        messages (list): The chat messages of one request.
+
+    Returns:
+        str: The normalized intent, empty when nothing meaningful is left.
+    """
+    words = set()
+    for message in messages:
+        for word in WORD.findall(message.lower()):
+            if word in FILLER_WORDS:
+                continue
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            words.add(word)
+    return " ".join(sorted(words))
+
+
+class ResponseCache:
+    """
+    LRU of parsed action plans, keyed by intent and quantized game state and expiring after a TTL.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 120.0, health_band: float = 25.0,
+                 max_bear_count: int = 5, replayable: Optional[Callable[[List[Dict[str, Any]]], bool]] = None):
+        """
+        Args:
+            max_entries (int): Maximum number of plans kept.
+            ttl (float): Seconds a plan is reused, 0 disables the cache.
+            health_band (float): Width of the player health buckets.
+            max_bear_count (int): Bear counts from this value up share a bucket.
+            replayable (function): Tells whether the actions of a plan can run again, see ActionRegistry.replayable.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.health_band = health_band
+        self.max_bear_count = max_bear_count
+        self.replayable = replayable
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[str, Tuple[Dict[str, Any], float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def quantize(self, game_state: Optional[GameState]) -> Tuple:
+        """
+        The coarse buckets of a game state which are part of the key.
+        """
+        if game_state is None:
+            return (None, None, None)
+        return (
+            game_state.PlayerLocation,
+            int(game_state.PlayerHealth // self.health_band),
+            min(len(game_state.BearLocations), self.max_bear_count))
+
+    def fingerprint(self, messages: Iterable[str], game_state: Optional[GameState]) -> Optional[str]:
+        """
+        The cache key of a request.
+
+        Returns:
+            str: The key, None when the request has no chat intent and can't be cached.
+        """
+        intent = normalize_intent(messages)
+        if not intent or not self.enabled:
+            return None
+        key = repr((intent, self.quantize(game_state)))
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        The plan cached for a key, None on a miss or once it expired.
+        """
+        if key is None:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            plan, stored_at = entry
+            if time.monotonic() - stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return plan
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Optional[str], plan: Dict[str, Any]):
+        """
+        Store a parsed plan, evicting the least recently used ones over max_entries.
+        """
+        if key is None or not self.enabled or not plan.get("Actions"):
+            return
+        if self.replayable is not None and not self.replayable(plan["Actions"]):
+            logger.debug(f"Not caching a plan which can't be replayed: {plan['Actions']}")
+            return
+
+        self._entries[key] = (plan, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
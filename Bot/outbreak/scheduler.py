@@ -0,0 +1,133 @@
+"""
+Coalescing scheduler for LLM generations.
+
+Every chat message or periodic tick asks for a generation, but only one may be in flight for a game
+session at a time. Requests arriving while a generation is pending or running are merged into the
+next run, which starts once requests have stopped arriving for the debounce window or the oldest
+waiting request reaches the max latency.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CoalescingScheduler:
+    """
+    Runs a coroutine function on demand, never concurrently and merging bursts of requests.
+    """
+
+    def __init__(self, run: Callable[[], Awaitable[Any]], debounce: float = 0.5, max_latency: float = 3.0):
+        """
+        Args:
+            run (function): The coroutine function to run for each batch of requests.
+            debounce (float): Seconds without new requests before a run starts.
+            max_latency (float): Maximum seconds a request waits for its run to start, unless a run is in flight.
+        """
+        self._run = run
+        self.debounce = debounce
+        self.max_latency = max_latency
+
+        self.running = False
+        self.requests = 0
+        self.runs = 0
+
+        self._pending: Optional[asyncio.Future] = None
+        self._first_request = 0.0
+        self._last_request = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def idle(self) -> bool:
+        """
+        True when nothing is running or waiting to run.
+        """
+        return not self.running and self._pending is None
+
+    def request(self) -> asyncio.Future:
+        """
+        Ask for a run, merging with any run that hasn't started yet.
+
+        Returns:
+            asyncio.Future: Resolves with the result of the run covering this request, None if it failed.
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._pending is None:
+            self._pending = loop.create_future()
+            self._first_request = now
+        self._last_request = now
+        self.requests += 1
+        self._wakeup.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._process())
+
+        return self._pending
+
+    async def _wait_for_quiet(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = min(self._last_request + self.debounce, self._first_request + self.max_latency)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self):
+        while self._pending is not None:
+            await self._wait_for_quiet()
+
+            future = self._pending
+            self._pending = None
+            self.running = True
+            self.runs += 1
+            try:
+                result = await self._run()
+            except Exception as e:
+                logger.error(f"Scheduled run failed: {e}")
+                result = None
+            finally:
+                self.running = False
+
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """
+        Let the pending and in-flight runs finish, then stop.
+
+        Args:
+            timeout (float): Seconds to wait before cancelling whatever is left.
+        """
+        if self._task and not self._task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Timed out draining the scheduler, cancelling the remaining runs.")
+
+        await self.stop()
+
+    async def stop(self):
+        """
+        Cancel the pending and in-flight runs.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
@@ -0,0 +1,92 @@
+"""
+Registry of the message schemas pushed by the UE5 Remote Control server.
+
+Each schema is keyed by the UE message type and a schema version and holds the single decoder for
+that message, compiled once when the schema is registered at import. The client looks the schema
+up from the message header instead of checking message types one by one.
+
+UE doesn't version its websocket messages yet, messages without a Version field use version 1.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from outbreak import codec, models
+
+DEFAULT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class MessageSchema:
+    """
+    A versioned UE message type and the model it decodes to.
+    """
+    name: str
+    version: int
+    model: type
+    decode: Callable[[Dict[str, Any]], Any]
+
+
+class SchemaRegistry:
+    """
+    Versioned message schemas, keyed by UE message type.
+    """
+
+    def __init__(self):
+        self._schemas: Dict[Tuple[str, int], MessageSchema] = dict()
+
+    def register(self, name: str, model: type, version: int = DEFAULT_VERSION) -> MessageSchema:
+        """
+        Register the model of a message type.
+
+        Args:
+            name (str): The UE message type, the Type field of the message.
+            model (type): The dataclass the message decodes to.
+            version (int): The schema version.
+
+        Returns:
+            MessageSchema: The registered schema.
+        """
+        key = (name, version)
+        if key in self._schemas:
+            raise ValueError(f"Schema {name} v{version} is already registered to {self._schemas[key].model.__name__}")
+
+        schema = MessageSchema(name=name, version=version, model=model, decode=codec.decoder_for(model))
+        self._schemas[key] = schema
+        return schema
+
+    def get(self, name: Optional[str], version: int = DEFAULT_VERSION) -> Optional[MessageSchema]:
+        return self._schemas.get((name, version))
+
+    def schema_for(self, message: Dict[str, Any]) -> Optional[MessageSchema]:
+        """
+        Find the schema of a parsed message from its Type and Version fields.
+
+        Returns:
+            MessageSchema: The schema, None for responses and unknown messages.
+        """
+        return self._schemas.get((message.get("Type"), message.get("Version", DEFAULT_VERSION)))
+
+    def decode(self, message: Dict[str, Any]) -> Optional[Any]:
+        """
+        Decode a parsed message with its registered schema.
+
+        Returns:
+            The decoded model, None when no schema matches the message.
+        """
+        schema = self.schema_for(message)
+        return schema.decode(message) if schema is not None else None
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        return key in self._schemas
+
+    def __iter__(self) -> Iterator[MessageSchema]:
+        return iter(self._schemas.values())
+
+    def __len__(self) -> int:
+        return len(self._schemas)
+
+
+# Messages pushed for registered presets
+PRESET_SCHEMAS = SchemaRegistry()
+PRESET_SCHEMAS.register("PresetEntitiesModified", models.RootObject)
+PRESET_SCHEMAS.register("PresetFieldsChanged", models.PresetFieldsChanged)
@@ -0,0 +1,556 @@
+"""
+Game sessions driven by the bot.
+
+A GameSession owns everything tied to one match: the UE5 connection, the prompt state, the action
+executor and the generation scheduler. The SessionRegistry maps Discord guilds and channels to their
+sessions so one bot process can drive many matches while sharing a single Bedrock client.
+"""
+import asyncio
+import base64
+import binascii
+import datetime
+import discord
+import io
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from dataclasses_json import dataclass_json
+
+from outbreak.actions import ActionExecutor
+from outbreak.client import UE5RemoteControlClient, add_uepie_prefix
+from outbreak.game_state import GameStateCache
+from outbreak.intents import IntentMatcher
+from outbreak.pool import UE5RemoteControlPool
+from outbreak.prompts import RAGPromptGenerator
+from outbreak.rag import BedrockRAGClient
+from outbreak.response_cache import ResponseCache
+from outbreak.scheduler import CoalescingScheduler
+from outbreak.streaming import ActionStreamParser, ToolCallStreamParser
+from outbreak.thumbnails import ThumbnailCache
+from outbreak.registry import DEFAULT_REGISTRY
+from outbreak.tools import TOOL_CHOICE, ToolPlan, decode_tool_calls, generate_tools, repair_payload
+from outbreak.models import RAGRequestPayload, Message, GameState, GameContext, GameAction, PlannedAction
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_REMOTE_OBJECT_PATH = "/Game/LBG/Maps/L_LBG_Medow.L_LBG_Medow:PersistentLevel.B_RemoteCaller_C_1"
+
+
+@dataclass_json
+@dataclass(frozen=True)
+class SessionConfig:
+    """
+    Where a game session is hosted and which Discord channel talks to it.
+    """
+    session_id: str
+    channel_name: str
+    game_host: str
+    game_port: int
+    guild_id: Optional[int] = None
+    remote_object_path: str = DEFAULT_REMOTE_OBJECT_PATH
+    preset_name: str = "SurvivalManagerPreset"
+
+
+class GameSession:
+    """
+    The state and connections of a single match.
+    """
+
+    def __init__(self, config: SessionConfig, rag: BedrockRAGClient, stream_responses: bool = True,
+                 debounce: float = 0.5, max_latency: float = 3.0, game_state_max_age: float = 15.0,
+                 pool_size: int = 1, response_cache_ttl: float = 120.0, use_tools: bool = True,
+                 max_repairs: int = 1, register_preset_actions: bool = False) -> None:
+        """
+        Args:
+            config (SessionConfig): The session to drive.
+            rag (BedrockRAGClient): The Bedrock client shared between sessions.
+            stream_responses (bool): Execute actions while the model response is streamed.
+            debounce (float): Seconds without new chat before a generation starts.
+            max_latency (float): Maximum seconds chat waits for its generation to start.
+            game_state_max_age (float): Seconds the pushed game state is trusted before a full fetch.
+            pool_size (int): Sockets used for requests to the game, above one presets get a socket of their own.
+            response_cache_ttl (float): Seconds a generated plan is replayed for the same request, 0 disables it.
+            use_tools (bool): Get the actions as Bedrock tool calls instead of a JSON document.
+            max_repairs (int): Follow up requests for invalid or cut off tool calls.
+            register_preset_actions (bool): Offer the functions exposed on the preset as actions.
+        """
+        self.config = config
+        self.rag = rag
+        self.stream_responses = stream_responses
+        self.use_tools = use_tools
+        self.max_repairs = max_repairs
+        self.register_preset_actions = register_preset_actions
+
+        if pool_size > 1:
+            self.backend = UE5RemoteControlPool(
+                hostname=config.game_host,
+                port=config.game_port,
+                size=pool_size
+            )
+        else:
+            self.backend = UE5RemoteControlClient(
+                hostname=config.game_host,
+                port=config.game_port
+            )
+
+        self.remote_object_path = add_uepie_prefix(config.remote_object_path)
+        # Built-in actions, extended with the functions of the preset of this match
+        self.action_registry = DEFAULT_REGISTRY.copy()
+        self.action_executor = ActionExecutor(self.backend, self.remote_object_path, registry=self.action_registry)
+
+        self.prompt_generator = RAGPromptGenerator(use_tools=use_tools)
+
+        self.game_state_cache = GameStateCache(self.fetch_game_state, max_age=game_state_max_age)
+        self.thumbnail_cache = ThumbnailCache(self.fetch_thumbnail)
+        self.response_cache = ResponseCache(ttl=response_cache_ttl, replayable=self.action_registry.replayable)
+        self.intent_matcher = IntentMatcher()
+        self.fast_path_commands = 0
+        self._fast_path_tasks: Set[asyncio.Task] = set()
+        self._new_chat_messages: List[str] = list()
+        self._context_state = None
+
+        # One generation in flight at a time, chat arriving meanwhile is merged into the next one
+        self.scheduler = CoalescingScheduler(self.generate, debounce=debounce, max_latency=max_latency)
+        self.reply_channel = None
+
+    @property
+    def session_id(self) -> str:
+        return self.config.session_id
+
+    async def connect(self):
+        # Subscribe first so the preset is registered on every connection, even when this attempt fails
+        await self.backend.register_preset(self.config.preset_name, self.game_state_cache.on_preset_message)
+        await self.backend.connect()
+
+    async def disconnect(self):
+        await self.scheduler.stop()
+        await self.backend.disconnect()
+
+    def add_chat_message(self, message: discord.Message):
+        """
+        Queue a chat message for the next generation, replies go to the channel it was sent in.
+        """
+        return self.add_chat(message.clean_content, message.created_at, message.channel)
+
+    def add_chat(self, text: str, created_at: datetime.datetime, reply_channel=None, dispatch: bool = True,
+                 fast_path: bool = True):
+        """
+        Queue chat, typed or spoken, for the next generation.
+
+        Simple commands matching a single built-in action are dispatched right away instead, they
+        stay in the chat history of the prompt.
+
+        Args:
+            text (str): The chat message.
+            created_at (datetime): When it was sent.
+            reply_channel: Where the notes of the generation are sent.
+            dispatch (bool): False to only add the message to the chat history, when its command already ran.
+            fast_path (bool): False to always leave the message to the model.
+
+        Returns:
+            asyncio.Future: Resolves once the actions of the message were executed, None when not dispatched.
+        """
+        self.prompt_generator.add_chat_message(text, created_at)
+        if not dispatch:
+            return None
+        self.reply_channel = reply_channel
+
+        task = self.match_fast_path(text, reply_channel) if fast_path else None
+        if task is not None:
+            return task
+
+        self._new_chat_messages.append(text)
+        return self.scheduler.request()
+
+    def match_fast_path(self, text: str, reply_channel=None) -> Optional[asyncio.Task]:
+        """
+        Dispatch a chat command without the model when it matches a single built-in action.
+
+        Returns:
+            asyncio.Task: The dispatch of the matched actions, None when the command needs the model.
+        """
+        actions = self.intent_matcher.match(text)
+        if not actions:
+            return None
+        task = asyncio.create_task(self.run_fast_path(actions, reply_channel))
+        self._fast_path_tasks.add(task)
+        task.add_done_callback(self._fast_path_tasks.discard)
+        return task
+
+    async def run_fast_path(self, actions: List[dict], reply_channel=None):
+        """
+        Execute the actions matched from a chat command without calling the model.
+        """
+        self.fast_path_commands += 1
+        logger.info(f"Dispatching chat command without the model: {actions}")
+        notes = self.collect_notes(await self.action_executor.execute(actions), list())
+        if notes and reply_channel:
+            await reply_channel.send(" ".join(notes))
+        return notes
+
+    def tick(self):
+        """
+        Periodic generation without chat, skipped while one is already pending or running or while
+        the game is unreachable.
+        """
+        if not self.backend.connected:
+            logger.info(f"Session {self.session_id} is not connected to the game, skipping tick: {self.backend.health}")
+            return None
+        if self.scheduler.idle:
+            self.prompt_generator.clear_chat_messages()
+            return self.scheduler.request()
+        return None
+
+    async def find_available_actions(self):
+        """
+        Register the functions of the preset which aren't actions yet and list them in the prompt.
+        """
+        # NOTE: disabled by default due to description not loading well for all the function names
+        if not self.register_preset_actions:
+            return
+
+        available_actions = await self.backend.get_remote_preset(self.config.preset_name)
+        if available_actions is None:
+            logger.error(f"Unable to load preset {self.config.preset_name}, no response from the game.")
+            return
+        for spec in self.action_registry.register_preset(available_actions):
+            self.prompt_generator.add_action(GameAction(action=spec.describe()))
+
+    async def fetch_game_state(self) -> Optional[GameState]:
+        """
+        Load the full game state from the game.
+        """
+        ue_response = await self.backend.call_object_function(self.remote_object_path, "GameState", {})
+
+        if ue_response is not None and ue_response.ResponseCode == 200:
+            return GameState.from_dict(ue_response.ResponseBody)
+
+        logger.error(f"Unable to load game state! {ue_response}")
+        return None
+
+    async def update_latest_game_state(self):
+        """
+        Refresh the prompt contexts from the cached game state, unchanged states are skipped.
+        """
+        game_state = await self.game_state_cache.get()
+
+        if game_state is not None and game_state is not self._context_state:
+            self._context_state = game_state
+            self.prompt_generator.clear_contexts()
+            # Player state first, it is kept when the context is over its token budget
+            self.prompt_generator.add_context(GameContext(context={"PlayerLocation": game_state.PlayerLocation}))
+            self.prompt_generator.add_context(GameContext(context={"PlayerAmmo": game_state.PlayerAmmo}))
+            self.prompt_generator.add_context(GameContext(context={"PlayerGrenades": game_state.PlayerGrenades}))
+            self.prompt_generator.add_context(GameContext(context={"PlayerHealth": game_state.PlayerHealth}))
+
+            self.intent_matcher.add_locations(game_state.LocationNames)
+            for location_name in game_state.LocationNames:
+                self.prompt_generator.add_context(GameContext(context={"Location": location_name}))
+
+            for bear_name, location in game_state.BearLocations.items():
+                self.prompt_generator.add_context(GameContext(context={"Bear": {"NameOrPath": bear_name, "Location": location}}))
+
+    async def fetch_thumbnail(self, object_path: str) -> Optional[bytes]:
+        timeout = 5.0
+        response = await self.backend.get_object_thumbnail(object_path=object_path, timeout=timeout)
+        if not response or not response.get("ResponseBody"):
+            logger.error(f"Failed to get the thumbnail of {object_path}: {response}")
+            return None
+
+        try:
+            return base64.b64decode(response["ResponseBody"])
+        except (binascii.Error, TypeError) as e:
+            logger.error(f"Invalid thumbnail for {object_path}: {e}")
+            return None
+
+    async def generate_content_with_thumbnail(self, object_path: str, title: str, image_alt: str,
+                                              asset_path: Optional[str] = None):
+        """
+        Build a Discord embed showing the thumbnail of an object, None when the thumbnail is unavailable.
+
+        Thumbnails are cached per asset when the game reports it, per object otherwise, and the
+        attachment is built in memory, nothing is written to disk.
+        """
+        image = await self.thumbnail_cache.get(object_path, asset_path)
+        if image is None:
+            return None
+        logger.debug(f"Thumbnail cache hits: {self.thumbnail_cache.hits}, misses: {self.thumbnail_cache.misses}")
+
+        embed = discord.Embed(title=title, description=image_alt, color=discord.Color.blue())
+        file = discord.File(io.BytesIO(image), filename="image.png")
+        embed.set_image(url="attachment://image.png")
+
+        return (file, embed)
+
+    async def replay_plan(self, plan: dict, notes: list):
+        """
+        Execute the actions of a parsed plan.
+        """
+        if plan["Header"]["Notes"]:
+            notes.append(plan["Header"]["Notes"])
+
+        for action in plan["Actions"]:
+            if action["Name"] == "Chat":
+                self.prompt_generator.add_previous_message(action["Arg1"])
+
+        return await self.action_executor.execute(plan["Actions"])
+
+    async def run_plan(self, model_id: str, rag_request_payload: RAGRequestPayload, notes: list,
+                       cache_key: Optional[str] = None):
+        """
+        Wait for the complete response from the model then execute its actions.
+        """
+        response = await self.rag.make_rag_request_async(model_id=model_id, rag_request_payload=rag_request_payload)
+        results = list()
+        for content in response.content:
+            if content.type == "text":
+                parsed = json.loads(content.text)
+                self.response_cache.put(cache_key, parsed)
+                results.extend(await self.replay_plan(parsed, notes))
+
+        return results
+
+    async def run_streamed_plan(self, model_id: str, rag_request_payload: RAGRequestPayload, notes: list,
+                                cache_key: Optional[str] = None):
+        """
+        Stream the response from the model and execute each action as soon as it has been generated.
+        """
+        parser = ActionStreamParser()
+
+        async def streamed_actions():
+            async for text in self.rag.stream_rag_request_async(model_id=model_id, rag_request_payload=rag_request_payload):
+                for action in parser.feed(text):
+                    if action.get("Name") == "Chat":
+                        self.prompt_generator.add_previous_message(action["Arg1"])
+                    yield action
+
+        results = await self.action_executor.execute_stream(streamed_actions())
+
+        parsed = parser.result()
+        self.response_cache.put(cache_key, parsed)
+        if parsed["Header"]["Notes"]:
+            notes.append(parsed["Header"]["Notes"])
+
+        return results
+
+    async def execute_planned(self, actions: List[PlannedAction]):
+        """
+        Execute actions decoded from tool calls.
+        """
+        for action in actions:
+            if action.Name == "Chat":
+                self.prompt_generator.add_previous_message(action.Arguments.get("Arg1"))
+
+        return await self.action_executor.execute([action.to_action() for action in actions])
+
+    async def run_streamed_tool_calls(self, model_id: str, rag_request_payload: RAGRequestPayload):
+        """
+        Stream the tool calls of the model and execute each action as soon as its call is complete.
+        """
+        parser = ToolCallStreamParser(self.action_registry)
+
+        async def streamed_actions():
+            async for event in self.rag.stream_rag_events_async(model_id=model_id, rag_request_payload=rag_request_payload):
+                for action in parser.feed(event):
+                    if action.Name == "Chat":
+                        self.prompt_generator.add_previous_message(action.Arguments.get("Arg1"))
+                    yield action.to_action()
+
+        results = await self.action_executor.execute_stream(streamed_actions())
+        return parser.result(), results
+
+    async def run_tool_plan(self, model_id: str, rag_request_payload: RAGRequestPayload, notes: list,
+                            cache_key: Optional[str] = None):
+        """
+        Get the actions as tool calls, every valid call is executed and the model is asked to redo
+        the invalid or cut off ones instead of failing the whole turn.
+        """
+        taken = ToolPlan()
+        results = list()
+        for attempt in range(self.max_repairs + 1):
+            if self.stream_responses:
+                plan, attempt_results = await self.run_streamed_tool_calls(model_id, rag_request_payload)
+            else:
+                response = await self.rag.make_rag_request_async(model_id=model_id, rag_request_payload=rag_request_payload)
+                plan = decode_tool_calls(response, self.action_registry)
+                attempt_results = await self.execute_planned(plan.actions)
+
+            results.extend(attempt_results)
+            taken.actions.extend(plan.actions)
+            taken.notes.extend(plan.notes)
+            taken.errors = plan.errors
+            taken.truncated = plan.truncated
+            if plan.complete:
+                break
+            if attempt < self.max_repairs:
+                logger.warning(f"Repairing the plan, errors: {plan.errors}, truncated: {plan.truncated}")
+                rag_request_payload = repair_payload(rag_request_payload, taken)
+            else:
+                logger.error(f"Giving up repairing the plan, errors: {plan.errors}, truncated: {plan.truncated}")
+
+        notes.extend(taken.notes)
+        if taken.complete:
+            self.response_cache.put(cache_key, taken.to_plan())
+        return results
+
+    async def generate(self):
+        """
+        A single scheduled generation, replies with the notes in the channel of the latest chat message.
+        """
+        reply_channel = self.reply_channel
+        self.reply_channel = None
+
+        notes = await self.do_some_stuff()
+        if notes and reply_channel:
+            await reply_channel.send(" ".join(notes))
+
+        return notes
+
+    async def do_some_stuff(self):
+        await self.find_available_actions()
+        await self.update_latest_game_state()
+
+        notes = list()
+        chat_messages = self._new_chat_messages
+        self._new_chat_messages = list()
+
+        # The same request in a similar game state replays the plan generated last time
+        cache_key = self.response_cache.fingerprint(chat_messages, self.game_state_cache.state)
+        plan = self.response_cache.get(cache_key)
+        if plan is not None:
+            logger.info(f"Replaying cached plan, response cache hit rate: {self.response_cache.hit_rate:.2f}")
+            results = await self.replay_plan(plan, notes)
+            return self.collect_notes(results, notes)
+
+        # Static prefix marked for Bedrock prompt caching followed by the per turn context
+        prompt_content = self.prompt_generator.generate_message_content()
+        logger.debug(f"Prompt budget: {self.prompt_generator.budget_report}")
+
+        model_id = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+        rag_request_payload = RAGRequestPayload(
+            anthropic_version="bedrock-2023-05-31",
+            max_tokens=2048,
+            top_k=250,
+            temperature=0.5,
+            top_p=0.7,
+            messages=[
+                Message(
+                    role="user",
+                    content=prompt_content
+                )
+            ],
+            tools=generate_tools(self.action_registry) if self.use_tools else None,
+            tool_choice=TOOL_CHOICE if self.use_tools else None
+        )
+
+        try:
+            if self.use_tools:
+                results = await self.run_tool_plan(model_id, rag_request_payload, notes, cache_key=cache_key)
+            elif self.stream_responses:
+                results = await self.run_streamed_plan(model_id, rag_request_payload, notes, cache_key=cache_key)
+            else:
+                results = await self.run_plan(model_id, rag_request_payload, notes, cache_key=cache_key)
+        except asyncio.TimeoutError:
+            logger.error("Timed out waiting for a response from the model.")
+            return notes
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid response from the model: {e}")
+            return notes
+
+        return self.collect_notes(results, notes)
+
+    def collect_notes(self, results: list, notes: list) -> list:
+        """
+        Add the failed UE calls of a plan to its notes.
+        """
+        for result in results:
+            logger.debug(f"{result.action.get('Name')} took {result.latency:.3f}s")
+            if result.response and not result.succeeded:
+                logger.error(f"Failed to call function in UE: {result.response}")
+                notes.append(str(result.response))
+            elif result.error:
+                notes.append(result.error)
+
+        return notes
+
+
+class SessionRegistry:
+    """
+    Maps Discord guilds and channels to the game sessions they drive.
+
+    Sessions without a guild id match a channel of that name in any guild.
+    """
+
+    def __init__(self, rag: BedrockRAGClient, **session_options) -> None:
+        """
+        Args:
+            rag (BedrockRAGClient): The Bedrock client shared by every session.
+            session_options: Options passed to each GameSession.
+        """
+        self.rag = rag
+        self.session_options = session_options
+        self.sessions: Dict[str, GameSession] = dict()
+        self._channels: Dict[Tuple[Optional[int], str], GameSession] = dict()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(list(self.sessions.values()))
+
+    def add(self, config: SessionConfig) -> GameSession:
+        """
+        Create a session, replacing any previous one with the same id or channel.
+        """
+        if config.session_id in self.sessions:
+            self.remove(config.session_id)
+
+        channel_key = (config.guild_id, config.channel_name)
+        if channel_key in self._channels:
+            raise ValueError(f"Channel {config.channel_name} already drives session {self._channels[channel_key].session_id}")
+
+        session = GameSession(config, self.rag, **self.session_options)
+        self.sessions[config.session_id] = session
+        self._channels[channel_key] = session
+        return session
+
+    def remove(self, session_id: str) -> Optional[GameSession]:
+        """
+        Forget a session, the caller is responsible for disconnecting it.
+        """
+        session = self.sessions.pop(session_id, None)
+        if session:
+            self._channels.pop((session.config.guild_id, session.config.channel_name), None)
+        return session
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        return self.sessions.get(session_id)
+
+    def find(self, guild_id: Optional[int], channel_name: str) -> Optional[GameSession]:
+        """
+        Find the session driven by a channel.
+
+        Args:
+            guild_id (int): The guild the channel belongs to.
+            channel_name (str): The name of the channel.
+        """
+        session = self._channels.get((guild_id, channel_name))
+        if session is None:
+            session = self._channels.get((None, channel_name))
+        return session
+
+
+def load_session_configs(path: str) -> List[SessionConfig]:
+    """
+    Load session configurations from a JSON file holding a list of sessions.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        list: The session configurations.
+    """
+    with open(path, "r") as f:
+        return [SessionConfig.from_dict(session) for session in json.load(f)]
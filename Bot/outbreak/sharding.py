@@ -0,0 +1,338 @@
+"""
+Sharding of game sessions across bot replicas.
+
+Every replica heartbeats into a coordinator and builds the same consistent hash ring from the live
+members, so each session id is owned by exactly one replica once the replicas agree on the members.
+When a replica joins or leaves only the sessions hashed next to it move, the old owner lets its
+in-flight generation finish before handing the session over.
+
+Replicas see membership changes at different rebalances, so a session is only driven while holding
+its lease in the coordinator. The new owner waits for the old one to release the lease, or for it
+to expire when the old owner died, and never drives the game server at the same time.
+
+When the bot also uses Discord sharding, sessions bound to a guild follow the Discord shard of that
+guild since only that replica receives the guild's messages.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from outbreak.sessions import SessionConfig, SessionRegistry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes.
+    """
+
+    def __init__(self, members: Iterable[str], virtual_nodes: int = 64):
+        """
+        Args:
+            members (list): The replica ids on the ring.
+            virtual_nodes (int): Points per replica, more points spread sessions more evenly.
+        """
+        self.members = sorted(set(members))
+        points = sorted(
+            (_hash(f"{member}#{index}"), member)
+            for member in self.members
+            for index in range(virtual_nodes))
+        self._hashes = [point[0] for point in points]
+        self._owners = [point[1] for point in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """
+        Find the replica owning a key.
+
+        Returns:
+            str: The replica id, None when the ring is empty.
+        """
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class InMemoryCoordinator:
+    """
+    Tracks live replicas in process memory, for tests and running several replicas in one process.
+    """
+
+    def __init__(self, ttl: float = 30.0, lease_ttl: float = 90.0):
+        """
+        Args:
+            ttl (float): Seconds without heartbeat after which a replica is gone.
+            lease_ttl (float): Seconds a session lease lasts without renewal, longer than a handover and a rebalance.
+        """
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        self._heartbeats: Dict[str, float] = dict()
+        # Session id to the replica holding its lease and when the lease was renewed
+        self._leases: Dict[str, Tuple[str, float]] = dict()
+
+    def heartbeat(self, replica_id: str):
+        self._heartbeats[replica_id] = time.time()
+
+    def leave(self, replica_id: str):
+        self._heartbeats.pop(replica_id, None)
+
+    def members(self) -> List[str]:
+        oldest = time.time() - self.ttl
+        return sorted(replica for replica, seen in self._heartbeats.items() if seen >= oldest)
+
+    def acquire_lease(self, session_id: str, replica_id: str) -> bool:
+        """
+        Take or renew the lease of a session, unless another replica holds it and it hasn't expired.
+        """
+        holder, renewed = self._leases.get(session_id, (None, 0.0))
+        if holder not in (None, replica_id) and renewed >= time.time() - self.lease_ttl:
+            return False
+        self._leases[session_id] = (replica_id, time.time())
+        return True
+
+    def release_lease(self, session_id: str, replica_id: str):
+        if self._leases.get(session_id, (None, 0.0))[0] == replica_id:
+            del self._leases[session_id]
+
+
+class FileCoordinator:
+    """
+    Tracks live replicas as heartbeat files in a directory shared by every replica.
+
+    Session leases are files holding the id of their replica, renewed by touching them. Taking a lease
+    over and releasing it happen while holding a lock file created exclusively, the new holder is
+    written to a temporary file moved over the lease.
+    """
+
+    def __init__(self, directory: str, ttl: float = 30.0, lease_ttl: float = 90.0):
+        """
+        Args:
+            directory (str): The directory shared by every replica.
+            ttl (float): Seconds without heartbeat after which a replica is gone.
+            lease_ttl (float): Seconds a session lease lasts without renewal, longer than a handover and a rebalance.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, replica_id: str) -> str:
+        return os.path.join(self.directory, f"{replica_id}.heartbeat")
+
+    def heartbeat(self, replica_id: str):
+        path = self._path(replica_id)
+        with open(path, "a"):
+            pass
+        os.utime(path)
+
+    def leave(self, replica_id: str):
+        try:
+            os.remove(self._path(replica_id))
+        except FileNotFoundError:
+            pass
+
+    def members(self) -> List[str]:
+        oldest = time.time() - self.ttl
+        members = list()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".heartbeat"):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self.directory, name)) >= oldest:
+                    members.append(name[:-len(".heartbeat")])
+            except FileNotFoundError:
+                continue
+        return sorted(members)
+
+    def _lease_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{quote(session_id, safe='')}.lease")
+
+    def _lease_holder(self, path: str) -> Optional[str]:
+        try:
+            with open(path) as lease:
+                return lease.read()
+        except FileNotFoundError:
+            return None
+
+    def _lease_expired(self, path: str) -> bool:
+        try:
+            return os.path.getmtime(path) < time.time() - self.lease_ttl
+        except FileNotFoundError:
+            return True
+
+    @contextmanager
+    def _lease_lock(self, path: str):
+        """
+        Hold the lock of a lease, yields False when another replica holds it.
+        """
+        lock = f"{path}.lock"
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                # Left behind by a replica which died holding it, the lock is only held for a few file operations
+                if os.path.getmtime(lock) < time.time() - self.ttl:
+                    os.remove(lock)
+            except FileNotFoundError:
+                pass
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            os.remove(lock)
+
+    def acquire_lease(self, session_id: str, replica_id: str) -> bool:
+        """
+        Take or renew the lease of a session, unless another replica holds it and it hasn't expired.
+        """
+        path = self._lease_path(session_id)
+        holder = self._lease_holder(path)
+        if holder == replica_id:
+            os.utime(path)
+            return True
+        if holder is not None and not self._lease_expired(path):
+            return False
+
+        with self._lease_lock(path) as locked:
+            if not locked:
+                return False
+            # Another replica may have taken the lease before the lock was acquired
+            holder = self._lease_holder(path)
+            if holder is not None and holder != replica_id:
+                if not self._lease_expired(path):
+                    return False
+                logger.info(f"Lease of session {session_id} held by {holder} expired")
+
+            temporary = f"{path}.{quote(replica_id, safe='')}.tmp"
+            with open(temporary, "w") as lease:
+                lease.write(replica_id)
+            os.replace(temporary, path)
+        return True
+
+    def release_lease(self, session_id: str, replica_id: str):
+        path = self._lease_path(session_id)
+        with self._lease_lock(path) as locked:
+            if locked and self._lease_holder(path) == replica_id:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def discord_shard_id(guild_id: int, shard_count: int) -> int:
+    """
+    The Discord shard receiving the events of a guild.
+    """
+    return (guild_id >> 22) % shard_count
+
+
+class ShardManager:
+    """
+    Keeps the session registry of a replica in line with the sessions it owns.
+    """
+
+    def __init__(self, replica_id: str, coordinator, registry: SessionRegistry,
+                 sessions: Iterable[SessionConfig], shard_id: Optional[int] = None,
+                 shard_count: Optional[int] = None, handover_timeout: float = 30.0):
+        """
+        Args:
+            replica_id (str): Unique id of this replica, the pod name in Kubernetes.
+            coordinator: The coordinator tracking live replicas.
+            registry (SessionRegistry): The registry holding the sessions this replica drives.
+            sessions (list): Every session across all replicas.
+            shard_id (int): The Discord shard of this replica when Discord sharding is used.
+            shard_count (int): The number of Discord shards.
+            handover_timeout (float): Seconds to let an in-flight generation finish before handing over.
+        """
+        self.replica_id = replica_id
+        self.coordinator = coordinator
+        self.registry = registry
+        self.sessions = {session.session_id: session for session in sessions}
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.handover_timeout = handover_timeout
+        self.ring = HashRing([replica_id])
+
+    def owns(self, config: SessionConfig) -> bool:
+        if self.shard_count and config.guild_id is not None:
+            return discord_shard_id(config.guild_id, self.shard_count) == self.shard_id
+        return self.ring.owner(config.session_id) == self.replica_id
+
+    def add_session(self, config: SessionConfig):
+        self.sessions[config.session_id] = config
+
+    def remove_session(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    async def rebalance(self) -> List[str]:
+        """
+        Heartbeat, then claim newly owned sessions and hand over the ones owned elsewhere.
+
+        Returns:
+            list: The ids of the sessions owned by this replica.
+        """
+        self.coordinator.heartbeat(self.replica_id)
+        members = sorted(set(self.coordinator.members()) | {self.replica_id})
+        if members != self.ring.members:
+            logger.info(f"Replicas changed to {members}")
+            self.ring = HashRing(members)
+
+        owned = {session_id for session_id, config in self.sessions.items() if self.owns(config)}
+        current = {session.session_id for session in self.registry}
+
+        # Sessions whose lease was lost, after a stall longer than its expiry, are already driven elsewhere
+        lost = {session_id for session_id in current & owned
+                if not self.coordinator.acquire_lease(session_id, self.replica_id)}
+        await asyncio.gather(*[self.release(session_id) for session_id in (current - owned) | lost])
+
+        claimable = list()
+        for session_id in sorted(owned - current - lost):
+            if self.coordinator.acquire_lease(session_id, self.replica_id):
+                claimable.append(session_id)
+            else:
+                logger.info(f"Replica {self.replica_id} waiting for the previous owner to hand over session {session_id}")
+        await asyncio.gather(*[self.claim(self.sessions[session_id]) for session_id in claimable])
+
+        return sorted(owned)
+
+    async def claim(self, config: SessionConfig):
+        logger.info(f"Replica {self.replica_id} claiming session {config.session_id}")
+        session = self.registry.add(config)
+        try:
+            await session.connect()
+        except Exception as e:
+            logger.error(f"Unable to connect session {config.session_id}: {e}")
+
+    async def release(self, session_id: str):
+        session = self.registry.remove(session_id)
+        if session is None:
+            return
+
+        logger.info(f"Replica {self.replica_id} handing over session {session_id}")
+        await session.scheduler.drain(timeout=self.handover_timeout)
+        try:
+            await session.disconnect()
+        except Exception as e:
+            logger.error(f"Unable to disconnect session {session_id}: {e}")
+        self.coordinator.release_lease(session_id, self.replica_id)
+
+    async def leave(self):
+        """
+        Hand over every session and leave the ring so the other replicas pick them up.
+        """
+        self.coordinator.leave(self.replica_id)
+        await asyncio.gather(*[self.release(session.session_id) for session in self.registry])
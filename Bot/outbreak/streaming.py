@@ -0,0 +1,159 @@
+"""
+Incremental parsing of streamed LLM responses.
+
+The model answers with a single JSON document containing an "Actions" array. While the response is
+still being generated, ActionStreamParser picks out every element of that array as soon as its
+closing brace arrives so it can be dispatched to the game before the rest of the plan is written.
+
+When the actions are given to the model as tools, ToolCallStreamParser does the same with the stream
+events, each tool call is validated and decoded as soon as its input is complete.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from outbreak.models import PlannedAction
+from outbreak.registry import ActionRegistry
+from outbreak.tools import ToolPlan
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ActionStreamParser:
+    """
+    Scans streamed text for complete elements of the top level "Actions" array.
+    """
+
+    def __init__(self, actions_key: str = "Actions"):
+        self.actions_key = actions_key
+        self.text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key = None
+        self._actions_depth = None
+        self._action_start = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add a chunk of text from the stream.
+
+        Args:
+            chunk (str): The next piece of generated text.
+
+        Returns:
+            list: The actions completed by this chunk, in order.
+        """
+        self.text += chunk
+        actions = list()
+        text = self.text
+
+        for position in range(self._position, len(text)):
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start:position]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position + 1
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._last_key == self.actions_key:
+                    self._actions_depth = self._depth + 1
+                elif char == "{" and self._actions_depth is not None and self._depth == self._actions_depth:
+                    self._action_start = position
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._action_start is not None and self._depth == self._actions_depth:
+                    action = self._decode(text[self._action_start:position + 1])
+                    if action is not None:
+                        actions.append(action)
+                    self._action_start = None
+                elif self._actions_depth is not None and self._depth < self._actions_depth:
+                    self._actions_depth = None
+                    self._last_key = None
+
+        self._position = len(text)
+        return actions
+
+    def _decode(self, raw_action: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(raw_action)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to decode streamed action: {raw_action}")
+            return None
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Decode the complete response once the stream has finished.
+
+        Returns:
+            dict: The full parsed response.
+
+        Raises:
+            json.JSONDecodeError: If the complete text isn't valid JSON.
+        """
+        return json.loads(self.text)
+
+
+class ToolCallStreamParser:
+    """
+    Decodes the tool calls of a streamed response as each of them completes.
+    """
+
+    def __init__(self, registry: ActionRegistry):
+        self.registry = registry
+        self.plan = ToolPlan()
+        self._calls: Dict[int, Tuple[str, List[str]]] = dict()
+
+    def feed(self, event: Dict[str, Any]) -> List[PlannedAction]:
+        """
+        Add an event of the stream.
+
+        Args:
+            event (dict): The next parsed stream event.
+
+        Returns:
+            list: The actions of the tool calls completed by this event.
+        """
+        event_type = event.get("type")
+        if event_type == "content_block_start" and event["content_block"].get("type") == "tool_use":
+            self._calls[event["index"]] = (event["content_block"]["name"], list())
+        elif event_type == "content_block_delta" and event["delta"].get("type") == "input_json_delta":
+            if event["index"] in self._calls:
+                self._calls[event["index"]][1].append(event["delta"]["partial_json"])
+        elif event_type == "content_block_stop" and event.get("index") in self._calls:
+            name, parts = self._calls.pop(event["index"])
+            try:
+                arguments = json.loads("".join(parts) or "{}")
+            except ValueError:
+                logger.warning(f"Invalid tool input for {name}: {''.join(parts)}")
+                self.plan.errors.append(f"The input of {name} was not valid JSON.")
+                return list()
+
+            decoded = len(self.plan.actions)
+            self.plan.add_call(self.registry, name, arguments)
+            return self.plan.actions[decoded:]
+        elif event_type == "message_delta" and event.get("delta", dict()).get("stop_reason") == "max_tokens":
+            self.plan.truncated = True
+
+        return list()
+
+    def result(self) -> ToolPlan:
+        """
+        The decoded plan, calls still open when the stream ended make it truncated.
+        """
+        if self._calls:
+            self.plan.truncated = True
+        return self.plan
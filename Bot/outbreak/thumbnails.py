@@ -0,0 +1,123 @@
+"""
+In-memory cache of the object thumbnails rendered by the game.
+
+Thumbnails are cached by the asset path the game reports for an object when there is one, so
+every bear spawned from the same blueprint shares a thumbnail, and by the full object path
+otherwise. Instances of a generic class such as StaticMeshActor show different meshes and never
+share an entry through their class. The cache is a LRU bounded by its number of entries and its
+total size in bytes, entries expire after a TTL so changed assets are picked up again. Concurrent
+requests for a missing thumbnail share a single fetch.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    """
+    LRU of decoded thumbnail images, bounded by count, size and age.
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Optional[bytes]]], max_entries: int = 64,
+                 max_bytes: int = 8 * 1024 * 1024, ttl: float = 600.0):
+        """
+        Args:
+            fetch (function): Coroutine function loading the image of an object path, None on failure.
+            max_entries (int): Maximum number of thumbnails kept.
+            max_bytes (int): Maximum total size of the thumbnails kept.
+            ttl (float): Seconds a thumbnail is reused before it is fetched again.
+        """
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()
+        self._fetching: Dict[str, asyncio.Task] = dict()
+        # Bumped by clear(), fetches started before it don't fill the cache again
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    async def get(self, object_path: str, asset_path: Optional[str] = None) -> Optional[bytes]:
+        """
+        The thumbnail of an object, fetched only when no fresh thumbnail of it or its asset is cached.
+
+        Args:
+            object_path (str): Path of the object, e.g. /Game/Map.Map:PersistentLevel.BP_Bear_C_12
+            asset_path (str): The blueprint or mesh the object was spawned from, as reported by the game.
+
+        Returns:
+            bytes: The image, None when it couldn't be fetched.
+        """
+        key = asset_path or object_path
+        entry = self._entries.get(key)
+        if entry is not None:
+            image, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+            self._remove(key)
+
+        self.misses += 1
+        task = self._fetching.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, object_path, self._generation))
+            self._fetching[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, object_path: str, generation: int) -> Optional[bytes]:
+        try:
+            image = await self.fetch(object_path)
+        finally:
+            if self._fetching.get(key) is asyncio.current_task():
+                del self._fetching[key]
+
+        if image is not None and generation == self._generation:
+            self.put(key, image)
+        return image
+
+    def put(self, key: str, image: bytes):
+        """
+        Store a thumbnail, evicting the least recently used ones over the bounds.
+        """
+        if len(image) > self.max_bytes:
+            logger.warning(f"Thumbnail of {key} is larger than the cache, not caching it.")
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (image, time.monotonic())
+        self.size += len(image)
+
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        image, _ = self._entries.pop(key)
+        self.size -= len(image)
+
+    def clear(self):
+        self._entries.clear()
+        self._fetching.clear()
+        self._generation += 1
+        self.size = 0
@@ -0,0 +1,164 @@
+"""
+Bedrock tool definitions for the game actions and validation of the tool calls.
+
+Instead of writing a JSON document which has to be parsed, the model calls one tool per action.
+The tools are generated from the action registry, like the actions section of the prompt. The input
+of each call is checked by the validator of its action before it's decoded into a PlannedAction, the
+calls which fail validation are reported back to the model to be repaired instead of failing the turn.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from outbreak.models import Message, MessageContent, PlannedAction, RAGRequestPayload, RAGResponse, Tool
+from outbreak.registry import ActionRegistry, ActionSpec
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NOTES_TOOL = Tool(
+    name="Notes",
+    description="Notes or improvements to the list of available actions.",
+    input_schema={
+        "type": "object",
+        "properties": {"Notes": {"type": "string", "description": "Any additional notes or feedback you have."}},
+        "required": ["Notes"]
+    })
+
+# Forces the model to answer with tool calls only
+TOOL_CHOICE = {"type": "any"}
+
+
+def tool_for_action(spec: ActionSpec) -> Tool:
+    """
+    Build the tool of a registered action.
+
+    Args:
+        spec (ActionSpec): The declaration of the action.
+
+    Returns:
+        Tool: The tool definition.
+    """
+    return Tool(
+        name=spec.name,
+        description=f"Take the {spec.name} action in the game.",
+        input_schema=spec.input_schema())
+
+
+def generate_tools(registry: ActionRegistry) -> List[Tool]:
+    """
+    Build the tools of every registered action, followed by the Notes tool.
+    """
+    return [tool_for_action(spec) for spec in registry] + [NOTES_TOOL]
+
+
+def validate_tool_call(registry: ActionRegistry, name: str, arguments: Any) -> Tuple[Optional[PlannedAction], Optional[str]]:
+    """
+    Check the input of a tool call against the registered action and decode it.
+
+    Returns:
+        tuple: The action and None, or None and the reason the call is invalid. Notes calls return neither.
+    """
+    if not isinstance(arguments, dict):
+        return None, f"The input of {name} must be an object."
+    if name == NOTES_TOOL.name:
+        return None, None if isinstance(arguments.get("Notes"), str) else "Notes must be a string."
+
+    action = dict(arguments)
+    action["Name"] = name
+    error = registry.validate(action)
+    if error:
+        return None, error
+
+    reason = arguments.get("Reason")
+    return PlannedAction(
+        Name=name,
+        Arguments={argument: value for argument, value in arguments.items() if argument != "Reason"},
+        Reason=reason), None
+
+
+@dataclass
+class ToolPlan:
+    """
+    The actions decoded from the tool calls of a response, and what has to be repaired.
+    """
+    actions: List[PlannedAction] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    truncated: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors and not self.truncated
+
+    def add_call(self, registry: ActionRegistry, name: str, arguments: Any):
+        """
+        Validate a tool call and add its action, its notes or its error to the plan.
+        """
+        action, error = validate_tool_call(registry, name, arguments)
+        if error:
+            logger.warning(f"Invalid tool call: {error}")
+            self.errors.append(error)
+        elif action is not None:
+            self.actions.append(action)
+        elif name == NOTES_TOOL.name and arguments.get("Notes"):
+            self.notes.append(arguments["Notes"])
+
+    def to_plan(self) -> Dict[str, Any]:
+        """
+        The plan in the JSON response format, as stored in the response cache.
+        """
+        return {
+            "Header": {"Notes": " ".join(self.notes)},
+            "Actions": [action.to_action() for action in self.actions]
+        }
+
+
+def decode_tool_calls(response: RAGResponse, registry: ActionRegistry) -> ToolPlan:
+    """
+    Decode the tool calls of a complete response.
+
+    Args:
+        response (RAGResponse): The response of the model.
+        registry (ActionRegistry): The actions offered as tools in the request.
+
+    Returns:
+        ToolPlan: The valid actions in call order with the errors to repair.
+    """
+    plan = ToolPlan(truncated=response.stop_reason == "max_tokens")
+    for content in response.content:
+        if content.type == "tool_use":
+            plan.add_call(registry, content.name, content.input)
+    return plan
+
+
+def repair_payload(rag_request_payload: RAGRequestPayload, plan: ToolPlan) -> RAGRequestPayload:
+    """
+    The request asking the model to redo the calls which were invalid or cut off.
+
+    The valid actions have already been executed, the model is told about them so they aren't repeated.
+    """
+    feedback = list()
+    if plan.actions:
+        feedback.append("These actions were already taken, do not repeat them: "
+                        + json.dumps([action.to_action() for action in plan.actions]))
+    if plan.errors:
+        feedback.append("These tool calls were invalid: " + " ".join(plan.errors))
+    if plan.truncated:
+        feedback.append("Your response was cut off, finish the remaining actions with fewer calls.")
+    feedback.append("Call the tools again only for the actions that are still missing.")
+
+    message = rag_request_payload.messages[-1]
+    repaired_message = Message(
+        role=message.role,
+        content=list(message.content) + [MessageContent(type="text", text="\n".join(feedback))])
+    return RAGRequestPayload(
+        anthropic_version=rag_request_payload.anthropic_version,
+        max_tokens=rag_request_payload.max_tokens,
+        top_k=rag_request_payload.top_k,
+        temperature=rag_request_payload.temperature,
+        top_p=rag_request_payload.top_p,
+        messages=rag_request_payload.messages[:-1] + [repaired_message],
+        tools=rag_request_payload.tools,
+        tool_choice=rag_request_payload.tool_choice)
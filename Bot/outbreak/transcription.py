@@ -0,0 +1,359 @@
+"""
+Streaming transcription of voice audio.
+
+Audio chunks are written to a long-lived stream as they're recorded and transcripts come back
+as an async iterator, partial ones while the speaker is still talking and a final one per
+utterance. Nothing is written to disk or uploaded, unlike the batch jobs of the prototype.
+
+The stream of a speaker is opened when they start talking and closed by a timer after a while without
+speech, Discord sends no audio for a quiet member and Amazon Transcribe ends streams which stay quiet
+for too long and bills every second streamed. When other speakers wait for a worker of the pool, a
+stream is closed at the end of the utterance or once its speaker is briefly quiet instead.
+The StubTranscriber answers with scripted phrases so the pipeline can be used offline.
+
+Every voice session shares one TranscriptionPool, which bounds the streams and the blocking
+encoding and batch work running at once however many speakers and guilds are recorded.
+"""
+import abc
+import asyncio
+import dataclasses
+import functools
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional
+
+from outbreak.audio import SAMPLE_RATE, Utterance, VoiceActivityDetector
+
+try:
+    from amazon_transcribe.client import TranscribeStreamingClient
+except ImportError:  # pragma: no cover - depends on the environment
+    TranscribeStreamingClient = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Largest audio event accepted by Amazon Transcribe
+MAX_CHUNK_SIZE = 32 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class Transcript:
+    """
+    Text recognized in the audio of a speaker.
+    """
+    speaker: Any
+    text: str
+    final: bool
+    received_at: float
+    # When the speaker was last heard before the transcript arrived, the start of the voice command latency
+    spoken_at: Optional[float] = None
+
+
+class AudioStream:
+    """
+    Audio chunks handed from the recorder to a transcriber, as an async iterator.
+
+    Writing never blocks the recorder, when the transcriber falls behind the oldest chunks are dropped.
+    """
+
+    def __init__(self, max_chunks: int = 256):
+        self._chunks: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=max_chunks)
+        self.closed = False
+        self.dropped = 0
+
+    def write(self, pcm: bytes):
+        if self.closed:
+            return
+        if self._chunks.full():
+            self._chunks.get_nowait()
+            self.dropped += 1
+        self._chunks.put_nowait(pcm)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._chunks.full():
+            self._chunks.get_nowait()
+            self.dropped += 1
+        self._chunks.put_nowait(None)
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+
+class StreamingTranscriber(abc.ABC):
+    """
+    Turns a stream of 16 kHz mono PCM into transcripts.
+    """
+
+    @abc.abstractmethod
+    def transcribe(self, audio: AsyncIterable[bytes], speaker: Any = None) -> AsyncIterator[Transcript]:
+        """
+        Transcribe audio as it arrives.
+
+        Args:
+            audio (AsyncIterable): The audio chunks, ending when the stream is closed.
+            speaker: Who is speaking, copied to the transcripts.
+
+        Yields:
+            Transcript: Partial and final transcripts, in order.
+        """
+
+
+class AmazonTranscribeStreamer(StreamingTranscriber):
+    """
+    Transcribes over Amazon Transcribe streaming, requires the amazon-transcribe package.
+    """
+
+    def __init__(self, region_name: str, vocabulary_name: Optional[str] = None, language_code: str = "en-US"):
+        """
+        Args:
+            region_name (str): AWS region of Amazon Transcribe.
+            vocabulary_name (str): Custom vocabulary with the game words.
+            language_code (str): Language spoken.
+        """
+        if TranscribeStreamingClient is None:
+            raise ImportError("Streaming transcription requires the amazon-transcribe package.")
+        self.client = TranscribeStreamingClient(region=region_name)
+        self.vocabulary_name = vocabulary_name
+        self.language_code = language_code
+
+    async def transcribe(self, audio: AsyncIterable[bytes], speaker: Any = None) -> AsyncIterator[Transcript]:
+        stream = await self.client.start_stream_transcription(
+            language_code=self.language_code,
+            media_sample_rate_hz=SAMPLE_RATE,
+            media_encoding="pcm",
+            vocabulary_name=self.vocabulary_name)
+
+        async def send_audio():
+            async for chunk in audio:
+                for offset in range(0, len(chunk), MAX_CHUNK_SIZE):
+                    await stream.input_stream.send_audio_event(audio_chunk=chunk[offset:offset + MAX_CHUNK_SIZE])
+            await stream.input_stream.end_stream()
+
+        sender = asyncio.create_task(send_audio())
+        try:
+            async for event in stream.output_stream:
+                for result in event.transcript.results:
+                    if result.alternatives:
+                        yield Transcript(
+                            speaker=speaker,
+                            text=result.alternatives[0].transcript,
+                            final=not result.is_partial,
+                            received_at=time.monotonic())
+            await sender
+        finally:
+            sender.cancel()
+
+
+class StubTranscriber(StreamingTranscriber):
+    """
+    Offline transcriber answering each utterance with the next scripted phrase.
+
+    Utterances are found with the same voice activity detection as the recorder, every chunk of
+    speech yields a partial transcript with one more word of the phrase.
+    """
+
+    def __init__(self, phrases: Iterable[str] = ("spawn a bear at the pond",), **detector_options):
+        """
+        Args:
+            phrases (list): Transcripts of the utterances, in order and repeated.
+            **detector_options: Options of the VoiceActivityDetector finding the utterances.
+        """
+        self.phrases = itertools.cycle(list(phrases))
+        self.detector_options = detector_options
+
+    async def transcribe(self, audio: AsyncIterable[bytes], speaker: Any = None) -> AsyncIterator[Transcript]:
+        detector = VoiceActivityDetector(speaker=speaker, **self.detector_options)
+        words: List[str] = list()
+        heard = 0
+
+        async for chunk in audio:
+            for _ in detector.feed(chunk):
+                yield Transcript(speaker=speaker, text=" ".join(words or next(self.phrases).split()), final=True,
+                                 received_at=time.monotonic())
+                words, heard = list(), 0
+
+            if detector.speaking:
+                if not words:
+                    words = next(self.phrases).split()
+                if heard < len(words) - 1:
+                    heard += 1
+                    yield Transcript(speaker=speaker, text=" ".join(words[:heard]), final=False,
+                                     received_at=time.monotonic())
+
+        if detector.flush() is not None:
+            yield Transcript(speaker=speaker, text=" ".join(words or next(self.phrases).split()), final=True,
+                             received_at=time.monotonic())
+
+
+class TranscriptionPool:
+    """
+    Bounded workers shared by the voice sessions for encoding and transcription.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Args:
+            max_workers (int): Transcription streams and blocking jobs running at once, the others wait.
+        """
+        self.max_workers = max_workers
+        self.active = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcription")
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a worker for the duration of the block.
+        """
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    async def run(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking function on a worker without blocking the event loop.
+        """
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LiveTranscription:
+    """
+    The voice of one speaker, cut into utterances and streamed to a transcriber while they talk.
+    """
+
+    def __init__(self, transcriber: StreamingTranscriber, speaker: Any = None, idle_timeout: float = 10.0,
+                 pool: Optional[TranscriptionPool] = None, handover_after: float = 1.0, **detector_options):
+        """
+        Args:
+            transcriber (StreamingTranscriber): Transcribes the streams of the speaker.
+            speaker: Who is speaking.
+            idle_timeout (float): Seconds without speech after which the stream is closed.
+            pool (TranscriptionPool): Shared workers, each open stream holds one.
+            handover_after (float): Seconds without speech after which the stream is closed when other
+                speakers wait for a worker.
+            **detector_options: Options of the VoiceActivityDetector.
+        """
+        self.transcriber = transcriber
+        self.speaker = speaker
+        self.idle_timeout = idle_timeout
+        self.pool = pool
+        self.handover_after = handover_after
+        self.detector = VoiceActivityDetector(speaker=speaker, **detector_options)
+
+        self.audio: Optional[AudioStream] = None
+        self.streams_opened = 0
+        self._streams: asyncio.Queue[Optional[AudioStream]] = asyncio.Queue()
+        self._last_speech = 0.0
+        # Clock of the reaper, the audio may be fed with the time it was recorded
+        self._heard_at = 0.0
+        self._reaper: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def contended(self) -> bool:
+        return self.pool is not None and self.pool.waiting > 0
+
+    def feed(self, pcm: bytes, now: Optional[float] = None) -> List[Utterance]:
+        """
+        Record audio of the speaker, streaming it while they talk.
+
+        Returns:
+            list: The utterances completed by the audio.
+        """
+        now = time.monotonic() if now is None else now
+        was_speaking = self.detector.speaking
+        utterances = self.detector.feed(pcm, now)
+        if was_speaking or self.detector.speaking or utterances:
+            self._last_speech = now
+            self._heard_at = time.monotonic()
+
+        if self.audio is None and self.detector.speaking:
+            self.audio = AudioStream()
+            self.streams_opened += 1
+            self._streams.put_nowait(self.audio)
+            self._schedule_reaper(self.handover_after)
+
+        if self.audio is not None:
+            if now - self._last_speech > self.idle_timeout:
+                self._close_stream()
+            else:
+                self.audio.write(pcm)
+                # A slot is only held for one utterance while other speakers wait for one
+                if utterances and self.contended:
+                    self._close_stream()
+        return utterances
+
+    def _schedule_reaper(self, delay: float):
+        self._reaper = asyncio.get_running_loop().call_later(delay, self._reap)
+
+    def _reap(self):
+        """
+        Close the stream of a speaker gone quiet, no audio arrives to do it while they are.
+        """
+        self._reaper = None
+        if self.audio is None:
+            return
+        quiet = time.monotonic() - self._heard_at
+        if quiet >= self.idle_timeout or (quiet >= self.handover_after and self.contended):
+            self._close_stream()
+        else:
+            self._schedule_reaper(min(self.handover_after, self.idle_timeout - quiet))
+
+    def _close_stream(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        self.audio.close()
+        self.audio = None
+
+    def close(self):
+        """
+        End the stream, the transcripts iterator stops once the last transcript is in.
+        """
+        if self.audio is not None:
+            self._close_stream()
+        self._streams.put_nowait(None)
+
+    def __aiter__(self) -> AsyncIterator[Transcript]:
+        return self._transcripts()
+
+    async def _transcripts(self) -> AsyncIterator[Transcript]:
+        while True:
+            audio = await self._streams.get()
+            if audio is None:
+                return
+            try:
+                async with self.pool.slot() if self.pool is not None else nullcontext():
+                    async for transcript in self.transcriber.transcribe(audio, self.speaker):
+                        if transcript.spoken_at is None:
+                            transcript = dataclasses.replace(transcript, spoken_at=self.detector.last_voice_at)
+                        yield transcript
+            except Exception as e:
+                logger.error(f"Transcription of {self.speaker} failed: {e}")
@@ -0,0 +1,198 @@
+"""
+Voice recording sessions, one per guild with the speakers of its voice channel.
+
+Each session keeps the state of its own speakers: their voice activity detectors, their last
+utterances and, when streaming, their live transcriptions. The encoding and the transcription
+work of every session runs on a single shared TranscriptionPool, so one bot can transcribe a
+whole squad in several guilds at once while the work running at any time stays bounded.
+
+Audio artifacts only exist in memory and get unique names, sessions never collide on a file
+or a transcription job name.
+"""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from outbreak.audio import AudioRecorder, Utterance
+from outbreak.transcription import LiveTranscription, StreamingTranscriber, Transcript, TranscriptionPool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TranscriptCallback = Callable[[Transcript], Awaitable[None]]
+
+
+def artifact_name(guild_id: Hashable, speaker: Hashable, prefix: str = "voice", suffix: str = "") -> str:
+    """
+    A name which is unique per recording, for S3 keys and transcription jobs.
+
+    Args:
+        guild_id: The guild recorded.
+        speaker: The member speaking.
+        prefix (str): Start of the name.
+        suffix (str): End of the name, e.g. a file extension.
+
+    Returns:
+        str: The name, only made of characters allowed in transcription job names.
+    """
+    return f"{prefix}-{guild_id}-{speaker}-{uuid.uuid4().hex}{suffix}"
+
+
+class VoiceSession:
+    """
+    Recording of the speakers of one guild.
+    """
+
+    def __init__(self, guild_id: Hashable, pool: TranscriptionPool, transcriber: Optional[StreamingTranscriber] = None,
+                 on_transcript: Optional[TranscriptCallback] = None, max_speakers: int = 8, **detector_options):
+        """
+        Args:
+            guild_id: The guild recorded.
+            pool (TranscriptionPool): Workers shared with the other sessions.
+            transcriber (StreamingTranscriber): Streams the speech of every speaker, None to only keep utterances.
+            on_transcript (function): Coroutine function called with every transcript when streaming.
+            max_speakers (int): Speakers recorded at once, the one heard least recently is dropped for a new one.
+            **detector_options: Options of the voice activity detectors.
+        """
+        self.guild_id = guild_id
+        self.pool = pool
+        self.transcriber = transcriber
+        self.on_transcript = on_transcript
+        self.max_speakers = max_speakers
+        self.detector_options = detector_options
+
+        self.recording = False
+        self.recorder = AudioRecorder(max_speakers=max_speakers, **detector_options)
+        self.utterances: OrderedDict[Hashable, Utterance] = OrderedDict()
+        self.live: OrderedDict[Hashable, LiveTranscription] = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def streaming(self) -> bool:
+        return self.transcriber is not None
+
+    def feed(self, speaker: Hashable, pcm: bytes, now: Optional[float] = None):
+        """
+        Record audio of a speaker.
+
+        Args:
+            speaker: The member speaking.
+            pcm (bytes): 16 kHz mono 16 bit PCM.
+            now (float): Time the audio was received.
+        """
+        if self.streaming:
+            utterances = self._live(speaker).feed(pcm, now)
+        else:
+            utterances = self.recorder.feed(speaker, pcm, now)
+        for utterance in utterances:
+            self._keep(utterance)
+
+    def _keep(self, utterance: Utterance):
+        self.utterances[utterance.speaker] = utterance
+        self.utterances.move_to_end(utterance.speaker)
+        while len(self.utterances) > self.max_speakers:
+            self.utterances.popitem(last=False)
+
+    def _live(self, speaker: Hashable) -> LiveTranscription:
+        live = self.live.get(speaker)
+        if live is None:
+            if len(self.live) >= self.max_speakers:
+                dropped, oldest = self.live.popitem(last=False)
+                oldest.close()
+                logger.info(f"Too many speakers in guild {self.guild_id}, no longer transcribing {dropped}.")
+            live = LiveTranscription(self.transcriber, speaker, pool=self.pool, **self.detector_options)
+            self.live[speaker] = live
+            task = asyncio.create_task(self._deliver(live))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self.live.move_to_end(speaker)
+        return live
+
+    async def _deliver(self, live: LiveTranscription):
+        async for transcript in live:
+            if self.on_transcript is None:
+                continue
+            try:
+                await self.on_transcript(transcript)
+            except Exception as e:
+                logger.error(f"Failed to handle the transcript of {transcript.speaker}: {e}")
+
+    def latest_audio(self, speaker: Hashable, seconds: float = 6) -> bytes:
+        """
+        The last utterance of a speaker, or their last seconds of audio when they haven't said anything yet.
+        """
+        utterance = self.utterances.get(speaker)
+        if utterance is not None:
+            return utterance.audio
+        if self.streaming:
+            live = self.live.get(speaker)
+            return live.detector.last(seconds) if live is not None else b""
+        detector = self.recorder.detectors.get(speaker)
+        return detector.last(seconds) if detector is not None else b""
+
+    def stop(self):
+        """
+        Stop recording, ending the utterances and the transcription streams in progress.
+        """
+        self.recording = False
+        for utterance in self.recorder.flush():
+            self._keep(utterance)
+        for live in self.live.values():
+            utterance = live.detector.flush()
+            if utterance is not None:
+                self._keep(utterance)
+            live.close()
+        self.live.clear()
+        self.recorder.clear()
+
+    async def wait_closed(self):
+        """
+        Wait for the last transcripts of the stopped streams to be delivered.
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class VoiceSessions:
+    """
+    The voice sessions of every guild, sharing one worker pool.
+    """
+
+    def __init__(self, pool: TranscriptionPool, **session_options):
+        """
+        Args:
+            pool (TranscriptionPool): Workers shared by the sessions.
+            **session_options: Options of each VoiceSession.
+        """
+        self.pool = pool
+        self.session_options = session_options
+        self.sessions: Dict[Hashable, VoiceSession] = dict()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, guild_id: Hashable) -> Optional[VoiceSession]:
+        return self.sessions.get(guild_id)
+
+    def start(self, guild_id: Hashable, **options: Any) -> VoiceSession:
+        """
+        The session of a guild, created when it isn't recording yet.
+        """
+        session = self.sessions.get(guild_id)
+        if session is None:
+            session = VoiceSession(guild_id, self.pool, **{**self.session_options, **options})
+            self.sessions[guild_id] = session
+        session.recording = True
+        return session
+
+    async def stop(self, guild_id: Hashable) -> Optional[VoiceSession]:
+        """
+        Stop and forget the session of a guild.
+        """
+        session = self.sessions.pop(guild_id, None)
+        if session is not None:
+            session.stop()
+            await session.wait_closed()
+        return session
@@ -0,0 +1,205 @@
+"""
+Voice commands, transcripts fed to the game sessions like chat messages.
+
+Final transcripts take the same path as typed chat: simple commands go through the intent matcher
+fast path, anything else is queued for the next generation. Partial transcripts are matched too,
+so "spawn a bear at the pond" is dispatched before the speaker even stops talking, once two partial
+transcripts in a row match the same actions. The final transcript of an utterance which already ran
+is only added to the chat history, unless the speaker went on or the transcript was revised: "spawn a
+bear at the pond and two at the river", "... no, at the river" or "spawn a bear at the river" go to
+the model together with the actions which already ran, for it to reconcile them.
+
+Transcribe repeats itself and a voice picked up by two microphones is transcribed twice, the same
+command heard again in a guild within the dedup window is dropped.
+
+The latency of every command is measured from the moment the speaker was last heard to the
+acknowledgement of its actions by the game.
+"""
+import asyncio
+import datetime
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from outbreak.intents import LEADING_WORDS
+from outbreak.response_cache import normalize_intent
+from outbreak.sessions import GameSession
+from outbreak.transcription import Transcript
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SessionFinder = Callable[[Optional[int], str], Optional[GameSession]]
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def remainder(triggered: str, final: str) -> Optional[str]:
+    """
+    What a final transcript says after the partial transcript which triggered a command.
+
+    Args:
+        triggered (str): The partial transcript dispatched.
+        final (str): The final transcript of the same utterance.
+
+    Returns:
+        str: The rest of the final transcript, empty when it says nothing more, None when it doesn't
+        start with the triggered words because the transcript was revised.
+    """
+    triggered_words = WORD.findall(triggered.lower())
+    words = list(WORD.finditer(final.lower()))
+    if [word.group() for word in words[:len(triggered_words)]] != triggered_words:
+        return None
+    if len(words) == len(triggered_words):
+        return ""
+    return final[words[len(triggered_words)].start():].strip()
+
+
+def describe(actions: List[Dict[str, Any]]) -> str:
+    """
+    The actions of a command as told to the model, "Spawn Bear Pond, Spawn Bear Pond".
+    """
+    return ", ".join(" ".join(str(action[key]) for key in ("Name", "Arg1", "Arg2") if key in action)
+                     for action in actions)
+
+
+class VoiceCommandRouter:
+    """
+    Sends the transcripts of the voice sessions to the game session of their guild.
+    """
+
+    def __init__(self, find_session: SessionFinder, trigger_on_partials: bool = True, dedup_window: float = 5.0,
+                 max_samples: int = 256):
+        """
+        Args:
+            find_session (function): Finds the game session of a guild id and channel name, see SessionRegistry.find.
+            trigger_on_partials (bool): Dispatch fast path commands from partial transcripts.
+            dedup_window (float): Seconds the same command in a guild is considered a duplicate.
+            max_samples (int): Latencies kept for the statistics.
+        """
+        self.find_session = find_session
+        self.trigger_on_partials = trigger_on_partials
+        self.dedup_window = dedup_window
+
+        self.commands = 0
+        self.partial_triggers = 0
+        self.duplicates = 0
+        self.latencies: Deque[float] = deque(maxlen=max_samples)
+
+        # Commands recently dispatched per guild, intent to time
+        self._recent: Dict[Hashable, Dict[str, float]] = dict()
+        # Actions matched by the last partial transcript of a speaker, dispatched once the next one matches them too
+        self._heard: Dict[Tuple[Hashable, Any], List[Dict[str, Any]]] = dict()
+        # Utterances dispatched from a partial transcript whose final transcript hasn't arrived yet,
+        # guild and speaker to the time, text and actions of the partial
+        self._triggered: Dict[Tuple[Hashable, Any], Tuple[float, str, List[Dict[str, Any]]]] = dict()
+
+    def _is_duplicate(self, guild_id: Hashable, intent: str, now: float) -> bool:
+        recent = self._recent.setdefault(guild_id, dict())
+        for seen_intent, seen_at in list(recent.items()):
+            if now - seen_at > self.dedup_window:
+                del recent[seen_intent]
+        if intent in recent:
+            return True
+        recent[intent] = now
+        return False
+
+    def handle(self, guild_id: Optional[int], channel, transcript: Transcript) -> Optional[asyncio.Future]:
+        """
+        Dispatch the command of a transcript.
+
+        Args:
+            guild_id (int): The guild the speaker is in.
+            channel: The text channel bound to the game session, replies are sent there.
+            transcript (Transcript): A partial or final transcript.
+
+        Returns:
+            asyncio.Future: Resolves once the actions of the command were executed, None when nothing was dispatched.
+        """
+        text = transcript.text.strip()
+        session = self.find_session(guild_id, channel.name)
+        if not text or session is None:
+            return None
+
+        now = time.monotonic()
+        key = (guild_id, transcript.speaker)
+        triggered = self._triggered.get(key)
+        if triggered is not None and now - triggered[0] > self.dedup_window:
+            del self._triggered[key]
+            triggered = None
+
+        if not transcript.final:
+            if not self.trigger_on_partials or triggered is not None:
+                return None
+            actions = session.intent_matcher.match(text)
+            # Partial transcripts still change, only a command heard the same twice in a row is dispatched
+            if not actions or actions != self._heard.get(key):
+                self._heard[key] = actions
+                return None
+            self._triggered[key] = (now, text, actions)
+            if self._is_duplicate(guild_id, normalize_intent([text]), now):
+                self.duplicates += 1
+                logger.info(f"Dropping duplicate voice command from {transcript.speaker}: {text}")
+                return None
+            self.partial_triggers += 1
+            return self._measure(session.match_fast_path(text, channel), transcript)
+
+        self._heard.pop(key, None)
+        created_at = datetime.datetime.now(datetime.timezone.utc)
+        if triggered is not None:
+            del self._triggered[key]
+            _, triggered_text, actions = triggered
+            rest = remainder(triggered_text, text)
+            if rest is None and normalize_intent([text]) == normalize_intent([triggered_text]):
+                rest = ""
+            if rest and set(WORD.findall(rest.lower())) <= LEADING_WORDS:
+                rest = ""
+            if rest == "":
+                session.add_chat(text, created_at, channel, dispatch=False)
+                return None
+
+            if rest is None:
+                logger.info(f"Transcript of {transcript.speaker} changed from '{triggered_text}' to '{text}'")
+                correction = text
+            else:
+                session.add_chat(triggered_text, created_at, channel, dispatch=False)
+                correction = rest
+            # Running the fast path again would repeat the command, the model reconciles it with what already ran
+            return self._measure(session.add_chat(f"{correction} (already done: {describe(actions)})", created_at,
+                                                  channel, fast_path=False), transcript)
+
+        if self._is_duplicate(guild_id, normalize_intent([text]), now):
+            self.duplicates += 1
+            logger.info(f"Dropping duplicate voice command from {transcript.speaker}: {text}")
+            return None
+
+        return self._measure(session.add_chat(text, created_at, channel), transcript)
+
+    def _measure(self, dispatch: asyncio.Future, transcript: Transcript) -> asyncio.Future:
+        self.commands += 1
+        spoken_at = transcript.spoken_at if transcript.spoken_at is not None else transcript.received_at
+
+        def record(_):
+            latency = time.monotonic() - spoken_at
+            self.latencies.append(latency)
+            logger.info(f"Voice command from {transcript.speaker} took {latency:.3f}s: {transcript.text}")
+
+        dispatch.add_done_callback(record)
+        return dispatch
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        A percentile of the recent end to end latencies, from the end of speech to the game's acknowledgement.
+
+        Args:
+            percentile (float): Between 0 and 100.
+
+        Returns:
+            float: The latency in seconds, None before any command completed.
+        """
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
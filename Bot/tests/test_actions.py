@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from outbreak import models
+from outbreak.actions import ActionExecutor, split_segments
+
+
+class FakeBackend:
+    """
+    Records calls and answers them after a short delay to observe concurrency.
+    """
+    def __init__(self):
+        self.calls = list()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def call_object_function(self, object_path, function_name, parameters, timeout=5.0):
+        self.calls.append((function_name, parameters))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return models.WebsocketResponse(RequestId=len(self.calls), ResponseCode=200)
+
+    async def batch_request(self, requests, timeout=5.0):
+        self.calls.append(("batch", requests))
+        return {
+            "RequestId": 1,
+            "ResponseCode": 200,
+            "ResponseBody": {
+                "Responses": [
+                    {"RequestId": request["RequestId"], "ResponseCode": 200, "ResponseBody": None}
+                    for request in requests
+                ]
+            }
+        }
+
+
+class TestActionExecutor(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.plan = [
+            {"Name": "Chat", "Arg1": "Bears incoming"},
+            {"Name": "Spawn", "Arg1": "Bear", "Arg2": "Pond"},
+            {"Name": "Spawn", "Arg1": "Bear", "Arg2": "Van"},
+            {"Name": "Wait", "Arg1": "0"},
+            {"Name": "TeleportPlayer", "Arg1": "Player", "Arg2": "Hill"},
+            {"Name": "Dance", "Arg1": "Bear"},
+        ]
+        self.backend = FakeBackend()
+
+    def test_split_segments_at_wait(self):
+        segments = split_segments(self.plan)
+        self.assertEqual([len(segment) for segment in segments], [3, 1, 2])
+        self.assertEqual(segments[1][0]["Name"], "Wait")
+
+    async def test_segment_is_dispatched_concurrently(self):
+        executor = ActionExecutor(self.backend, "/Game/Caller")
+        results = await executor.execute(self.plan)
+
+        self.assertEqual(self.backend.max_in_flight, 3)
+        self.assertEqual([result.action["Name"] for result in results], [action["Name"] for action in self.plan])
+        self.assertEqual(self.backend.calls[0], ("Chat", {"Arg1": "Bears incoming"}))
+        self.assertTrue(all(result.succeeded for result in results[:3]))
+        self.assertIsNone(results[-1].response)
+
+    async def test_streamed_actions_are_dispatched_on_arrival(self):
+        async def stream():
+            for action in self.plan:
+                yield action
+
+        executor = ActionExecutor(self.backend, "/Game/Caller")
+        results = await executor.execute_stream(stream())
+
+        self.assertEqual(self.backend.max_in_flight, 3)
+        self.assertEqual([result.action["Name"] for result in results], [action["Name"] for action in self.plan])
+        self.assertTrue(results[4].succeeded)
+
+    async def test_segment_is_dispatched_as_batch(self):
+        executor = ActionExecutor(self.backend, "/Game/Caller", use_batch=True)
+        results = await executor.execute(self.plan)
+
+        self.assertEqual([call[0] for call in self.backend.calls], ["batch", "batch"])
+        self.assertEqual(len(self.backend.calls[0][1]), 3)
+        self.assertEqual(self.backend.calls[0][1][1]["Body"]["functionName"], "Spawn")
+        self.assertTrue(results[4].succeeded)
+        self.assertIsNone(results[5].response)
+
+    async def test_failed_call_keeps_the_rest_of_the_plan(self):
+        call_object_function = self.backend.call_object_function
+
+        async def flaky_call(object_path, function_name, parameters, timeout=5.0):
+            if parameters.get("Arg2") == "Pond":
+                raise ConnectionError("Connection to the game was closed.")
+            if parameters.get("Arg2") == "Van":
+                return None
+            return await call_object_function(object_path, function_name, parameters, timeout=timeout)
+
+        self.backend.call_object_function = flaky_call
+        executor = ActionExecutor(self.backend, "/Game/Caller")
+        results = await executor.execute(self.plan)
+
+        self.assertEqual([result.action["Name"] for result in results], [action["Name"] for action in self.plan])
+        self.assertTrue(results[0].succeeded)
+        self.assertEqual(results[1].error, "Spawn failed: Connection to the game was closed.")
+        self.assertEqual(results[2].error, "Spawn got no response from the game.")
+        self.assertTrue(results[4].succeeded)
+
+
+if __name__ == "__main__":
+    unittest.main()
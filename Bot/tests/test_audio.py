@@ -0,0 +1,100 @@
+import io
+import math
+import tracemalloc
+import unittest
+import wave
+from array import array
+from outbreak.audio import (AudioRecorder, BYTES_PER_SECOND, PCMRingBuffer, SAMPLE_RATE, VoiceActivityDetector,
+                            duration_to_bytes, encode_wav, frame_energy)
+
+
+def tone(seconds: float, amplitude: int = 8000) -> bytes:
+    samples = array("h", (int(amplitude * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE))
+                          for i in range(int(seconds * SAMPLE_RATE))))
+    return samples.tobytes()
+
+
+def silence(seconds: float) -> bytes:
+    return bytes(duration_to_bytes(seconds))
+
+
+class TestPCMRingBuffer(unittest.TestCase):
+    def test_keeps_the_most_recent_audio(self):
+        buffer = PCMRingBuffer(8)
+        buffer.write(b"abcdef")
+        self.assertEqual(buffer.read(0), b"abcdef")
+
+        buffer.write(b"ghij")
+        self.assertEqual(len(buffer), 8)
+        self.assertEqual(buffer.oldest, 2)
+        self.assertEqual(buffer.read(0), b"cdefghij")
+        self.assertEqual(buffer.read(4, 8), b"efgh")
+        self.assertEqual(buffer.read_last(3), b"hij")
+
+        buffer.write(b"0123456789AB")
+        self.assertEqual(buffer.position, 22)
+        self.assertEqual(buffer.read(0), b"456789AB")
+
+
+class TestVoiceActivityDetector(unittest.TestCase):
+    def test_encode_wav(self):
+        with wave.open(io.BytesIO(encode_wav(tone(0.5)))) as wav:
+            self.assertEqual((wav.getframerate(), wav.getnchannels(), wav.getnframes()), (SAMPLE_RATE, 1, SAMPLE_RATE // 2))
+
+    def test_energy(self):
+        self.assertEqual(frame_energy(silence(0.02)), 0.0)
+        self.assertGreater(frame_energy(tone(0.02)), 5000)
+
+    def test_utterances_are_cut_at_silence(self):
+        detector = VoiceActivityDetector(speaker="alice")
+        utterances = list()
+        for chunk in (silence(1), tone(0.8), silence(0.3), tone(0.4), silence(0.7), tone(0.05), silence(1)):
+            utterances += detector.feed(chunk)
+
+        self.assertEqual(len(utterances), 1)
+        self.assertEqual(utterances[0].speaker, "alice")
+        # Both words with the pause in between, the pre roll and the silence which ended it
+        self.assertAlmostEqual(utterances[0].duration, 0.2 + 0.8 + 0.3 + 0.4 + 0.5, delta=0.05)
+        self.assertFalse(detector.speaking)
+
+    def test_long_utterances_are_cut(self):
+        detector = VoiceActivityDetector(max_utterance=2)
+        utterances = detector.feed(tone(5))
+        self.assertEqual(len(utterances), 2)
+        self.assertTrue(all(len(utterance.audio) <= duration_to_bytes(2) for utterance in utterances))
+
+        utterance = detector.flush()
+        self.assertIsNotNone(utterance)
+        self.assertIsNone(detector.flush())
+
+    def test_memory_is_constant(self):
+        detector = VoiceActivityDetector(max_utterance=2)
+        chunk = tone(0.5) + silence(0.5)
+        detector.feed(chunk)
+
+        tracemalloc.start()
+        for _ in range(60):
+            detector.feed(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertEqual(detector.buffer.capacity, duration_to_bytes(2.2))
+        self.assertLess(peak, 4 * BYTES_PER_SECOND)
+
+
+class TestAudioRecorder(unittest.TestCase):
+    def test_speakers_are_bounded(self):
+        recorder = AudioRecorder(max_speakers=2)
+        recorder.feed("alice", tone(0.5))
+        recorder.feed("bob", tone(0.5))
+        recorder.feed("alice", silence(0.1))
+        dropped = recorder.feed("carol", tone(0.5))
+
+        # Bob was dropped in the middle of an utterance, it is ended rather than lost
+        self.assertEqual([utterance.speaker for utterance in dropped], ["bob"])
+        self.assertEqual(list(recorder.detectors), ["alice", "carol"])
+        self.assertEqual(sorted(utterance.speaker for utterance in recorder.flush()), ["alice", "carol"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from outbreak.bot import Bot
+
+
+class TestPeriodicTask(unittest.IsolatedAsyncioTestCase):
+    async def test_stopped_session_does_not_end_the_loop(self):
+        loop = asyncio.get_running_loop()
+        stopped, running = loop.create_future(), loop.create_future()
+        stopped.cancel()
+        running.set_result(["Done"])
+        sessions = [
+            SimpleNamespace(session_id="a", tick=MagicMock(return_value=stopped)),
+            SimpleNamespace(session_id="b", tick=MagicMock(return_value=running)),
+            SimpleNamespace(session_id="c", tick=MagicMock(return_value=None)),
+        ]
+
+        await Bot.periodic_task.coro(SimpleNamespace(sessions=sessions))
+        self.assertTrue(all(session.tick.called for session in sessions))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,34 @@
+import asyncio
+import json
 import unittest
-from outbreak.client import add_uepie_prefix
+from unittest.mock import AsyncMock, patch
+from outbreak import models
+from outbreak.client import UE5RemoteControlClient, add_uepie_prefix
+
+
+class FakeWebSocket:
+    """
+    In-memory stand-in for a websocket connection, replies are pushed by the test.
+    """
+    def __init__(self):
+        self.sent = list()
+        self.incoming = asyncio.Queue()
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+    async def close(self):
+        await self.incoming.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        return json.dumps(message)
+
 
 class TestAddUEPIEPrefix(unittest.TestCase):
     def test_add_uepie_prefix(self):
@@ -18,5 +47,149 @@ class TestAddUEPIEPrefix(unittest.TestCase):
         # Assert the result matches the expected output
         self.assertEqual(result, expected_path)
 
+
+class TestRequestCorrelation(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = UE5RemoteControlClient(hostname="localhost", port=30020, reconnect=False)
+        self.websocket = FakeWebSocket()
+        with patch("outbreak.client.websockets.connect", AsyncMock(return_value=self.websocket)):
+            await self.client.connect()
+
+    async def asyncTearDown(self):
+        await self.client.disconnect()
+
+    async def test_concurrent_requests_resolve_out_of_order(self):
+        first = asyncio.create_task(self.client.call_object_function("/Game/Caller", "Chat", {"Arg1": "hi"}))
+        second = asyncio.create_task(self.client.read_object_property("/Game/Bear", "RelativeLocation"))
+        while len(self.websocket.sent) < 2:
+            await asyncio.sleep(0)
+
+        first_id = self.websocket.sent[0]["Parameters"]["RequestId"]
+        second_id = self.websocket.sent[1]["Parameters"]["RequestId"]
+        self.assertLessEqual(first_id, 0x7FFFFFFF)
+
+        # A preset push and the second reply arrive before the first reply
+        await self.websocket.incoming.put({
+            "Type": "PresetEntitiesModified",
+            "PresetName": "SurvivalManagerPreset",
+            "PresetId": "1",
+            "ModifiedEntities": {}
+        })
+        await self.websocket.incoming.put({"RequestId": second_id, "ResponseCode": 200, "ResponseBody": {"X": 1}})
+        await self.websocket.incoming.put({"RequestId": first_id, "ResponseCode": 200, "ResponseBody": None})
+
+        self.assertEqual(await second, {"RequestId": second_id, "ResponseCode": 200, "ResponseBody": {"X": 1}})
+        self.assertEqual(await first, models.WebsocketResponse(RequestId=first_id, ResponseCode=200))
+
+    async def test_preset_push_is_sent_to_subscribers(self):
+        received = asyncio.Queue()
+
+        async def on_preset(message):
+            await received.put(message)
+
+        await self.client.register_preset("SurvivalManagerPreset", on_preset)
+        self.assertEqual(self.websocket.sent[0]["MessageName"], "preset.register")
+
+        await self.websocket.incoming.put({
+            "Type": "PresetEntitiesModified",
+            "PresetName": "SurvivalManagerPreset",
+            "PresetId": "1",
+            "ModifiedEntities": {}
+        })
+        message = await asyncio.wait_for(received.get(), timeout=1.0)
+        self.assertIsInstance(message, models.RootObject)
+        self.assertEqual(message.PresetName, "SurvivalManagerPreset")
+
+    async def test_pending_request_fails_when_connection_closes(self):
+        request = asyncio.create_task(self.client.get_object_thumbnail("/Game/Bear"))
+        while not self.websocket.sent:
+            await asyncio.sleep(0)
+
+        await self.websocket.incoming.put(None)
+        self.assertIsNone(await asyncio.wait_for(request, timeout=1.0))
+
+    async def test_function_call_without_response(self):
+        self.assertIsNone(await self.client.call_object_function("/Game/Caller", "GameState", {}, timeout=0.01))
+
+
+class TestReconnect(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sockets = list()
+        self.refuse = 0
+        self.connect_patch = patch("outbreak.client.websockets.connect", side_effect=self.open_socket)
+        self.connect_patch.start()
+        self.client = UE5RemoteControlClient(hostname="localhost", port=30020, min_backoff=0.01, max_backoff=0.05)
+
+    async def asyncTearDown(self):
+        await self.client.disconnect()
+        self.connect_patch.stop()
+
+    async def open_socket(self, uri):
+        if self.refuse:
+            self.refuse -= 1
+            raise ConnectionRefusedError("Server is restarting")
+        self.sockets.append(FakeWebSocket())
+        return self.sockets[-1]
+
+    async def wait_for_socket(self, count):
+        while len(self.sockets) < count or not self.client.connected:
+            await asyncio.sleep(0.01)
+
+    async def test_reconnects_and_registers_presets_again(self):
+        async def on_preset(message):
+            pass
+
+        await self.client.connect()
+        await self.client.register_preset("SurvivalManagerPreset", on_preset)
+
+        # The game server recycles and refuses the first attempts
+        self.refuse = 2
+        await self.sockets[0].incoming.put(None)
+        await asyncio.wait_for(self.wait_for_socket(2), timeout=2.0)
+
+        self.assertEqual(self.sockets[1].sent[0]["MessageName"], "preset.register")
+        self.assertEqual(self.sockets[1].sent[0]["Parameters"]["PresetName"], "SurvivalManagerPreset")
+        health = self.client.health
+        self.assertTrue(health.connected)
+        self.assertEqual(health.reconnects, 1)
+        self.assertEqual(health.failed_attempts, 0)
+
+    async def test_request_waits_for_reconnect(self):
+        await self.client.connect()
+        self.refuse = 1
+        await self.sockets[0].incoming.put(None)
+        while self.client.connected:
+            await asyncio.sleep(0)
+
+        request = asyncio.create_task(self.client.read_object_property("/Game/Bear", "RelativeLocation", timeout=2.0))
+        await asyncio.wait_for(self.wait_for_socket(2), timeout=2.0)
+        while not self.sockets[1].sent:
+            await asyncio.sleep(0.01)
+
+        request_id = self.sockets[1].sent[0]["Parameters"]["RequestId"]
+        await self.sockets[1].incoming.put({"RequestId": request_id, "ResponseCode": 200, "ResponseBody": {"X": 1}})
+        self.assertEqual((await request)["ResponseBody"], {"X": 1})
+
+    async def test_fail_fast_while_reconnecting(self):
+        self.client.queue_while_reconnecting = False
+        await self.client.connect()
+        self.refuse = 1000
+        await self.sockets[0].incoming.put(None)
+        while self.client.connected:
+            await asyncio.sleep(0)
+
+        self.assertTrue(self.client.reconnecting)
+        self.assertIsNone(await self.client.read_object_property("/Game/Bear", "RelativeLocation"))
+
+    async def test_initial_connect_failure_keeps_retrying(self):
+        self.refuse = 1
+        with self.assertRaises(ConnectionRefusedError):
+            await self.client.connect()
+        self.assertEqual(self.client.health.last_error, "Server is restarting")
+
+        await asyncio.wait_for(self.wait_for_socket(1), timeout=2.0)
+        self.assertEqual(self.client.health.reconnects, 1)
+
+
 if __name__ == "__main__":
     unittest.main()
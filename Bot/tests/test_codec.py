@@ -0,0 +1,43 @@
+import json
+import unittest
+from unittest.mock import patch
+from dataclasses_json.api import DataClassJsonMixin
+from outbreak import codec, models
+from tests.test_models import ROOT_OBJECT_JSON
+
+
+class TestCodec(unittest.TestCase):
+    def test_decode_matches_dataclasses_json(self):
+        compiled = models.RootObject.from_dict(ROOT_OBJECT_JSON)
+        reflected = DataClassJsonMixin.from_dict.__func__(models.RootObject, ROOT_OBJECT_JSON)
+        self.assertEqual(compiled, reflected)
+
+        game_state = {"PlayerLocation": "Van", "PlayerAmmo": "3", "PlayerGrenades": 1, "PlayerHealth": 50}
+        self.assertEqual(
+            models.GameState.from_dict(game_state),
+            DataClassJsonMixin.from_dict.__func__(models.GameState, game_state))
+
+    def test_encode_matches_dataclasses_json(self):
+        request = models.WebsocketHttpRequest(
+            MessageName="http",
+            Parameters=models.Parameters(RequestId=1, Url="/remote/object/call", Verb="PUT", Body={"Arg1": "Bear"}))
+
+        self.assertEqual(json.loads(request.to_json()), json.loads(DataClassJsonMixin.to_json(request)))
+        self.assertEqual(models.WebsocketHttpRequest.from_json(request.to_json()), request)
+
+    def test_missing_required_field(self):
+        with self.assertRaises(KeyError):
+            models.WebsocketResponse.from_dict({"RequestId": 1})
+
+    def test_excluded_fields_are_skipped(self):
+        encode = codec.encoder_for(models.MessageContent)
+        self.assertEqual(encode(models.MessageContent(type="text", text="hi")), {"type": "text", "text": "hi"})
+
+    def test_stdlib_fallback(self):
+        with patch.object(codec, "orjson", None):
+            self.assertEqual(codec.loads(codec.dumps({"RequestId": 1})), {"RequestId": 1})
+            self.assertEqual(models.WebsocketResponse.from_json('{"RequestId": 1, "ResponseCode": 200}').ResponseCode, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
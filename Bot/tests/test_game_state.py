@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+from outbreak import models
+from outbreak.game_state import GameStateCache
+
+
+class TestGameStateCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fetches = 0
+        self.game = asyncio.Event()
+        self.game.set()
+
+        async def fetch():
+            self.fetches += 1
+            await self.game.wait()
+            return models.GameState(
+                PlayerLocation="Meadow",
+                PlayerAmmo=30,
+                PlayerGrenades=2,
+                PlayerHealth=100.0,
+                BearLocations={"/Game/Bear_1": "Pond"},
+                LocationNames=["Pond", "Meadow"])
+
+        self.cache = GameStateCache(fetch, max_age=60.0, refresh_interval=0.05)
+
+    def fields_changed(self, *changed_fields):
+        return models.PresetFieldsChanged(
+            Type="PresetFieldsChanged",
+            PresetName="SurvivalManagerPreset",
+            PresetId="1",
+            ChangedFields=list(changed_fields))
+
+    def entities_modified(self, label, *owner_paths):
+        entity = models.ModifiedRCProperty(
+            DisplayName=label,
+            ID="1",
+            UnderlyingProperty=models.UnderlyingProperty(
+                Name=label, Description="", Type="float", ContainerType="", KeyType="", Metadata=models.Metadata()),
+            Metadata=models.Metadata(),
+            OwnerObjects=[models.OwnerObject(Name=path, Class="Bear_C", Path=path) for path in owner_paths])
+        return models.RootObject(
+            Type="PresetEntitiesModified",
+            PresetName="SurvivalManagerPreset",
+            PresetId="1",
+            ModifiedEntities=models.ModifiedEntities(ModifiedRCProperties=[entity]))
+
+    async def test_pushed_values_are_applied_without_fetching(self):
+        await self.cache.get()
+        await self.cache.on_preset_message(self.fields_changed(
+            models.ChangedField(PropertyLabel="PlayerHealth", PropertyValue=42.5),
+            models.ChangedField(PropertyLabel="BearLocations", ObjectPath="/Game/Bear_2", PropertyValue="Van"),
+            models.ChangedField(PropertyLabel="SomethingElse", PropertyValue=1)))
+
+        state = await self.cache.get()
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(state.PlayerHealth, 42.5)
+        self.assertEqual(state.BearLocations, {"/Game/Bear_1": "Pond", "/Game/Bear_2": "Van"})
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.applied_deltas), (1, 1, 2))
+
+    async def test_unusable_push_refreshes_in_the_background(self):
+        await self.cache.get()
+        await self.cache.on_preset_message(self.entities_modified("PlayerAmmo"))
+        self.assertTrue(self.cache.stale)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.fetches, 2)
+        self.assertFalse(self.cache.stale)
+
+    async def test_entities_the_state_already_has_are_ignored(self):
+        await self.cache.get()
+        await self.cache.on_preset_message(self.entities_modified("BearLocations", "/Game/Bear_1"))
+        await self.cache.on_preset_message(self.entities_modified("SomethingElse"))
+        self.assertFalse(self.cache.stale)
+
+        await self.cache.on_preset_message(self.entities_modified("BearLocations", "/Game/Bear_1", "/Game/Bear_2"))
+        self.assertTrue(self.cache.stale)
+
+    async def test_push_storm_refreshes_once_without_blocking(self):
+        state = await self.cache.get()
+        self.game.clear()
+        storm = self.entities_modified("PlayerHealth")
+        for _ in range(200):
+            await self.cache.on_preset_message(storm)
+        await asyncio.sleep(0.1)
+        for _ in range(200):
+            await self.cache.on_preset_message(storm)
+
+        # The refresh hangs in the game, generations keep the last state meanwhile
+        self.assertTrue(self.cache.refreshing)
+        self.assertIs(await asyncio.wait_for(self.cache.get(), timeout=0.01), state)
+        self.assertEqual(self.fetches, 2)
+
+        # Pushes during the refresh are synced by a single follow-up refresh
+        self.game.set()
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.fetches, 3)
+        self.assertFalse(self.cache.stale)
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        states = await asyncio.gather(*[self.cache.get() for _ in range(5)])
+        self.assertEqual(self.fetches, 1)
+        self.assertTrue(all(state is states[0] for state in states))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import datetime
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from outbreak.intents import IntentMatcher
+from outbreak.sessions import GameSession, SessionConfig
+
+
+class TestIntentMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = IntentMatcher()
+
+    def test_spawn(self):
+        actions = self.matcher.match("spawn a bear at the pond")
+        self.assertEqual(len(actions), 1)
+        self.assertEqual((actions[0]["Name"], actions[0]["Arg1"], actions[0]["Arg2"]), ("Spawn", "Bear", "Pond"))
+
+        actions = self.matcher.match("Drop 3 GAS CANS at the meadow!!")
+        self.assertEqual([action["Arg1"] for action in actions], ["GasCan"] * 3)
+        self.assertEqual(actions[0]["Arg2"], "Meadow")
+
+        self.assertEqual(len(self.matcher.match("spawn 100 bears at the river")), 5)
+        self.assertEqual(len(self.matcher.match("pls spawn two of the bears at the hill")), 2)
+
+    def test_teleport(self):
+        for message in ("teleport me to the van", "tp van", "send me to the van pls"):
+            actions = self.matcher.match(message)
+            self.assertEqual(actions, [{"Name": "TeleportPlayer", "Arg1": "Player", "Arg2": "Van", "Reason": "Direct chat command"}])
+
+    def test_ambiguous_requests_go_to_the_model(self):
+        for message in (
+                "more bears",
+                "spawn a bear at the pond or the hill",
+                "spawn bears and toilets at the pond",
+                "don't spawn bears at the pond",
+                "don\u2019t spawn bears at the pond",
+                "spawn a bear at the pond, i don\u2019t mind",
+                "spawn a bear at the pond in 3 seconds",
+                "wait 5 then spawn a bear at the pond",
+                "spawn a bear at the pond and 2 toilets",
+                "why did you spawn a bear at the pond",
+                "can you spawn a bear at the pond",
+                "spawn a bear at the pond?",
+                "I hate bears, send them to the river",
+                "the pond is nice",
+                "teleport the bear to the van",
+                "send the bear to the van",
+                "send the bears back to the river",
+                "spawn 0 bears at the pond",
+                ""):
+            self.assertIsNone(self.matcher.match(message), message)
+
+    def test_locations_from_the_game(self):
+        self.assertIsNone(self.matcher.match("spawn a bear at the cabin"))
+        self.matcher.add_locations(["Cabin"])
+        self.assertEqual(self.matcher.match("spawn a bear at the cabin")[0]["Arg2"], "Cabin")
+
+
+class TestFastPathDispatch(unittest.IsolatedAsyncioTestCase):
+    async def test_command_skips_the_scheduler(self):
+        session = GameSession(SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1), MagicMock())
+        session.action_executor.execute = AsyncMock(return_value=list())
+
+        task = session.add_chat_message(MagicMock(clean_content="spawn a bear at the pond", created_at=datetime.datetime.now()))
+        self.assertEqual(await task, list())
+
+        session.action_executor.execute.assert_awaited_once()
+        self.assertTrue(session.scheduler.idle)
+        self.assertEqual(session.fast_path_commands, 1)
+        self.assertEqual(len(session.prompt_generator.chat_messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
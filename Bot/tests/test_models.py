@@ -1,5 +1,11 @@
+import copy
+import dataclasses
+import gc
+import tracemalloc
+import typing
 import unittest
-from outbreak.models import RootObject  # Assuming the classes are in a file named `model.py`
+from dataclasses_json import dataclass_json
+from outbreak.models import ChatMessage, GameContext, RootObject, WebsocketResponse  # Assuming the classes are in a file named `model.py`
 
 class TestRootObjectModel(unittest.TestCase):
     def setUp(self):
@@ -69,5 +75,130 @@ class TestRootObjectModel(unittest.TestCase):
         self.assertEqual(owner_objects[0].Path, "/Game/LBG/Maps/L_LBG_Medow.L_LBG_Medow:PersistentLevel.BorisPlayerCharacter_C_1.CollisionCylinder")
 
 
+# Preset push shared by the codec, schema and compact model tests
+ROOT_OBJECT_JSON = {
+    "Type": "PresetEntitiesModified",
+    "PresetName": "SurvivalManagerPreset",
+    "PresetId": "13DC973046AF516A3FE19D8EF0EDFFFB",
+    "ModifiedEntities": {
+        "ModifiedRCProperties": [
+            {
+                "DisplayName": "Angry Bear Enemy Location",
+                "ID": "24CD500A47334C0BF79CE7B882137FAE",
+                "UnderlyingProperty": {
+                    "Name": "RelativeLocation",
+                    "DisplayName": "Relative Location",
+                    "Description": "Location of the component relative to its parent",
+                    "Type": "FVector",
+                    "TypePath": "None",
+                    "ContainerType": "",
+                    "KeyType": "",
+                    "Metadata": {
+                        "ToolTip": "Location of the component relative to its parent"
+                    }
+                },
+                "Metadata": {
+                    "Min": "",
+                    "Max": ""
+                },
+                "OwnerObjects": [
+                    {
+                        "Name": "CollisionCylinder",
+                        "Class": "CapsuleComponent",
+                        "Path": "/Game/LBG/Maps/L_LBG_Medow.L_LBG_Medow:PersistentLevel.BorisPlayerCharacter_C_1.CollisionCylinder"
+                    }
+                ]
+            }
+        ],
+        "ModifiedRCFunctions": [],
+        "ModifiedRCActors": []
+    }
+}
+
+
+def unslotted(model, copies):
+    """
+    A dataclasses_json copy of a model and the models it nests, without slots or the compiled codec.
+    """
+    if model not in copies:
+        hints = typing.get_type_hints(model)
+        fields = [(model_field.name, unslotted_hint(hints[model_field.name], copies),
+                   dataclasses.field(default=model_field.default, default_factory=model_field.default_factory))
+                  for model_field in dataclasses.fields(model)]
+        copies[model] = dataclass_json(dataclasses.make_dataclass(model.__name__, fields, frozen=True))
+    return copies[model]
+
+
+def unslotted_hint(hint, copies):
+    if dataclasses.is_dataclass(hint):
+        return unslotted(hint, copies)
+    arguments = typing.get_args(hint)
+    if arguments:
+        return hint.copy_with(tuple(unslotted_hint(argument, copies) for argument in arguments))
+    return hint
+
+
+def decoding_memory(model, data):
+    """
+    Bytes held by the decoded object and peak bytes allocated while decoding it.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        decoded = model.from_dict(data)
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del decoded
+    return held, peak
+
+
+class TestCompactModels(unittest.TestCase):
+    def assertSlotted(self, instance):
+        self.assertFalse(hasattr(instance, "__dict__"), type(instance).__name__)
+        self.assertTrue(hasattr(type(instance), "__slots__"), type(instance).__name__)
+
+    def test_hot_path_models_have_no_instance_dict(self):
+        root_object = RootObject.from_dict(ROOT_OBJECT_JSON)
+        modified_property = root_object.ModifiedEntities.ModifiedRCProperties[0]
+        instances = [
+            root_object,
+            root_object.ModifiedEntities,
+            modified_property,
+            modified_property.UnderlyingProperty,
+            modified_property.Metadata,
+            modified_property.OwnerObjects[0],
+            GameContext(context={"PlayerHealth": 100.0}),
+            WebsocketResponse(RequestId=1, ResponseCode=200),
+        ]
+        for instance in instances:
+            self.assertSlotted(instance)
+
+    def test_preset_entities_modified_storm(self):
+        entities = 500
+        storm = copy.deepcopy(ROOT_OBJECT_JSON)
+        modified_property = storm["ModifiedEntities"]["ModifiedRCProperties"][0]
+        storm["ModifiedEntities"]["ModifiedRCProperties"] = [copy.deepcopy(modified_property) for _ in range(entities)]
+
+        root_object = RootObject.from_dict(storm)
+        self.assertEqual(len(root_object.ModifiedEntities.ModifiedRCProperties), entities)
+        for modified_property in root_object.ModifiedEntities.ModifiedRCProperties:
+            self.assertSlotted(modified_property)
+            self.assertSlotted(modified_property.UnderlyingProperty)
+            self.assertSlotted(modified_property.UnderlyingProperty.Metadata)
+            self.assertSlotted(modified_property.OwnerObjects[0])
+
+        # Relative to the same tree decoded into plain dataclasses_json models, whatever the interpreter
+        held, peak = decoding_memory(RootObject, storm)
+        plain_held, plain_peak = decoding_memory(unslotted(RootObject, dict()), storm)
+        self.assertLess(held / entities, 0.6 * plain_held / entities)
+        self.assertLess(peak, 0.6 * plain_peak)
+
+    def test_chat_message_round_trip(self):
+        chat_message = ChatMessage.from_json('{"timestamp": 1704067200.0, "message": "more bears"}')
+        self.assertEqual(chat_message.message, "more bears")
+        self.assertEqual(ChatMessage.from_json(chat_message.to_json()), chat_message)
+
+
 if __name__ == "__main__":
     unittest.main()
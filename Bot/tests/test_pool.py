@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from outbreak.pool import UE5RemoteControlPool
+from tests.test_client import FakeWebSocket
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.sockets = list()
+        self.connect_patch = patch("outbreak.client.websockets.connect", side_effect=self.open_socket)
+        self.connect_patch.start()
+        self.pool = UE5RemoteControlPool(hostname="localhost", port=30020, size=3, reconnect=False)
+        await self.pool.connect()
+
+    async def asyncTearDown(self):
+        await self.pool.disconnect()
+        self.connect_patch.stop()
+
+    async def open_socket(self, uri):
+        self.sockets.append(FakeWebSocket())
+        return self.sockets[-1]
+
+    async def test_presets_use_a_dedicated_socket(self):
+        async def on_preset(message):
+            pass
+
+        self.assertEqual(len(self.sockets), 4)
+        await self.pool.register_preset("SurvivalManagerPreset", on_preset)
+
+        preset_socket = self.pool.preset_client.websocket
+        self.assertEqual(preset_socket.sent[0]["MessageName"], "preset.register")
+        for client in self.pool.clients:
+            self.assertFalse(client.websocket.sent)
+
+    async def test_requests_go_to_least_loaded_socket(self):
+        thumbnail = asyncio.create_task(self.pool.get_object_thumbnail("/Game/Bear"))
+        await asyncio.sleep(0)
+        chat = asyncio.create_task(self.pool.call_object_function("/Game/Caller", "Chat", {"Arg1": "hi"}))
+        await asyncio.sleep(0)
+
+        thumbnail_socket = self.pool.clients[0].websocket
+        chat_socket = self.pool.clients[1].websocket
+        self.assertEqual(len(thumbnail_socket.sent), 1)
+        self.assertEqual(len(chat_socket.sent), 1)
+
+        # The small call isn't stuck behind the thumbnail on the other socket
+        request_id = chat_socket.sent[0]["Parameters"]["RequestId"]
+        await chat_socket.incoming.put({"RequestId": request_id, "ResponseCode": 200})
+        self.assertEqual((await chat).ResponseCode, 200)
+        self.assertFalse(thumbnail.done())
+        self.assertEqual(self.pool.in_flight, 1)
+
+        request_id = thumbnail_socket.sent[0]["Parameters"]["RequestId"]
+        await thumbnail_socket.incoming.put({"RequestId": request_id, "ResponseCode": 200, "ResponseBody": {}})
+        await thumbnail
+
+    async def test_health(self):
+        self.assertTrue(self.pool.connected)
+        await self.pool.clients[0].websocket.incoming.put(None)
+        while self.pool.clients[0].connected:
+            await asyncio.sleep(0)
+
+        self.assertTrue(self.pool.health.connected)
+        self.assertIs(self.pool.least_loaded(), self.pool.clients[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
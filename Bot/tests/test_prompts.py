@@ -0,0 +1,61 @@
+import datetime
+import json
+import unittest
+from outbreak.models import GameContext, Message
+from outbreak.prompts import RAGPromptGenerator, STATIC_PROMPT
+
+
+class TestRAGPromptGenerator(unittest.TestCase):
+    def setUp(self):
+        self.generator = RAGPromptGenerator()
+        self.generator.add_context(GameContext(context={"PlayerHealth": 50.0}))
+        self.generator.add_chat_message("more bears", datetime.datetime(2024, 11, 1))
+
+    def test_static_prefix_is_shared(self):
+        static_prompt, dynamic_prompt = self.generator.generate_prompt_sections()
+        other_static_prompt, other_dynamic_prompt = RAGPromptGenerator().generate_prompt_sections()
+
+        self.assertIs(static_prompt, STATIC_PROMPT)
+        self.assertIs(static_prompt, other_static_prompt)
+        self.assertNotEqual(dynamic_prompt, other_dynamic_prompt)
+        self.assertIn('"PlayerHealth"', dynamic_prompt)
+        self.assertNotIn("PlayerHealth", static_prompt)
+
+    def test_static_prefix_is_a_cache_checkpoint(self):
+        message = json.loads(Message(role="user", content=self.generator.generate_message_content()).to_json())
+
+        self.assertEqual(message["content"][0]["cache_control"], {"type": "ephemeral"})
+        self.assertNotIn("cache_control", message["content"][1])
+        self.assertIn("more bears", message["content"][1]["text"])
+        self.assertTrue(self.generator.generate_prompt().startswith(STATIC_PROMPT))
+
+    def test_history_is_bounded(self):
+        generator = RAGPromptGenerator(max_chat_messages=3, max_previous_messages=5)
+        for index in range(50):
+            generator.add_chat_message(f"chat {index}", datetime.datetime(2024, 11, 1))
+            generator.add_previous_message(f"reply {index}")
+
+        self.assertEqual([chat.message for chat in generator.chat_messages], ["chat 47", "chat 48", "chat 49"])
+        self.assertEqual(len(generator.previous_messages), 5)
+
+    def test_prompt_size_stays_within_budget(self):
+        generator = RAGPromptGenerator(max_previous_messages=1000, section_budgets={"context": 100, "previous_messages": 50})
+        generator.add_context(GameContext(context={"PlayerHealth": 50.0}))
+        for index in range(200):
+            generator.add_context(GameContext(context={"Bear": {"NameOrPath": f"/Game/Bear_{index}", "Location": "Pond"}}))
+            generator.add_previous_message(f"Run, bear number {index} is coming")
+
+        _, dynamic_prompt = generator.generate_prompt_sections()
+        report = generator.budget_report
+
+        self.assertLessEqual(report["context"].tokens, 100 + 20)
+        self.assertLessEqual(report["previous_messages"].tokens, 50 + 20)
+        self.assertEqual(report["context"].kept + report["context"].dropped, 201)
+        self.assertIn('"PlayerHealth"', dynamic_prompt)
+        self.assertIn("bear number 199", dynamic_prompt)
+        self.assertNotIn("bear number 0 ", dynamic_prompt)
+        self.assertIn("older entries", dynamic_prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
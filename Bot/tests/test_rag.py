@@ -0,0 +1,92 @@
+import asyncio
+import io
+import json
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from outbreak.models import RAGRequestPayload, Message, MessageContent
+from outbreak.rag import BedrockRAGClient
+
+
+def make_payload(text: str = "Spawn bears") -> RAGRequestPayload:
+    return RAGRequestPayload(
+        anthropic_version="bedrock-2023-05-31",
+        max_tokens=2048,
+        top_k=250,
+        temperature=0.5,
+        top_p=0.7,
+        messages=[Message(role="user", content=[MessageContent(type="text", text=text)])]
+    )
+
+
+def make_response_body(text: str) -> dict:
+    return {
+        "id": "msg_1",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 5}
+    }
+
+
+class TestBedrockRAGClientAsync(unittest.IsolatedAsyncioTestCase):
+    @patch('boto3.client')
+    async def test_requests_run_off_the_event_loop(self, mock_boto_client):
+        loop_thread = threading.get_ident()
+        request_threads = list()
+
+        def invoke_model(modelId, body):
+            request_threads.append(threading.get_ident())
+            return {"body": io.BytesIO(json.dumps(make_response_body('{"Actions": []}')).encode())}
+
+        mock_boto_client.return_value = MagicMock(invoke_model=invoke_model)
+        rag = BedrockRAGClient(region_name="us-east-1", max_concurrency=2)
+
+        responses = await asyncio.gather(*[rag.make_rag_request_async("model", make_payload()) for _ in range(4)])
+        rag.close()
+
+        self.assertEqual([response.content[0].text for response in responses], ['{"Actions": []}'] * 4)
+        self.assertNotIn(loop_thread, request_threads)
+
+    @patch('boto3.client')
+    async def test_request_timeout(self, mock_boto_client):
+        release = threading.Event()
+
+        def invoke_model(modelId, body):
+            release.wait(timeout=5)
+            return {"body": io.BytesIO(json.dumps(make_response_body("{}")).encode())}
+
+        mock_boto_client.return_value = MagicMock(invoke_model=invoke_model)
+        rag = BedrockRAGClient(region_name="us-east-1")
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await rag.make_rag_request_async("model", make_payload(), timeout=0.05)
+        release.set()
+        rag.close()
+
+    @patch('boto3.client')
+    async def test_streamed_text_deltas(self, mock_boto_client):
+        events = [
+            {"type": "message_start"},
+            {"type": "content_block_delta", "delta": {"type": "text_delta", "text": '{"Actions": '}},
+            {"type": "content_block_delta", "delta": {"type": "text_delta", "text": '[]}'}},
+            {"type": "message_delta", "delta": {"stop_reason": "end_turn"}},
+        ]
+        mock_client = MagicMock()
+        mock_client.invoke_model_with_response_stream.return_value = {
+            "body": [{"chunk": {"bytes": json.dumps(event).encode()}} for event in events]
+        }
+        mock_boto_client.return_value = mock_client
+        rag = BedrockRAGClient(region_name="us-east-1")
+
+        chunks = [text async for text in rag.stream_rag_request_async("model", make_payload())]
+        rag.close()
+
+        self.assertEqual(chunks, ['{"Actions": ', '[]}'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import unittest
+from unittest.mock import AsyncMock
+from outbreak import models
+from outbreak.actions import ActionExecutor
+from outbreak.prompts import STATIC_PROMPT
+from outbreak.registry import COST_HEAVY, DEFAULT_REGISTRY, ActionArgument, ActionRegistry, ActionSpec
+from tests.test_actions import FakeBackend
+
+
+class TestActionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = DEFAULT_REGISTRY.copy()
+
+    def test_prompt_section_is_in_the_static_prompt(self):
+        self.assertIn(self.registry.prompt_section(), STATIC_PROMPT)
+        for line in self.registry.prompt_section().splitlines():
+            self.assertIn(json.loads(line)["Name"], self.registry)
+
+    def test_validate(self):
+        self.assertIsNone(self.registry.validate({"Name": "Spawn", "Arg1": "Bear", "Arg2": "Pond", "Reason": "Fun"}))
+        self.assertIsNone(self.registry.validate({"Name": "Wait", "Arg1": 2.5}))
+        self.assertEqual(self.registry.validate({"Name": "Spawn"}), "Spawn is missing Arg1, Arg2.")
+        self.assertEqual(self.registry.validate({"Name": "Chat", "Arg1": "Hi", "Arg3": "?"}), "Chat has no argument Arg3.")
+        self.assertEqual(self.registry.validate({"Name": "Chat", "Arg1": 3}), "Chat Arg1 must be a string.")
+        self.assertEqual(self.registry.validate({"Name": "Wait", "Arg1": True}), "Wait Arg1 must be a number or string.")
+        self.assertEqual(self.registry.validate({"Name": "Dance"}), "Dance is not an available action.")
+
+    def test_register(self):
+        spec = ActionSpec(name="Explode", arguments=(ActionArgument("Arg1", "Object ID"),), function="ExplodeObject")
+        self.registry.register(spec)
+
+        self.assertIs(self.registry.get("Explode"), spec)
+        self.assertNotIn("Explode", DEFAULT_REGISTRY)
+        with self.assertRaises(ValueError):
+            self.registry.register(spec)
+        self.registry.register(spec, replace=True)
+        self.assertEqual(len(self.registry), len(DEFAULT_REGISTRY) + 1)
+
+    def test_register_preset(self):
+        preset = models.PresetResponseBody.from_dict({
+            "Preset": {
+                "Name": "Outbreak",
+                "Path": "/Game/Outbreak",
+                "Groups": [{
+                    "Name": "Actions",
+                    "ExposedFunctions": [
+                        {"DisplayName": "Spawn", "UnderlyingFunction": {"Name": "Spawn", "Description": ""}},
+                        {"DisplayName": "Explode", "UnderlyingFunction": {
+                            "Name": "ExplodeObject",
+                            "Description": "Blow up an object",
+                            "Arguments": [{"Name": "Target", "Description": "Object ID", "Type": "FString",
+                                           "ContainerType": "", "KeyType": ""}]
+                        }}
+                    ]
+                }]
+            }
+        })
+
+        registered = self.registry.register_preset(preset)
+        self.assertEqual([spec.name for spec in registered], ["Explode"])
+        self.assertEqual((self.registry.get("Explode").preset, self.registry.get("Explode").function), ("Outbreak", "Explode"))
+        self.assertEqual(self.registry.get("Spawn"), DEFAULT_REGISTRY.get("Spawn"))
+        self.assertEqual(self.registry.register_preset(preset), [])
+
+
+class TestRegistryDispatch(unittest.IsolatedAsyncioTestCase):
+    async def test_dispatches_the_declared_function(self):
+        registry = ActionRegistry([ActionSpec(name="Explode", arguments=(ActionArgument("Arg1", "Object ID"),),
+                                              function="ExplodeObject")])
+        backend = FakeBackend()
+        executor = ActionExecutor(backend, "/Game/Caller", registry=registry)
+
+        results = await executor.execute([{"Name": "Explode", "Arg1": "BP_Bear_C_1", "Reason": "Boom"},
+                                          {"Name": "Explode"}])
+        self.assertEqual(backend.calls, [("ExplodeObject", {"Arg1": "BP_Bear_C_1"})])
+        self.assertFalse(results[1].succeeded)
+
+    async def test_preset_actions_are_called_through_the_preset(self):
+        registry = ActionRegistry([ActionSpec(name="Explode", arguments=(ActionArgument("Target", "Object ID"),),
+                                              function="Explode", preset="Outbreak")])
+        backend = FakeBackend()
+        backend.call_object_function = AsyncMock(return_value=None)
+        backend.call_preset_function = AsyncMock(return_value=models.WebsocketResponse(RequestId=1, ResponseCode=200))
+        action = {"Name": "Explode", "Target": "BP_Bear_C_1"}
+
+        results = await ActionExecutor(backend, "/Game/Caller", registry=registry).execute([action])
+        self.assertTrue(results[0].succeeded)
+        backend.call_preset_function.assert_awaited_once_with("Outbreak", "Explode", {"Target": "BP_Bear_C_1"}, timeout=5.0)
+        backend.call_object_function.assert_not_awaited()
+
+        await ActionExecutor(backend, "/Game/Caller", registry=registry, use_batch=True).execute([action])
+        self.assertEqual(backend.calls[-1][1][0]["URL"], "/remote/preset/Outbreak/function/Explode")
+        self.assertEqual(backend.calls[-1][1][0]["Body"], {"Parameters": {"Target": "BP_Bear_C_1"}, "GenerateTransaction": False})
+
+    async def test_heavy_actions_are_limited(self):
+        backend = FakeBackend()
+        executor = ActionExecutor(backend, "/Game/Caller", max_heavy_in_flight=2)
+        self.assertEqual(DEFAULT_REGISTRY.get("Spawn").cost, COST_HEAVY)
+
+        await executor.execute([{"Name": "Spawn", "Arg1": "Bear", "Arg2": "Pond"}] * 6
+                               + [{"Name": "Chat", "Arg1": "Run"}])
+        self.assertEqual(len(backend.calls), 7)
+        self.assertEqual(backend.max_in_flight, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import datetime
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from outbreak.models import GameState, RAGResponse
+from outbreak.registry import DEFAULT_REGISTRY
+from outbreak.response_cache import ResponseCache, normalize_intent
+from outbreak.sessions import GameSession, SessionConfig
+
+PLAN = {
+    "Header": {"Notes": "Sending bears"},
+    "Actions": [
+        {"Name": "Spawn", "Arg1": "Bear", "Arg2": "Forest"},
+        {"Name": "Wait", "Arg1": 1},
+        {"Name": "Spawn", "Arg1": "Bear", "Arg2": "Pond"}
+    ]
+}
+
+
+def game_state(health=80.0, bears=3, location="Forest"):
+    return GameState(
+        PlayerLocation=location,
+        PlayerAmmo=10,
+        PlayerGrenades=1,
+        PlayerHealth=health,
+        BearLocations={f"/Game/Bear_C_{index}": "Forest" for index in range(bears)})
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_normalize_intent(self):
+        self.assertEqual(normalize_intent(["more bears"]), normalize_intent(["MORE BEARS pls!!"]))
+        self.assertEqual(normalize_intent(["Bears, more please"]), "bear more")
+        self.assertEqual(normalize_intent(["pls"]), "")
+
+    def test_fingerprint_buckets_game_state(self):
+        cache = ResponseCache(health_band=25.0, max_bear_count=5)
+        key = cache.fingerprint(["more bears"], game_state(health=80.0, bears=6))
+
+        self.assertEqual(key, cache.fingerprint(["MORE BEARS pls"], game_state(health=99.0, bears=9)))
+        self.assertNotEqual(key, cache.fingerprint(["more bears"], game_state(health=40.0, bears=6)))
+        self.assertNotEqual(key, cache.fingerprint(["more bears"], game_state(location="Cabin", bears=6)))
+        self.assertIsNone(cache.fingerprint([], game_state()))
+
+    def test_lru_and_ttl(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", PLAN)
+        cache.put("b", PLAN)
+        cache.get("a")
+        cache.put("c", PLAN)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), PLAN)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+        expired = ResponseCache(ttl=0.0)
+        expired.put("a", PLAN)
+        self.assertIsNone(expired.get("a"))
+        self.assertEqual(len(expired), 0)
+
+    def test_plans_without_actions_are_not_cached(self):
+        cache = ResponseCache()
+        cache.put("a", {"Header": {"Notes": ""}, "Actions": []})
+        self.assertEqual(len(cache), 0)
+
+    def test_plans_on_specific_objects_or_chatting_are_not_cached(self):
+        cache = ResponseCache(replayable=DEFAULT_REGISTRY.replayable)
+        cache.put("move", {"Header": {"Notes": ""}, "Actions": [
+            {"Name": "MoveTo", "Arg1": "/Game/Bear_C_1", "Arg2": "Pond"}]})
+        cache.put("chat", {"Header": {"Notes": ""}, "Actions": [
+            {"Name": "Spawn", "Arg1": "Bear", "Arg2": "Pond"}, {"Name": "Chat", "Arg1": "Here they come"}]})
+        cache.put("spawn", PLAN)
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("spawn"), PLAN)
+
+
+class TestCachedPlanReplay(unittest.IsolatedAsyncioTestCase):
+    async def test_repeated_request_skips_the_model(self):
+        rag = MagicMock()
+        rag.make_rag_request_async = AsyncMock(return_value=RAGResponse.from_dict({
+            "id": "1", "type": "message", "role": "assistant", "model": "haiku",
+            "content": [{"type": "text", "text": json.dumps(PLAN)}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 10}
+        }))
+        session = GameSession(
+            SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1),
+            rag, stream_responses=False, use_tools=False)
+        session.find_available_actions = AsyncMock()
+        session.update_latest_game_state = AsyncMock()
+        session.game_state_cache.state = game_state()
+        session.action_executor.execute = AsyncMock(return_value=list())
+
+        for text in ("more bears", "MORE BEARS pls"):
+            session.add_chat_message(MagicMock(clean_content=text, created_at=datetime.datetime.now()))
+            self.assertEqual(await session.do_some_stuff(), ["Sending bears"])
+
+        rag.make_rag_request_async.assert_awaited_once()
+        self.assertEqual(session.action_executor.execute.await_count, 2)
+        session.action_executor.execute.assert_awaited_with(PLAN["Actions"])
+        self.assertEqual(session.response_cache.hits, 1)
+
+        await session.scheduler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+from outbreak.scheduler import CoalescingScheduler
+
+
+class TestCoalescingScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+        async def run():
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await self.release.wait()
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return self.scheduler.runs
+
+        self.scheduler = CoalescingScheduler(run, debounce=0.02, max_latency=0.2)
+
+    async def asyncTearDown(self):
+        await self.scheduler.stop()
+
+    async def test_burst_is_coalesced_into_one_run(self):
+        futures = [self.scheduler.request() for _ in range(10)]
+        results = await asyncio.gather(*futures)
+
+        self.assertEqual(results, [1] * 10)
+        self.assertEqual(self.scheduler.runs, 1)
+        self.assertEqual(self.scheduler.requests, 10)
+        self.assertTrue(self.scheduler.idle)
+
+    async def test_requests_during_a_run_are_merged_into_the_next(self):
+        self.release.clear()
+        first = self.scheduler.request()
+        while not self.scheduler.running:
+            await asyncio.sleep(0.005)
+
+        later = [self.scheduler.request() for _ in range(5)]
+        self.release.set()
+
+        self.assertEqual(await first, 1)
+        self.assertEqual(await asyncio.gather(*later), [2] * 5)
+        self.assertEqual(self.scheduler.runs, 2)
+        self.assertEqual(self.max_in_flight, 1)
+
+    async def test_max_latency_bounds_the_debounce(self):
+        self.scheduler.debounce = 0.05
+        self.scheduler.max_latency = 0.1
+        first = self.scheduler.request()
+        for _ in range(10):
+            await asyncio.sleep(0.03)
+            self.scheduler.request()
+
+        self.assertTrue(first.done())
+        self.assertGreaterEqual(self.scheduler.runs, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import typing
+import unittest
+from outbreak import models
+from outbreak.schemas import PRESET_SCHEMAS, SchemaRegistry
+from tests.test_models import ROOT_OBJECT_JSON
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    def test_models_are_not_shadowed(self):
+        # Every model must be declared against the class exported under the same name
+        hints = typing.get_type_hints(models.ModifiedRCProperty)
+        self.assertIs(hints["Metadata"], models.Metadata)
+        self.assertIs(hints["UnderlyingProperty"], models.UnderlyingProperty)
+        self.assertIs(typing.get_type_hints(models.ExposedProperty)["UnderlyingProperty"], models.UnderlyingProperty)
+
+    def test_decode_preset_push(self):
+        message = PRESET_SCHEMAS.decode(ROOT_OBJECT_JSON)
+
+        self.assertIsInstance(message, models.RootObject)
+        underlying_property = message.ModifiedEntities.ModifiedRCProperties[0].UnderlyingProperty
+        self.assertIsInstance(underlying_property, models.UnderlyingProperty)
+        self.assertIsInstance(underlying_property.Metadata, models.Metadata)
+
+    def test_decode_preset_description(self):
+        preset = models.PresetResponseBody.from_dict({
+            "Preset": {
+                "Name": "SurvivalManagerPreset",
+                "Path": "/Game/SurvivalManagerPreset.SurvivalManagerPreset",
+                "Groups": [{
+                    "Name": "Player",
+                    "ExposedProperties": [{
+                        "DisplayName": "PlayerHealth",
+                        "UnderlyingProperty": {
+                            "Name": "Health",
+                            "Description": "",
+                            "Type": "float",
+                            "ContainerType": "",
+                            "KeyType": "",
+                            "Metadata": {"ToolTip": "Health of the player"}
+                        }
+                    }]
+                }]
+            }
+        })
+
+        underlying_property = preset.Preset.Groups[0].ExposedProperties[0].UnderlyingProperty
+        self.assertEqual(underlying_property.Metadata.ToolTip, "Health of the player")
+        self.assertIsNone(underlying_property.DisplayName)
+
+    def test_versioned_lookup(self):
+        registry = SchemaRegistry()
+        registry.register("PresetFieldsChanged", models.PresetFieldsChanged)
+        registry.register("PresetFieldsChanged", models.RootObject, version=2)
+
+        message = {"Type": "PresetFieldsChanged", "PresetName": "Preset", "PresetId": "1", "ChangedFields": []}
+        self.assertIsInstance(registry.decode(message), models.PresetFieldsChanged)
+        self.assertIs(registry.schema_for({**message, "Version": 2}).model, models.RootObject)
+        self.assertIsNone(registry.decode({**message, "Version": 3}))
+        self.assertIsNone(registry.decode({"RequestId": 1, "ResponseCode": 200}))
+
+    def test_duplicate_registration(self):
+        registry = SchemaRegistry()
+        registry.register("PresetFieldsChanged", models.PresetFieldsChanged)
+        with self.assertRaises(ValueError):
+            registry.register("PresetFieldsChanged", models.RootObject)
+
+
+if __name__ == '__main__':
+    unittest.main()
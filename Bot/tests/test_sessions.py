@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock
+from outbreak.sessions import SessionConfig, SessionRegistry
+
+
+class TestSessionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.rag = MagicMock()
+        self.registry = SessionRegistry(self.rag, stream_responses=False)
+
+    def test_sessions_are_isolated_and_share_the_rag_client(self):
+        first = self.registry.add(SessionConfig(session_id="a", channel_name="match-a", game_host="10.0.0.1", game_port=30020))
+        second = self.registry.add(SessionConfig(session_id="b", channel_name="match-b", game_host="10.0.0.2", game_port=30020, guild_id=7))
+
+        self.assertIsNot(first.backend, second.backend)
+        self.assertIsNot(first.prompt_generator, second.prompt_generator)
+        self.assertIsNot(first.scheduler, second.scheduler)
+        self.assertIs(first.rag, second.rag)
+        self.assertFalse(first.stream_responses)
+        self.assertEqual(second.backend.uri, "ws://10.0.0.2:30020")
+
+    def test_find_by_guild_and_channel(self):
+        anywhere = self.registry.add(SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1))
+        guild = self.registry.add(SessionConfig(session_id="b", channel_name="bottest", game_host="h", game_port=2, guild_id=7))
+
+        self.assertIs(self.registry.find(7, "bottest"), guild)
+        self.assertIs(self.registry.find(8, "bottest"), anywhere)
+        self.assertIsNone(self.registry.find(7, "general"))
+
+        self.registry.remove("b")
+        self.assertIs(self.registry.find(7, "bottest"), anywhere)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_channel_can_only_drive_one_session(self):
+        self.registry.add(SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1))
+        with self.assertRaises(ValueError):
+            self.registry.add(SessionConfig(session_id="b", channel_name="bottest", game_host="h", game_port=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
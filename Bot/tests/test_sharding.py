@@ -0,0 +1,138 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from outbreak.sessions import SessionConfig, SessionRegistry
+from outbreak.sharding import FileCoordinator, HashRing, InMemoryCoordinator, ShardManager
+
+
+class TestHashRing(unittest.TestCase):
+    def test_adding_a_replica_only_moves_its_sessions(self):
+        keys = [f"session-{index}" for index in range(500)]
+        before = HashRing(["bot-0", "bot-1", "bot-2"])
+        after = HashRing(["bot-0", "bot-1", "bot-2", "bot-3"])
+
+        moved = [key for key in keys if before.owner(key) != after.owner(key)]
+        self.assertTrue(all(after.owner(key) == "bot-3" for key in moved))
+        self.assertLess(len(moved), len(keys) / 2)
+        self.assertEqual(len({before.owner(key) for key in keys}), 3)
+
+
+class TestFileCoordinator(unittest.TestCase):
+    def test_members_follow_heartbeats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            coordinator = FileCoordinator(directory)
+            coordinator.heartbeat("bot-1")
+            coordinator.heartbeat("bot-0")
+            self.assertEqual(coordinator.members(), ["bot-0", "bot-1"])
+
+            coordinator.leave("bot-1")
+            self.assertEqual(coordinator.members(), ["bot-0"])
+
+    def test_leases_are_exclusive_until_released_or_expired(self):
+        with tempfile.TemporaryDirectory() as directory:
+            coordinator = FileCoordinator(directory, lease_ttl=30.0)
+            self.assertTrue(coordinator.acquire_lease("host:30020", "bot-0"))
+            self.assertFalse(coordinator.acquire_lease("host:30020", "bot-1"))
+            self.assertTrue(coordinator.acquire_lease("host:30020", "bot-0"))
+
+            coordinator.release_lease("host:30020", "bot-1")
+            self.assertFalse(coordinator.acquire_lease("host:30020", "bot-1"))
+            coordinator.release_lease("host:30020", "bot-0")
+            self.assertTrue(coordinator.acquire_lease("host:30020", "bot-1"))
+
+            coordinator.lease_ttl = -1.0
+            self.assertTrue(coordinator.acquire_lease("host:30020", "bot-0"))
+
+    def test_one_replica_takes_over_an_expired_lease(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = FileCoordinator(directory, lease_ttl=30.0), FileCoordinator(directory, lease_ttl=30.0)
+            self.assertTrue(first.acquire_lease("host:30020", "bot-0"))
+            expired = time.time() - 60.0
+            os.utime(first._lease_path("host:30020"), (expired, expired))
+
+            # bot-2 tries while bot-1 is in the middle of taking the lease over
+            replace = os.replace
+            attempts = list()
+            def racing_replace(source, destination):
+                attempts.append(second.acquire_lease("host:30020", "bot-2"))
+                replace(source, destination)
+
+            with patch("outbreak.sharding.os.replace", side_effect=racing_replace):
+                self.assertTrue(first.acquire_lease("host:30020", "bot-1"))
+            self.assertEqual(attempts, [False])
+            self.assertFalse(second.acquire_lease("host:30020", "bot-2"))
+            self.assertEqual(first._lease_holder(first._lease_path("host:30020")), "bot-1")
+            self.assertEqual(sorted(os.listdir(directory)), ["host%3A30020.lease"])
+
+
+class TestShardManager(unittest.IsolatedAsyncioTestCase):
+    def make_replica(self, replica_id, coordinator, configs):
+        registry = SessionRegistry(MagicMock())
+        manager = ShardManager(replica_id, coordinator, registry, configs)
+        manager.claim = self.claim(manager)
+        return manager
+
+    def claim(self, manager):
+        async def claim(config):
+            manager.registry.add(config)
+        return claim
+
+    async def test_sessions_are_split_and_handed_over(self):
+        coordinator = InMemoryCoordinator()
+        configs = [
+            SessionConfig(session_id=f"match-{index}", channel_name=f"match-{index}", game_host="h", game_port=index)
+            for index in range(20)
+        ]
+        first = self.make_replica("bot-0", coordinator, configs)
+        second = self.make_replica("bot-1", coordinator, configs)
+
+        self.assertEqual(len(await first.rebalance()), 20)
+        await second.rebalance()
+        await first.rebalance()
+        await second.rebalance()
+
+        first_sessions = {session.session_id for session in first.registry}
+        second_sessions = {session.session_id for session in second.registry}
+        self.assertFalse(first_sessions & second_sessions)
+        self.assertEqual(len(first_sessions | second_sessions), 20)
+        self.assertTrue(second_sessions)
+
+        await second.leave()
+        await first.rebalance()
+        self.assertEqual(len(first.registry), 20)
+        self.assertEqual(len(second.registry), 0)
+
+    async def test_new_owner_waits_for_the_handover(self):
+        coordinator = InMemoryCoordinator()
+        configs = [
+            SessionConfig(session_id=f"match-{index}", channel_name=f"match-{index}", game_host="h", game_port=index)
+            for index in range(20)
+        ]
+        first = self.make_replica("bot-0", coordinator, configs)
+        second = self.make_replica("bot-1", coordinator, configs)
+        await first.rebalance()
+
+        # The second replica owns some sessions on its ring but the first one still drives them
+        moving = set(await second.rebalance())
+        self.assertTrue(moving)
+        self.assertEqual(len(second.registry), 0)
+        self.assertEqual(len(first.registry), 20)
+
+        await first.rebalance()
+        await second.rebalance()
+        self.assertEqual({session.session_id for session in second.registry}, moving)
+        self.assertFalse(moving & {session.session_id for session in first.registry})
+
+    async def test_guild_sessions_follow_discord_shards(self):
+        config = SessionConfig(session_id="match", channel_name="match", game_host="h", game_port=1, guild_id=5 << 22)
+        manager = ShardManager("bot-0", InMemoryCoordinator(), SessionRegistry(MagicMock()), [config],
+                               shard_id=1, shard_count=4)
+        self.assertTrue(manager.owns(config))
+        manager.shard_id = 0
+        self.assertFalse(manager.owns(config))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import unittest
+from outbreak.streaming import ActionStreamParser
+
+
+class TestActionStreamParser(unittest.TestCase):
+    def setUp(self):
+        self.response = {
+            "Header": {
+                "DescriptionOfWhatToDo": "Spawn [two] {bears}",
+                "Notes": 'Actions: "none"'
+            },
+            "Actions": [
+                {"Name": "Chat", "Arg1": 'Hi } there " [', "Reason": "Greeting"},
+                {"Name": "Wait", "Arg1": "2", "Reason": "Suspense"},
+                {"Name": "Spawn", "Arg1": "Bear", "Arg2": "Pond", "Reason": "Chaos"}
+            ]
+        }
+        self.text = json.dumps(self.response, indent=4)
+
+    def test_actions_are_emitted_as_they_complete(self):
+        parser = ActionStreamParser()
+        emitted = list()
+        completed_at = list()
+        for position in range(0, len(self.text), 3):
+            actions = parser.feed(self.text[position:position + 3])
+            emitted.extend(actions)
+            completed_at.extend([position] * len(actions))
+
+        self.assertEqual(emitted, self.response["Actions"])
+        # The first action is available long before the end of the response
+        self.assertLess(completed_at[0], len(self.text) / 2)
+        self.assertEqual(parser.result(), self.response)
+
+    def test_nested_arrays_are_not_actions(self):
+        parser = ActionStreamParser()
+        text = json.dumps({"Header": {"Actions": [{"Name": "Nope"}]}, "Actions": [{"Name": "Chat", "Arg1": "Yes"}]})
+        self.assertEqual(parser.feed(text), [{"Name": "Chat", "Arg1": "Yes"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
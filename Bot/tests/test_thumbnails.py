@@ -0,0 +1,101 @@
+import asyncio
+import base64
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from outbreak.sessions import GameSession, SessionConfig
+from outbreak.thumbnails import ThumbnailCache
+
+
+class TestThumbnailCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fetches = list()
+
+    async def fetch(self, object_path):
+        self.fetches.append(object_path)
+        await asyncio.sleep(0)
+        return object_path.encode("utf-8")
+
+    async def test_instances_of_an_asset_share_a_thumbnail(self):
+        cache = ThumbnailCache(self.fetch)
+        first, second = await asyncio.gather(
+            cache.get("/Game/Map.Map:PersistentLevel.BP_Bear_C_1", "/Game/Bears/BP_Bear"),
+            cache.get("/Game/Map.Map:PersistentLevel.BP_Bear_C_2", "/Game/Bears/BP_Bear"))
+        third = await cache.get("/Game/Map.Map:PersistentLevel.BP_Bear_C_3", "/Game/Bears/BP_Bear")
+
+        self.assertEqual(len(self.fetches), 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    async def test_instances_of_a_generic_class_are_cached_apart(self):
+        cache = ThumbnailCache(self.fetch)
+        rock = await cache.get("/Game/Map.Map:PersistentLevel.StaticMeshActor_1")
+        van = await cache.get("/Game/Map.Map:PersistentLevel.StaticMeshActor_2")
+
+        self.assertNotEqual(rock, van)
+        self.assertEqual(len(self.fetches), 2)
+
+    async def test_clear_drops_fetches_in_flight(self):
+        cache = ThumbnailCache(self.fetch)
+        fetch = asyncio.create_task(cache.get("/Game/Bear"))
+        await asyncio.sleep(0)
+        cache.clear()
+        await fetch
+
+        self.assertEqual(len(cache), 0)
+        await cache.get("/Game/Bear")
+        self.assertEqual(len(self.fetches), 2)
+
+    async def test_lru_eviction_by_count_and_size(self):
+        cache = ThumbnailCache(self.fetch, max_entries=2, max_bytes=10)
+        await cache.get("aaaa")
+        await cache.get("bbbb")
+        await cache.get("aaaa")
+        await cache.get("cccc")
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 8)
+        await cache.get("aaaa")
+        self.assertEqual(self.fetches, ["aaaa", "bbbb", "cccc"])
+
+        await cache.get("dddddddd")
+        self.assertEqual(len(cache), 1)
+        self.assertLessEqual(cache.size, 10)
+        self.assertEqual(cache.evictions, 3)
+
+    async def test_entries_expire(self):
+        cache = ThumbnailCache(self.fetch, ttl=0.0)
+        await cache.get("/Game/Bear")
+        await cache.get("/Game/Bear")
+        self.assertEqual(len(self.fetches), 2)
+
+    async def test_failed_fetch_is_not_cached(self):
+        cache = ThumbnailCache(AsyncMock(return_value=None))
+        self.assertIsNone(await cache.get("/Game/Bear"))
+        self.assertEqual(len(cache), 0)
+
+
+class TestThumbnailAttachment(unittest.IsolatedAsyncioTestCase):
+    async def test_attachment_is_built_in_memory(self):
+        session = GameSession(SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1), MagicMock())
+        image = b"\x89PNG thumbnail"
+        session.backend.get_object_thumbnail = AsyncMock(
+            return_value={"RequestId": 1, "ResponseCode": 200, "ResponseBody": base64.b64encode(image).decode("utf-8")})
+
+        with patch("builtins.open") as open_file:
+            file, embed = await session.generate_content_with_thumbnail("/Game/Bear_C_1", "Bear", "A bear", "/Game/BP_Bear")
+            await session.generate_content_with_thumbnail("/Game/Bear_C_2", "Bear", "A bear", "/Game/BP_Bear")
+
+        self.assertEqual(file.fp.read(), image)
+        self.assertEqual(embed.image.url, "attachment://image.png")
+        session.backend.get_object_thumbnail.assert_awaited_once()
+        open_file.assert_not_called()
+
+    async def test_missing_thumbnail(self):
+        session = GameSession(SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1), MagicMock())
+        session.backend.get_object_thumbnail = AsyncMock(return_value=None)
+        self.assertIsNone(await session.generate_content_with_thumbnail("/Game/Bear", "Bear", "A bear"))
+
+
+if __name__ == '__main__':
+    unittest.main()
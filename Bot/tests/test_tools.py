@@ -0,0 +1,129 @@
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from outbreak.models import Message, MessageContent, PlannedAction, RAGRequestPayload, RAGResponse
+from outbreak.prompts import RAGPromptGenerator, STATIC_TOOL_PROMPT
+from outbreak.registry import DEFAULT_REGISTRY, ActionSpec
+from outbreak.sessions import GameSession, SessionConfig
+from outbreak.streaming import ToolCallStreamParser
+from outbreak.tools import TOOL_CHOICE, decode_tool_calls, generate_tools, repair_payload
+
+
+def tool_response(calls, stop_reason="tool_use"):
+    return RAGResponse.from_dict({
+        "id": "1", "type": "message", "role": "assistant", "model": "haiku",
+        "content": [{"type": "tool_use", "id": f"call_{index}", "name": name, "input": arguments}
+                    for index, (name, arguments) in enumerate(calls)],
+        "stop_reason": stop_reason, "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 10}
+    })
+
+
+class TestToolDefinitions(unittest.TestCase):
+    def setUp(self):
+        self.generator = RAGPromptGenerator(use_tools=True)
+        self.registry = DEFAULT_REGISTRY.copy()
+        self.registry.register(ActionSpec.from_description({"Name": "Explode", "Arg1": "Object ID", "Reason": "Why"}))
+        self.tools = generate_tools(self.registry)
+
+    def test_tools_are_generated_from_the_actions(self):
+        tools = {tool.name: tool for tool in self.tools}
+        self.assertEqual(list(tools), ["Wait", "Chat", "Spawn", "MoveTo", "TeleportPlayer", "Explode", "Notes"])
+        self.assertEqual(tools["Spawn"].input_schema["required"], ["Arg1", "Arg2"])
+        self.assertIn("Bear", tools["Spawn"].input_schema["properties"]["Arg1"]["description"])
+        self.assertEqual(tools["Explode"].input_schema["required"], ["Arg1"])
+        self.assertEqual(tools["Wait"].input_schema["properties"]["Arg1"]["type"], ["number", "string"])
+        self.assertNotIn("Explode", DEFAULT_REGISTRY)
+
+    def test_payload_carries_the_tools(self):
+        static_prompt, _ = self.generator.generate_prompt_sections()
+        self.assertIs(static_prompt, STATIC_TOOL_PROMPT)
+
+        payload = RAGRequestPayload(
+            anthropic_version="bedrock-2023-05-31", max_tokens=10, top_k=1, temperature=0.5, top_p=0.7,
+            messages=[Message(role="user", content=[MessageContent(type="text", text="hi")])],
+            tools=self.tools, tool_choice=TOOL_CHOICE)
+        encoded = json.loads(payload.to_json())
+        self.assertEqual(encoded["tools"][0]["name"], "Wait")
+        self.assertEqual(encoded["tool_choice"], {"type": "any"})
+
+        payload.tools = payload.tool_choice = None
+        self.assertNotIn("tools", json.loads(payload.to_json()))
+
+    def test_decode_and_validate(self):
+        plan = decode_tool_calls(tool_response([
+            ("Spawn", {"Arg1": "Bear", "Arg2": "Pond", "Reason": "Fun"}),
+            ("Spawn", {"Arg1": "Bear"}),
+            ("Fly", {"Arg1": "Player"}),
+            ("Wait", {"Arg1": {"seconds": 2}}),
+            ("Notes", {"Notes": "Add a fly action"}),
+        ]), self.registry)
+
+        self.assertEqual(plan.actions, [PlannedAction(Name="Spawn", Arguments={"Arg1": "Bear", "Arg2": "Pond"}, Reason="Fun")])
+        self.assertEqual(plan.notes, ["Add a fly action"])
+        self.assertEqual(len(plan.errors), 3)
+        self.assertFalse(plan.complete)
+
+    def test_repair_payload(self):
+        payload = RAGRequestPayload(
+            anthropic_version="bedrock-2023-05-31", max_tokens=10, top_k=1, temperature=0.5, top_p=0.7,
+            messages=[Message(role="user", content=[MessageContent(type="text", text="hi")])],
+            tools=self.tools, tool_choice=TOOL_CHOICE)
+        plan = decode_tool_calls(tool_response([("Chat", {"Arg1": "Hi"}), ("Spawn", {})], stop_reason="max_tokens"), self.registry)
+
+        repaired = repair_payload(payload, plan)
+        feedback = repaired.messages[-1].content[-1].text
+        self.assertIn("already taken", feedback)
+        self.assertIn("Spawn is missing Arg1, Arg2.", feedback)
+        self.assertIn("cut off", feedback)
+        self.assertEqual(len(payload.messages[-1].content), 1)
+
+
+class TestToolCallStreamParser(unittest.TestCase):
+    def test_calls_are_decoded_as_they_complete(self):
+        parser = ToolCallStreamParser(DEFAULT_REGISTRY)
+        events = [
+            {"type": "message_start", "message": {}},
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "tool_use", "id": "a", "name": "Chat", "input": {}}},
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "input_json_delta", "partial_json": '{"Arg1": "Run'}},
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "input_json_delta", "partial_json": '!"}'}},
+        ]
+        for event in events:
+            self.assertEqual(parser.feed(event), list())
+
+        self.assertEqual(parser.feed({"type": "content_block_stop", "index": 0}), [PlannedAction(Name="Chat", Arguments={"Arg1": "Run!"})])
+
+        parser.feed({"type": "content_block_start", "index": 1, "content_block": {"type": "tool_use", "id": "b", "name": "Spawn", "input": {}}})
+        parser.feed({"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": '{"Arg1": "Be'}})
+        parser.feed({"type": "message_delta", "delta": {"stop_reason": "max_tokens"}})
+
+        plan = parser.result()
+        self.assertTrue(plan.truncated)
+        self.assertEqual(len(plan.actions), 1)
+
+
+class TestToolPlanRepair(unittest.IsolatedAsyncioTestCase):
+    async def test_invalid_calls_are_repaired(self):
+        rag = MagicMock()
+        rag.make_rag_request_async = AsyncMock(side_effect=[
+            tool_response([("Chat", {"Arg1": "Bears!"}), ("Spawn", {"Arg1": "Bear"})]),
+            tool_response([("Spawn", {"Arg1": "Bear", "Arg2": "Pond"})]),
+        ])
+        session = GameSession(
+            SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1),
+            rag, stream_responses=False)
+        session.find_available_actions = AsyncMock()
+        session.update_latest_game_state = AsyncMock()
+        session.action_executor.execute = AsyncMock(return_value=list())
+
+        self.assertEqual(await session.do_some_stuff(), list())
+
+        self.assertEqual(rag.make_rag_request_async.await_count, 2)
+        executed = [call.args[0] for call in session.action_executor.execute.await_args_list]
+        self.assertEqual([action["Name"] for actions in executed for action in actions], ["Chat", "Spawn"])
+        self.assertEqual(executed[1][0]["Arg2"], "Pond")
+        self.assertEqual(session.prompt_generator.previous_messages[0].message, "Bears!")
+
+
+if __name__ == '__main__':
+    unittest.main()
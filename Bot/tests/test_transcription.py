@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from outbreak.audio import duration_to_bytes
+from outbreak.transcription import (AmazonTranscribeStreamer, AudioStream, LiveTranscription, StreamingTranscriber,
+                                   StubTranscriber, TranscriptionPool)
+from tests.test_audio import silence, tone
+
+
+async def collect(transcripts):
+    return [transcript async for transcript in transcripts]
+
+
+class TestAudioStream(unittest.IsolatedAsyncioTestCase):
+    async def test_oldest_chunks_are_dropped(self):
+        audio = AudioStream(max_chunks=2)
+        for chunk in (b"a", b"b", b"c"):
+            audio.write(chunk)
+        audio.close()
+        audio.write(b"d")
+
+        self.assertEqual([chunk async for chunk in audio], [b"c"])
+        self.assertEqual(audio.dropped, 2)
+
+
+class TestStubTranscriber(unittest.IsolatedAsyncioTestCase):
+    async def test_partial_then_final_transcripts(self):
+        audio = AudioStream()
+        for chunk in (silence(0.5), tone(0.1), tone(0.1), tone(0.1), silence(0.6), tone(0.5), silence(0.6)):
+            audio.write(chunk)
+        audio.close()
+
+        transcripts = await collect(StubTranscriber(["spawn a bear", "tp van"]).transcribe(audio, "alice"))
+        self.assertEqual([(transcript.text, transcript.final) for transcript in transcripts], [
+            ("spawn", False), ("spawn a", False), ("spawn a bear", True),
+            ("tp", False), ("tp van", True)])
+        self.assertTrue(all(transcript.speaker == "alice" for transcript in transcripts))
+
+
+class TestStreamingTranscriber(unittest.TestCase):
+    def test_incomplete_transcriber_fails_on_construction(self):
+        class Incomplete(StreamingTranscriber):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class TestLiveTranscription(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_is_open_while_talking(self):
+        live = LiveTranscription(StubTranscriber(["hello bot"]), speaker="alice", idle_timeout=1.0)
+        now = 0.0
+        for chunk in (silence(0.5), tone(0.4), silence(0.6), silence(0.6), silence(0.6), tone(0.4), silence(0.6)):
+            live.feed(chunk, now)
+            now += len(chunk) / duration_to_bytes(1)
+        live.close()
+
+        transcripts = await asyncio.wait_for(collect(live), timeout=1)
+        self.assertEqual([transcript.text for transcript in transcripts if transcript.final], ["hello bot", "hello bot"])
+        self.assertEqual(live.streams_opened, 2)
+        self.assertIsNone(live.audio)
+
+    async def test_quiet_speakers_hand_over_their_worker(self):
+        pool = TranscriptionPool(max_workers=1)
+        speakers = ["alice", "bob", "carol"]
+        lives = [LiveTranscription(StubTranscriber([f"hello {speaker}"]), speaker=speaker, pool=pool,
+                                   idle_timeout=10.0, handover_after=0.05) for speaker in speakers]
+        collecting = [asyncio.create_task(collect(live)) for live in lives]
+
+        # Everyone talks at once then goes quiet, Discord sends no more audio for them
+        for live in lives:
+            for chunk in (silence(0.2), tone(0.4)):
+                live.feed(chunk)
+        async def handed_over():
+            while pool.waiting or lives[0].audio or lives[1].audio:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(handed_over(), timeout=2)
+
+        for live in lives:
+            live.close()
+        transcripts = await asyncio.wait_for(asyncio.gather(*collecting), timeout=1)
+        self.assertEqual([[transcript.text for transcript in spoken if transcript.final] for spoken in transcripts],
+                         [["hello alice"], ["hello bob"], ["hello carol"]])
+        pool.close()
+
+
+async def transcript_events(results):
+    for result in results:
+        await asyncio.sleep(0)
+        yield SimpleNamespace(transcript=SimpleNamespace(results=[result]))
+
+
+class TestAmazonTranscribeStreamer(unittest.IsolatedAsyncioTestCase):
+    async def test_transcripts_are_streamed(self):
+        results = [
+            SimpleNamespace(is_partial=True, alternatives=[SimpleNamespace(transcript="spawn")]),
+            SimpleNamespace(is_partial=True, alternatives=[]),
+            SimpleNamespace(is_partial=False, alternatives=[SimpleNamespace(transcript="Spawn a bear.")]),
+        ]
+        stream = SimpleNamespace(
+            input_stream=SimpleNamespace(send_audio_event=AsyncMock(), end_stream=AsyncMock()),
+            output_stream=transcript_events(results))
+        client = MagicMock()
+        client.start_stream_transcription = AsyncMock(return_value=stream)
+
+        with patch("outbreak.transcription.TranscribeStreamingClient", return_value=client):
+            streamer = AmazonTranscribeStreamer("eu-west-3", vocabulary_name="outbreak")
+        audio = AudioStream()
+        audio.write(bytes(40 * 1024))
+        audio.close()
+
+        transcripts = await collect(streamer.transcribe(audio, "alice"))
+        self.assertEqual([(transcript.text, transcript.final) for transcript in transcripts],
+                         [("spawn", False), ("Spawn a bear.", True)])
+        self.assertEqual(client.start_stream_transcription.await_args.kwargs["vocabulary_name"], "outbreak")
+        self.assertEqual([len(call.kwargs["audio_chunk"]) for call in stream.input_stream.send_audio_event.await_args_list],
+                         [32 * 1024, 8 * 1024])
+        stream.input_stream.end_stream.assert_awaited_once()
+
+    def test_requires_the_sdk(self):
+        with patch("outbreak.transcription.TranscribeStreamingClient", None):
+            with self.assertRaises(ImportError):
+                AmazonTranscribeStreamer("eu-west-3")
+
+
+if __name__ == '__main__':
+    unittest.main()
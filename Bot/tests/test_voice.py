@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+import unittest
+from outbreak.transcription import StubTranscriber, TranscriptionPool
+from outbreak.voice import VoiceSessions, artifact_name
+from tests.test_audio import silence, tone
+
+
+class TestTranscriptionPool(unittest.IsolatedAsyncioTestCase):
+    async def test_work_is_bounded(self):
+        pool = TranscriptionPool(max_workers=2)
+        running = list()
+        lock = threading.Lock()
+
+        def work(value):
+            with lock:
+                running.append(pool.active)
+            time.sleep(0.02)
+            return value * 2
+
+        results = await asyncio.gather(*(pool.run(work, value) for value in range(6)))
+        pool.close()
+
+        self.assertEqual(results, [0, 2, 4, 6, 8, 10])
+        self.assertLessEqual(max(running), 2)
+        self.assertEqual((pool.active, pool.waiting), (0, 0))
+
+
+class TestVoiceSessions(unittest.IsolatedAsyncioTestCase):
+    def test_artifact_names_are_unique(self):
+        names = {artifact_name(1, 2, suffix=".wav") for _ in range(100)}
+        self.assertEqual(len(names), 100)
+        self.assertTrue(all(name.startswith("voice-1-2-") and name.endswith(".wav") for name in names))
+
+    async def test_speakers_of_several_guilds_are_transcribed(self):
+        transcripts = list()
+
+        async def on_transcript(transcript):
+            if transcript.final:
+                transcripts.append(transcript)
+
+        pool = TranscriptionPool(max_workers=2)
+        sessions = VoiceSessions(pool, transcriber=StubTranscriber(["spawn a bear"]), on_transcript=on_transcript)
+        first, second = sessions.start("guild-1"), sessions.start("guild-2")
+        self.assertIs(sessions.start("guild-1"), first)
+
+        for chunk in (tone(0.4), silence(0.6)):
+            first.feed("alice", chunk)
+            first.feed("bob", chunk)
+            second.feed("carol", chunk)
+        self.assertEqual(len(first.live), 2)
+
+        await asyncio.wait_for(asyncio.gather(sessions.stop("guild-1"), sessions.stop("guild-2")), timeout=1)
+        pool.close()
+
+        self.assertEqual(sorted(transcript.speaker for transcript in transcripts), ["alice", "bob", "carol"])
+        self.assertEqual(len(sessions), 0)
+        self.assertFalse(first.recording)
+        self.assertGreater(len(first.latest_audio("alice")), 0)
+
+    async def test_utterances_are_kept_per_speaker(self):
+        sessions = VoiceSessions(TranscriptionPool(), max_speakers=2)
+        session = sessions.start("guild")
+        session.feed("alice", tone(0.5) + silence(0.6))
+        session.feed("bob", tone(1.0) + silence(0.6))
+        session.feed("carol", tone(0.5))
+
+        self.assertEqual(list(session.utterances), ["alice", "bob"])
+        self.assertGreater(len(session.latest_audio("bob")), len(session.latest_audio("alice")))
+        session.stop()
+        self.assertEqual(list(session.utterances), ["bob", "carol"])
+
+
+if __name__ == '__main__':
+    unittest.main()
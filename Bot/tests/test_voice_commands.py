@@ -0,0 +1,134 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from outbreak.sessions import SessionConfig, SessionRegistry
+from outbreak.transcription import StubTranscriber, Transcript, TranscriptionPool
+from outbreak.voice import VoiceSessions
+from outbreak.voice_commands import VoiceCommandRouter
+from tests.test_audio import silence, tone
+
+
+def transcript(text, final=True, speaker="alice"):
+    now = time.monotonic()
+    return Transcript(speaker=speaker, text=text, final=final, received_at=now, spoken_at=now - 0.2)
+
+
+class TestVoiceCommandRouter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sessions = SessionRegistry(MagicMock(), use_tools=False)
+        self.session = self.sessions.add(SessionConfig(session_id="a", channel_name="bottest", game_host="h", game_port=1))
+        self.session.action_executor.execute = AsyncMock(return_value=list())
+        self.router = VoiceCommandRouter(self.sessions.find)
+        self.channel = MagicMock()
+        self.channel.name = "bottest"
+
+    async def test_partial_transcripts_trigger_the_fast_path(self):
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("spawn a bear", final=False)))
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("spawn a bear at the pond", final=False)))
+        dispatch = self.router.handle(1, self.channel, transcript("spawn a bear at the pond.", final=False))
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("spawn a bear at the pond please", final=False)))
+        await dispatch
+
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("Spawn a bear at the pond.")))
+        self.session.action_executor.execute.assert_awaited_once()
+        self.assertEqual(self.router.partial_triggers, 1)
+        self.assertEqual(len(self.session.prompt_generator.chat_messages), 1)
+        self.assertEqual(len(self.router.latencies), 1)
+        self.assertGreaterEqual(self.router.latency_percentile(50), 0.2)
+
+    async def test_duplicates_are_dropped(self):
+        await self.router.handle(1, self.channel, transcript("Teleport me to the van.", speaker="alice"))
+        # The same voice picked up by a second microphone
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("teleport me to the van", speaker="bob")))
+        self.assertEqual(self.router.duplicates, 1)
+        self.session.action_executor.execute.assert_awaited_once()
+
+    def partial(self, text, speaker="alice"):
+        """
+        A partial transcript heard twice in a row, what triggers its command.
+        """
+        self.assertIsNone(self.router.handle(1, self.channel, transcript(text, final=False, speaker=speaker)))
+        return self.router.handle(1, self.channel, transcript(text, final=False, speaker=speaker))
+
+    def queue_generations(self):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(list())
+        self.session.scheduler.request = MagicMock(return_value=future)
+
+    async def test_partial_duplicates_are_dropped(self):
+        dispatch = self.partial("spawn a bear at the pond", speaker="alice")
+        self.assertIsNone(self.partial("spawn a bear at the pond", speaker="bob"))
+        await dispatch
+
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("Spawn a bear at the pond.", speaker="bob")))
+        self.assertEqual(self.router.duplicates, 1)
+        self.session.action_executor.execute.assert_awaited_once()
+
+    async def test_rest_of_the_utterance_is_dispatched(self):
+        self.queue_generations()
+        await self.partial("spawn a bear at the pond")
+        await self.router.handle(1, self.channel, transcript("Spawn a bear at the pond and two at the river."))
+
+        self.session.action_executor.execute.assert_awaited_once()
+        self.session.scheduler.request.assert_called_once()
+        self.assertEqual(self.session._new_chat_messages,
+                         ["and two at the river. (already done: Spawn Bear Pond)"])
+        self.assertEqual([message.message for message in self.session.prompt_generator.chat_messages],
+                         ["spawn a bear at the pond", "and two at the river. (already done: Spawn Bear Pond)"])
+
+    async def test_revised_transcript_is_reconciled_by_the_model(self):
+        self.queue_generations()
+        await self.partial("spawn a bear at the pond")
+        await self.router.handle(1, self.channel, transcript("Spawn a bear at the river."))
+
+        # The bear of the partial transcript is the only one spawned, the model moves it
+        spawned = [action for call in self.session.action_executor.execute.await_args_list
+                   for action in call.args[0] if action["Name"] == "Spawn"]
+        self.assertEqual(len(spawned), 1)
+        self.session.scheduler.request.assert_called_once()
+        self.assertEqual(self.session._new_chat_messages, ["Spawn a bear at the river. (already done: Spawn Bear Pond)"])
+
+    async def test_trailing_words_are_only_kept(self):
+        self.queue_generations()
+        await self.partial("teleport me to the hill")
+        self.assertIsNone(self.router.handle(1, self.channel, transcript("Teleport me to the hill now please.")))
+        self.session.scheduler.request.assert_not_called()
+        self.session.action_executor.execute.assert_awaited_once()
+
+    async def test_other_commands_go_to_the_scheduler(self):
+        future = asyncio.get_running_loop().create_future()
+        self.session.scheduler.request = MagicMock(return_value=future)
+
+        dispatch = self.router.handle(1, self.channel, transcript("make it rain bears"))
+        self.assertIs(dispatch, future)
+        self.assertEqual(self.session.reply_channel, self.channel)
+        future.set_result(["Done"])
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.router.commands, 1)
+        self.assertEqual(len(self.router.latencies), 1)
+        self.assertIsNone(self.router.handle(1, SimpleNamespace(name="general"), transcript("more bears")))
+
+    async def test_voice_reaches_the_game(self):
+        pool = TranscriptionPool()
+        sessions = VoiceSessions(
+            pool,
+            transcriber=StubTranscriber(["teleport me to the hill please now"]),
+            on_transcript=AsyncMock(side_effect=lambda t: self.router.handle(1, self.channel, t)))
+        voice = sessions.start(1)
+        for chunk in [tone(0.1)] * 6 + [silence(0.6)]:
+            voice.feed("alice", chunk)
+        await asyncio.wait_for(sessions.stop(1), timeout=1)
+        await asyncio.gather(*self.session._fast_path_tasks)
+        pool.close()
+
+        self.session.action_executor.execute.assert_awaited_once_with(
+            [{"Name": "TeleportPlayer", "Arg1": "Player", "Arg2": "Hill", "Reason": "Direct chat command"}])
+        self.assertEqual(self.router.partial_triggers, 1)
+        self.assertEqual(len(self.router.latencies), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -299,6 +299,17 @@ resource "aws_iam_policy" "lambda_policy" {
           "logs:PutLogEvents"
         ]
         Resource = "arn:aws:logs:*:*:*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["bedrock:StartIngestionJob", "bedrock:ListIngestionJobs"]
+        Resource = aws_bedrock_knowledge_base.game_data_knowledge_base.arn
+      },
+      {
+        # Debounce marker of the knowledge base sync
+        Effect   = "Allow"
+        Action   = ["ssm:GetParameter", "ssm:PutParameter"]
+        Resource = "arn:aws:ssm:*:*:parameter/sync_knowledge_base/*"
       }
     ]
   })
@@ -321,13 +332,38 @@ resource "aws_lambda_function" "s3_change_lambda" {
   filename = "sync_knowledge_base.zip"
   source_code_hash = filebase64sha256("sync_knowledge_base.zip")
 
+  # One invocation at a time so bursts of S3 notifications queue up instead of racing on the debounce marker
+  reserved_concurrent_executions = 1
+
   environment {
     variables = {
-      S3_BUCKET = aws_s3_bucket.game_level_data.id
+      S3_BUCKET        = aws_s3_bucket.game_level_data.id
+      KNOWLEDGEBASEID  = aws_bedrock_knowledge_base.game_data_knowledge_base.id
+      DATASOURCEID     = aws_bedrockagent_data_source.game_level_data.data_source_id
+      DEBOUNCE_SECONDS = "60"
     }
   }
 }
 
+# Sync the pending changes once the uploads went quiet and no ingestion job is running
+resource "aws_cloudwatch_event_rule" "sync_pending_changes" {
+  name                = "sync_knowledge_base_pending_changes"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "sync_pending_changes" {
+  rule = aws_cloudwatch_event_rule.sync_pending_changes.name
+  arn  = aws_lambda_function.s3_change_lambda.arn
+}
+
+resource "aws_lambda_permission" "allow_sync_schedule" {
+  statement_id  = "AllowSyncSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.s3_change_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.sync_pending_changes.arn
+}
+
 # Allow S3 Bucket to Trigger the Lambda
 resource "aws_lambda_permission" "allow_bucket_notification" {
   statement_id  = "AllowS3BucketNotification"
@@ -348,6 +384,19 @@ resource "aws_bedrock_knowledge_base" "game_data_knowledge_base" {
   depends_on = [aws_s3_bucket.game_level_data]
 }
 
+# S3 data source of the knowledge base, synced by the sync_knowledge_base lambda
+resource "aws_bedrockagent_data_source" "game_level_data" {
+  name              = "GameLevelData"
+  knowledge_base_id = aws_bedrock_knowledge_base.game_data_knowledge_base.id
+
+  data_source_configuration {
+    type = "S3"
+    s3_configuration {
+      bucket_arn = aws_s3_bucket.game_level_data.arn
+    }
+  }
+}
+
 
 # Outputs
 output "ecr_repository_url" {
@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import boto3
 import logging
 from botocore.exceptions import ClientError
@@ -8,6 +9,10 @@ from botocore.exceptions import ClientError
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Ingestion job statuses meaning a sync of the data source is already under way
+RUNNING_STATUSES = ["STARTING", "IN_PROGRESS"]
+DEFAULT_DEBOUNCE_SECONDS = 60
+
 
 def start_ingestion(bedrock_client, data_source_id, knowledge_base_id):
     """
@@ -16,30 +21,136 @@ def start_ingestion(bedrock_client, data_source_id, knowledge_base_id):
     Args:
         data_source_id (str): The ID of the data source to synchronize.
         knowledge_base_id (str): The ID of the knowledge base to synchronize with.
+
+    Returns:
+        dict: The response of start_ingestion_job.
     """
     response = bedrock_client.start_ingestion_job(
         knowledgeBaseId=knowledge_base_id,
         dataSourceId=data_source_id
     )
-    logger.info(f"Ingestion Job Response: {json.dumps(response)}")
+    logger.info(f"Ingestion Job Response: {json.dumps(response, default=str)}")
+    return response
+
+def changed_objects(event):
+    """
+    Coalesce the S3 notifications of a batch into the objects they changed.
+
+    Args:
+        event (dict): The S3 notification event.
+
+    Returns:
+        list: The unique bucket/key paths created or removed, in order.
+    """
+    changes = dict()
+    for record in event.get("Records", []):
+        if record.get("eventSource") != "aws:s3":
+            continue
+        if not record.get("eventName", "").startswith(("ObjectCreated", "ObjectRemoved")):
+            continue
+        s3 = record.get("s3", {})
+        path = f"{s3.get('bucket', {}).get('name')}/{s3.get('object', {}).get('key')}"
+        changes[path] = True
+    return list(changes)
+
+def running_ingestion_job(bedrock_client, data_source_id, knowledge_base_id):
+    """
+    Find an ingestion job of the data source which hasn't finished yet.
+
+    Returns:
+        str: The ID of the running job, None when there isn't any.
+    """
+    response = bedrock_client.list_ingestion_jobs(
+        knowledgeBaseId=knowledge_base_id,
+        dataSourceId=data_source_id,
+        filters=[{"attribute": "STATUS", "operator": "EQ", "values": RUNNING_STATUSES}],
+        maxResults=1
+    )
+    jobs = response.get("ingestionJobSummaries", [])
+    return jobs[0].get("ingestionJobId") if jobs else None
+
+def read_marker(ssm_client, marker_name):
+    """
+    Load the debounce marker, which records the last ingestion started and the changes waiting for one.
+
+    Returns:
+        dict: The marker, empty when it doesn't exist yet.
+    """
+    try:
+        response = ssm_client.get_parameter(Name=marker_name)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ParameterNotFound":
+            return {}
+        raise
+    return json.loads(response["Parameter"]["Value"])
+
+def write_marker(ssm_client, marker_name, marker):
+    ssm_client.put_parameter(Name=marker_name, Value=json.dumps(marker), Type="String", Overwrite=True)
+
+def record_changes(ssm_client, marker_name, now):
+    """
+    Mark changes as pending in the debounce marker, the scheduled invocation syncs them later.
+
+    Returns:
+        dict: The updated marker.
+    """
+    marker = read_marker(ssm_client, marker_name)
+    marker["pending_since"] = marker.get("pending_since") or now
+    marker["last_change_at"] = now
+    write_marker(ssm_client, marker_name, marker)
+    return marker
+
+def sync_changes(bedrock_client, ssm_client, data_source_id, knowledge_base_id, marker_name, debounce_seconds, now):
+    """
+    Start an ingestion job for pending changes once no change came in for the debounce window and none is running.
+
+    The marker is only cleared after the job was started, the changes stay pending when starting it fails.
+
+    Returns:
+        str: What was done.
+    """
+    marker = read_marker(ssm_client, marker_name)
+    if not marker.get("pending_since"):
+        return "No pending changes to sync."
+
+    quiet_for = now - marker.get("last_change_at", marker["pending_since"])
+    if quiet_for < debounce_seconds:
+        return f"Last change was {quiet_for:.0f}s ago, changes will be synced after the debounce window."
+
+    running_job_id = running_ingestion_job(bedrock_client, data_source_id, knowledge_base_id)
+    if running_job_id:
+        return f"Ingestion job {running_job_id} is already running, changes will be synced after it."
+
+    response = start_ingestion(bedrock_client, data_source_id, knowledge_base_id)
+    write_marker(ssm_client, marker_name, {
+        "started_at": now,
+        "job_id": response.get("ingestionJob", {}).get("ingestionJobId")
+    })
+    return "Ingestion job started successfully."
 
 def lambda_handler(event, context):
     """
     Lambda function to start an ingestion job for a Bedrock Knowledge Base.
-    
+
+    S3 notifications only mark the changes pending, a burst of uploads results in a single ingestion
+    job. The scheduled invocation starts it once no change came in for the debounce window and no job
+    is running for the data source. Invocations without S3 records or a schedule, e.g. manual ones,
+    start a job right away.
+
     Args:
         event (dict): The event data triggering the Lambda function.
         context (LambdaContext): The runtime information of the Lambda function.
-    
+
     Returns:
         dict: A response object with the status code and message.
     """
     logger.info("Lambda handler started.")
-    logger.info(f"Received event: {json.dumps(event)} {json.dumps(context)}")
+    logger.info(f"Received event with {len(event.get('Records', []))} records from {event.get('source', 'S3')}")
 
     # Retrieve environment variables
     data_source_id = os.getenv("DATASOURCEID")
     knowledge_base_id = os.getenv("KNOWLEDGEBASEID")
+    debounce_seconds = float(os.getenv("DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS))
 
     if not data_source_id or not knowledge_base_id:
         logger.error("Environment variables 'DATASOURCEID' or 'KNOWLEDGEBASEID' are missing.")
@@ -50,11 +161,29 @@ def lambda_handler(event, context):
 
     logger.info(f"Using Knowledge Base ID: {knowledge_base_id}")
     logger.info(f"Using Data Source ID: {data_source_id}")
+    marker_name = os.getenv("DEBOUNCE_MARKER", f"/sync_knowledge_base/{knowledge_base_id}/{data_source_id}")
 
     bedrock_client = boto3.client("bedrock-agent" )
     try:
-        # Start ingestion job
-        start_ingestion(bedrock_client, data_source_id, knowledge_base_id)
+        if "Records" in event:
+            changes = changed_objects(event)
+            if not changes:
+                return {
+                    "statusCode": 200,
+                    "body": "No object changes to sync."
+                }
+            logger.info(f"Coalesced {len(event['Records'])} notifications into {len(changes)} changed objects.")
+            record_changes(boto3.client("ssm"), marker_name, time.time())
+            body = f"{len(changes)} changed objects pending, they are synced once no change came in for {debounce_seconds:.0f}s."
+
+        elif event.get("source") == "aws.events":
+            body = sync_changes(bedrock_client, boto3.client("ssm"), data_source_id, knowledge_base_id,
+                                marker_name, debounce_seconds, time.time())
+
+        else:
+            # Start ingestion job
+            start_ingestion(bedrock_client, data_source_id, knowledge_base_id)
+            body = "Ingestion job started successfully."
 
     except ClientError as e:
         logger.error(f"AWS ClientError occurred: {str(e)}")
@@ -69,7 +198,8 @@ def lambda_handler(event, context):
             "body": "An unexpected error occurred."
         }
 
+    logger.info(body)
     return {
         "statusCode": 200,
-        "body": "Ingestion job started successfully."
-    }
\ No newline at end of file
+        "body": body
+    }
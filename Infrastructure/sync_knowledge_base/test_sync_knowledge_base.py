@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import patch, MagicMock
 import sync_knowledge_base
@@ -78,5 +79,141 @@ class TestLambdaHandler(unittest.TestCase):
             self.assertIn("Failed to start ingestion job due to AWS ClientError", response['body'])
 
 
+def s3_event(*keys, event_name="ObjectCreated:Put"):
+    return {
+        "Records": [
+            {
+                "eventSource": "aws:s3",
+                "eventName": event_name,
+                "s3": {"bucket": {"name": "game-level-data-bucket"}, "object": {"key": key}}
+            }
+            for key in keys
+        ]
+    }
+
+class TestCoalescedIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict('os.environ', {
+            'DATASOURCEID': 'test-datasource-id',
+            'KNOWLEDGEBASEID': 'test-knowledgebase-id',
+            'DEBOUNCE_SECONDS': '60'
+        })
+        self.env.start()
+
+        self.bedrock_client = MagicMock()
+        self.bedrock_client.list_ingestion_jobs.return_value = {'ingestionJobSummaries': []}
+        self.bedrock_client.start_ingestion_job.return_value = {'ingestionJob': {'ingestionJobId': 'job-1'}}
+
+        # Stores the debounce marker like Parameter Store
+        self.parameters = {}
+        self.ssm_client = MagicMock()
+        def get_parameter(Name):
+            if Name not in self.parameters:
+                raise ClientError({"Error": {"Code": "ParameterNotFound"}}, "GetParameter")
+            return {'Parameter': {'Value': self.parameters[Name]}}
+        def put_parameter(Name, Value, Type, Overwrite):
+            self.parameters[Name] = Value
+        self.ssm_client.get_parameter.side_effect = get_parameter
+        self.ssm_client.put_parameter.side_effect = put_parameter
+
+        self.client_patch = patch('boto3.client', side_effect=lambda service: {
+            'bedrock-agent': self.bedrock_client,
+            'ssm': self.ssm_client
+        }[service])
+        self.client_patch.start()
+
+        self.now = 1000.0
+        self.time_patch = patch('sync_knowledge_base.time.time', side_effect=lambda: self.now)
+        self.time_patch.start()
+
+    def tearDown(self):
+        self.time_patch.stop()
+        self.client_patch.stop()
+        self.env.stop()
+
+    def schedule(self):
+        return sync_knowledge_base.lambda_handler({'source': 'aws.events'}, {})
+
+    def marker(self):
+        return json.loads(self.parameters['/sync_knowledge_base/test-knowledgebase-id/test-datasource-id'])
+
+    def test_batch_starts_one_job(self):
+        keys = [f"levels/export/{i}.json" for i in range(500)]
+        response = sync_knowledge_base.lambda_handler(s3_event(*keys, *keys), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertIn("500 changed objects pending", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_not_called()
+
+        self.now += 60
+        response = self.schedule()
+        self.assertIn("Ingestion job started successfully", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_called_once()
+        self.assertEqual(self.marker()['job_id'], 'job-1')
+        self.assertNotIn('pending_since', self.marker())
+
+    def test_burst_is_debounced(self):
+        for i in range(5):
+            response = sync_knowledge_base.lambda_handler(s3_event(f"levels/{i}.json"), {})
+            self.assertEqual(response['statusCode'], 200)
+            self.now += 20
+        self.assertEqual(self.marker()['pending_since'], 1000.0)
+
+        # The uploads only stopped 20s ago
+        response = self.schedule()
+        self.assertIn("debounce window", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_not_called()
+
+        self.now += 40
+        response = self.schedule()
+        self.assertIn("Ingestion job started successfully", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_called_once()
+
+        response = self.schedule()
+        self.assertIn("No pending changes", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_called_once()
+
+    def test_running_job_is_not_overlapped(self):
+        self.bedrock_client.list_ingestion_jobs.return_value = {
+            'ingestionJobSummaries': [{'ingestionJobId': 'job-0', 'status': 'IN_PROGRESS'}]
+        }
+        sync_knowledge_base.lambda_handler(s3_event("levels/1.json", event_name="ObjectRemoved:Delete"), {})
+        self.now += 60
+        response = self.schedule()
+
+        self.assertIn("job-0 is already running", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_not_called()
+        self.assertEqual(self.bedrock_client.list_ingestion_jobs.call_args.kwargs['filters'][0]['values'],
+                         ['STARTING', 'IN_PROGRESS'])
+
+        # The schedule syncs the pending changes once the job is done
+        self.bedrock_client.list_ingestion_jobs.return_value = {'ingestionJobSummaries': []}
+        response = self.schedule()
+        self.assertIn("Ingestion job started successfully", response['body'])
+        self.bedrock_client.start_ingestion_job.assert_called_once()
+
+    def test_failed_start_keeps_changes_pending(self):
+        sync_knowledge_base.lambda_handler(s3_event("levels/1.json"), {})
+        self.bedrock_client.start_ingestion_job.side_effect = ClientError(
+            {"Error": {"Code": "ConflictException"}}, "StartIngestionJob")
+        self.now += 60
+
+        response = self.schedule()
+        self.assertEqual(response['statusCode'], 500)
+        self.assertEqual(self.marker()['pending_since'], 1000.0)
+
+        self.bedrock_client.start_ingestion_job.side_effect = None
+        response = self.schedule()
+        self.assertIn("Ingestion job started successfully", response['body'])
+
+    def test_other_records_are_ignored(self):
+        event = s3_event("levels/1.json", event_name="ObjectRestore:Completed")
+        response = sync_knowledge_base.lambda_handler(event, {})
+
+        self.assertIn("No object changes", response['body'])
+        self.bedrock_client.list_ingestion_jobs.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()